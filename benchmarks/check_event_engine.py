@@ -0,0 +1,74 @@
+import argparse
+from pathlib import Path
+from typing import List
+import numpy as np
+from benchmarks.fixtures import load_matches, synthetic_matches
+from src.parsers.EventEngine import JIT_ENABLED, trace_match
+from src.parsers.Frame import Frame
+from src.parsers.OfflineParser import STATE_EVENT_TYPES, OfflineParser
+from src.parsers.Sample import SampleFormatting
+
+
+def parse_samples(frames: List[Frame], jit: bool) -> np.ndarray:
+    parser = OfflineParser(frames, jit=jit)
+    rows = []
+    sample = parser.getNextFrame()
+    while sample:
+        rows.append(sample.getValue(SampleFormatting.BY_TEAM))
+        sample = parser.getNextFrame()
+    return np.stack(rows)
+
+
+def check_event_engine(timelines: List[dict]) -> List[str]:
+    """Compare the samples of the compiled state machine with the samples of GameState
+
+    The state machine is also run as plain Python, its states must match the compiled ones.
+
+    :return: Match IDs of the timelines with different samples or states
+    """
+    mismatches = []
+    for timeline in timelines:
+        frames = [Frame(frame) for frame in timeline["info"]["frames"]]
+        expected = parse_samples(frames, jit=False)
+        actual = parse_samples(frames, jit=True)
+        toGameEvent = OfflineParser([]).toGameEvent
+        compiled = trace_match(frames, toGameEvent, STATE_EVENT_TYPES, jit=True)
+        interpreted = trace_match(frames, toGameEvent, STATE_EVENT_TYPES, jit=False)
+        same = expected.dtype == actual.dtype and np.array_equal(expected, actual)
+        for name, states in vars(compiled).items():
+            same = same and np.array_equal(states, getattr(interpreted, name))
+        if not same:
+            mismatches.append(timeline["metadata"]["matchId"])
+    return mismatches
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Check the JIT event engine builds the same samples as GameState"
+    )
+    arg_parser.add_argument(
+        "--matches", type=int, default=200, help="Number of matches"
+    )
+    arg_parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=None,
+        help="Use the stored matches of this directory (e.g. matches) instead of synthetic ones",
+    )
+    args = arg_parser.parse_args()
+    if not JIT_ENABLED:
+        print("numba is not installed (or JIT_ENGINE=0), nothing to check")
+        return
+
+    if args.fixtures:
+        matches = load_matches(args.fixtures, args.matches)
+    else:
+        matches = synthetic_matches(args.matches)
+    mismatches = check_event_engine([timeline for _, timeline in matches])
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} matches differ: {mismatches}")
+    print(f"{len(matches)} matches identical")
+
+
+if __name__ == "__main__":
+    main()
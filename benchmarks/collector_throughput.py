@@ -0,0 +1,110 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from src.profiling import PROFILER
+from src.standins.RiotApiStandIn import (
+    RiotApiStandIn,
+    generated_source,
+    parse_rate_limits,
+)
+from src.training_data_collector import collect_regions
+
+
+def measure_collector(
+    server: RiotApiStandIn,
+    regions,
+    snowball: bool,
+    max_matches_per_player,
+    num_samples: int,
+) -> dict:
+    """Collect num_samples matches per rank and division of every region from the stand-in
+
+    :return: Dict of the wall time, matches per second and counts of requests and retries
+    """
+    PROFILER.enabled = True
+    PROFILER.reset()
+    server.requestCounts.clear()
+    crawl_options = {"max_matches_per_player": max_matches_per_player}
+    with tempfile.TemporaryDirectory() as matches_dir:
+        match_info_dir = Path(matches_dir) / "match_info"
+        match_timeline_dir = Path(matches_dir) / "match_timeline"
+        match_info_dir.mkdir()
+        match_timeline_dir.mkdir()
+        start = time.perf_counter()
+        collect_regions(
+            None,
+            regions,
+            "RANKED_SOLO_5x5",
+            ["DIAMOND"],
+            ["I", "II"],
+            1,
+            5,
+            num_samples,
+            match_info_dir,
+            match_timeline_dir,
+            None,
+            snowball,
+            api_url=server.getBaseUrl(),
+            **crawl_options,
+        )
+        elapsed = time.perf_counter() - start
+    matches = PROFILER.counters.get("matches", 0)
+    return {
+        "seconds": elapsed,
+        "matches": matches,
+        "matches_per_second": matches / elapsed,
+        "requests": sum(server.requestCounts.values()),
+        "requests_per_match": sum(server.requestCounts.values()) / max(matches, 1),
+        "responses": dict(sorted(server.requestCounts.items())),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Measure the collector's throughput against the local Riot API stand-in"
+    )
+    arg_parser.add_argument(
+        "--samples", type=int, default=20, help="Matches per rank and division"
+    )
+    arg_parser.add_argument("--regions", default="NA1,EUW1")
+    arg_parser.add_argument("--latency", type=float, default=0.02)
+    arg_parser.add_argument("--jitter", type=float, default=0.02)
+    arg_parser.add_argument("--rate-limits", default="none")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    server = RiotApiStandIn(
+        generated_source(10000, args.seed),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limits=(
+            None if args.rate_limits == "none" else parse_rate_limits(args.rate_limits)
+        ),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server.startInBackground()
+    regions = args.regions.split(",")
+    modes = (
+        ("1 per matchlist", ["NA1"], False, 1),
+        ("5 per matchlist", ["NA1"], False, 5),
+        ("snowball", ["NA1"], True, 5),
+        (f"snowball {len(regions)} regions", regions, True, 5),
+    )
+    for name, mode_regions, snowball, per_player in modes:
+        result = measure_collector(
+            server, mode_regions, snowball, per_player, args.samples
+        )
+        print(
+            f"{name:>20}: {result['matches']} matches in {result['seconds']:.1f} s "
+            f"({result['matches_per_second']:.1f}/s), "
+            f"{result['requests_per_match']:.2f} requests per match, "
+            f"responses {result['responses']}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from src.live_simulator import TimelineLiveFeed
+from src.match_generator import PLATFORM_ID, generate_match
+from src.parsers.Frame import Frame
+
+
+def synthetic_matches(num_matches: int, seed=0) -> List[Tuple[dict, dict]]:
+    """(match info, match timeline) of num_matches matches of match_generator.py"""
+    return [
+        generate_match(f"{PLATFORM_ID}_{seed * 10**7 + i}", seed * 10**7 + i)
+        for i in range(num_matches)
+    ]
+
+
+def load_matches(matches_dir: Path, limit: Optional[int] = None):
+    """(match info, match timeline) of stored matches, in the collector's layout (e.g. matches/)"""
+    matches = []
+    for path in sorted((matches_dir / "match_info").glob("*.json"))[:limit]:
+        match_id = path.stem[len("match_info_") :]
+        with path.open(mode="r", encoding="utf-8") as f:
+            match_info = json.load(f)
+        timeline_path = (
+            matches_dir / "match_timeline" / f"match_timeline_{match_id}.json"
+        )
+        with timeline_path.open(mode="r", encoding="utf-8") as f:
+            matches.append((match_info, json.load(f)))
+    return matches
+
+
+def write_matches(matches_dir: Path, matches: List[Tuple[dict, dict]]):
+    """Write matches in the collector's match_info/match_timeline layout"""
+    for name in ("match_info", "match_timeline"):
+        (matches_dir / name).mkdir(parents=True, exist_ok=True)
+    for match_info, match_timeline in matches:
+        match_id = match_info["metadata"]["matchId"]
+        for name, data in (
+            ("match_info", match_info),
+            ("match_timeline", match_timeline),
+        ):
+            with (matches_dir / name / f"{name}_{match_id}.json").open(
+                mode="w", encoding="utf-8"
+            ) as f:
+                json.dump(data, f)
+
+
+def live_payloads(timelines: List[dict], itemCosts: Dict[int, int]) -> List[list]:
+    """Live Client Data API snapshots (game time, eventdata, playerlist) of every timeline"""
+    games = []
+    for timeline in timelines:
+        frames = [Frame(frame) for frame in timeline["info"]["frames"]]
+        feed = TimelineLiveFeed(frames, itemCosts)
+        snapshots = []
+        for index in range(len(feed.times)):
+            snapshot = feed.getSnapshot(index)
+            snapshots.append(
+                (
+                    snapshot["gamestats"]["gameTime"],
+                    snapshot["eventdata"],
+                    snapshot["playerlist"],
+                )
+            )
+        games.append(snapshots)
+    return games
@@ -0,0 +1,362 @@
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional
+import numpy as np
+from benchmarks.fixtures import (
+    live_payloads,
+    load_matches,
+    synthetic_matches,
+    write_matches,
+)
+from src.features.features import DEFAULT_PLAN, ExtractionPlan
+from src.item_table import load_item_costs
+from src.lean_model import TreeEnsemble
+from src.parsers.Frame import Frame
+from src.parsers.LiveFrame import LiveFrame
+from src.parsers.LiveParser import LiveParser
+from src.parsers.OfflineParser import OfflineParser
+from src.parsers.Sample import SampleFormatting
+from src.training_data_processor import (
+    generate_dataset_from_files,
+    generate_time_series_features,
+)
+
+RESULTS_DIR = Path.cwd() / "benchmarks" / "results"
+
+
+class Benchmark:
+    """A function timed over a fixture, reporting its throughput in units (frames, samples...) per second.
+
+    run is called repeatedly and must do the same work every time, so setup work belongs in
+    the closure that builds it.
+    """
+
+    name: str
+    run: Callable[[], None]
+    units: int
+    unit: str
+
+    def __init__(self, name: str, run: Callable[[], None], units: int, unit: str):
+        self.name = name
+        self.run = run
+        self.units = units
+        self.unit = unit
+
+    def measure(self, repeat=5, min_seconds=0.2) -> dict:
+        """Time the benchmark, then run it once more under tracemalloc to count its allocations
+
+        :param repeat: Number of timed rounds, the throughput is computed from the fastest
+        :param min_seconds: Minimum duration of a round, short benchmarks are looped within a round
+        :return: Results row
+        """
+        self.run()
+        start = time.perf_counter()
+        self.run()
+        loops = max(1, int(min_seconds / max(time.perf_counter() - start, 1e-9)))
+        rounds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                self.run()
+            rounds.append((time.perf_counter() - start) / loops)
+
+        tracemalloc.start()
+        self.run()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Blocks still alive at the end of the run, i.e. what the run retained rather than churned
+        retained = sum(stat.size for stat in snapshot.statistics("filename"))
+
+        best = min(rounds)
+        return {
+            "name": self.name,
+            "unit": self.unit,
+            "units": self.units,
+            "best_seconds": best,
+            "median_seconds": float(np.median(rounds)),
+            "throughput": self.units / best,
+            "peak_bytes": peak,
+            "peak_bytes_per_unit": peak / self.units,
+            "retained_bytes": retained,
+        }
+
+
+def parsing_benchmarks(
+    timelines: List[dict], itemCosts, plan: ExtractionPlan = DEFAULT_PLAN
+) -> List[Benchmark]:
+    rawFrames = [
+        frame for timeline in timelines for frame in timeline["info"]["frames"]
+    ]
+    matchFrames = [
+        [Frame(frame) for frame in timeline["info"]["frames"]] for timeline in timelines
+    ]
+    numFrames = len(rawFrames)
+
+    def construct_frames():
+        for frame in rawFrames:
+            Frame(frame)
+
+    def parse_offline():
+        for frames in matchFrames:
+            parser = OfflineParser(frames, plan)
+            while parser.getNextFrame():
+                pass
+
+    def parse_offline_gamestate():
+        for frames in matchFrames:
+            parser = OfflineParser(frames, plan, jit=False)
+            while parser.getNextFrame():
+                pass
+
+    samples = []
+    for frames in matchFrames:
+        parser = OfflineParser(frames, plan)
+        sample = parser.getNextFrame()
+        while sample:
+            samples.append(sample)
+            sample = parser.getNextFrame()
+
+    def sample_values():
+        for sample in samples:
+            sample.getValue(SampleFormatting.TAKE_DIFF)
+
+    def featurize_timelines():
+        for timeline in timelines:
+            generate_time_series_features(timeline, plan)
+
+    games = live_payloads(timelines, itemCosts)
+    numPolls = sum(len(snapshots) for snapshots in games)
+
+    def construct_live_frames():
+        for snapshots in games:
+            for gameTime, events, players in snapshots:
+                LiveFrame(gameTime, events, players, itemCosts)
+
+    liveFrames = [
+        [
+            LiveFrame(gameTime, events, players, itemCosts)
+            for gameTime, events, players in snapshots
+        ]
+        for snapshots in games
+    ]
+
+    def parse_live():
+        for frames in liveFrames:
+            parser = LiveParser(plan=plan)
+            for frame in frames:
+                parser.getNextFrame(frame)
+
+    return [
+        Benchmark("Frame", construct_frames, numFrames, "frames"),
+        Benchmark("OfflineParser.getNextFrame", parse_offline, numFrames, "frames"),
+        Benchmark(
+            "OfflineParser.getNextFrame[gamestate]",
+            parse_offline_gamestate,
+            numFrames,
+            "frames",
+        ),
+        Benchmark("Sample.getValue", sample_values, len(samples), "samples"),
+        Benchmark(
+            "generate_time_series_features", featurize_timelines, numFrames, "frames"
+        ),
+        Benchmark("LiveFrame", construct_live_frames, numPolls, "polls"),
+        Benchmark("LiveParser.getNextFrame", parse_live, numPolls, "polls"),
+    ]
+
+
+def dataset_benchmark(
+    matches, matches_dir: Path, plan: ExtractionPlan = DEFAULT_PLAN
+) -> Benchmark:
+    write_matches(matches_dir, matches)
+    numFrames = sum(len(timeline["info"]["frames"]) for _, timeline in matches)
+
+    def generate_dataset():
+        generate_dataset_from_files(
+            matches_dir / "match_info",
+            matches_dir / "match_timeline",
+            time_series=False,
+            plan=plan,
+        )
+
+    return Benchmark(
+        "generate_dataset_from_files", generate_dataset, numFrames, "frames"
+    )
+
+
+def inference_benchmarks(
+    timelines: List[dict],
+    model_path: Optional[Path],
+    plan: ExtractionPlan = DEFAULT_PLAN,
+):
+    """Model inference on single samples (live path) and on batches (scorer)
+
+    Uses the trained model and its features if there is one, otherwise a small model trained on
+    the fixtures with the features of plan, so results are only comparable between runs using
+    the same model.
+    """
+    import xgboost as xgb
+
+    def featurize(features: ExtractionPlan) -> np.ndarray:
+        return np.vstack(
+            [
+                np.vstack(generate_time_series_features(timeline, features))
+                for timeline in timelines
+            ]
+        )
+
+    if model_path is not None:
+        from src.model_artifact import load_model_artifact
+
+        artifact = load_model_artifact(model_path)
+        booster = artifact.booster
+        X = featurize(artifact.plan)
+    else:
+        X = featurize(plan)
+        y = np.random.default_rng(0).random(len(X)) < 0.5
+        booster = xgb.train(
+            {"objective": "binary:logistic", "tree_method": "hist", "max_depth": 6},
+            xgb.DMatrix(X, y),
+            num_boost_round=100,
+        )
+    trees = TreeEnsemble.fromBooster(booster)
+    single = X[:200]
+
+    def booster_single():
+        for x in single:
+            booster.inplace_predict(x[None, :])
+
+    def trees_single():
+        for x in single:
+            trees.predict_proba(x)
+
+    return [
+        Benchmark("inference.booster.single", booster_single, len(single), "samples"),
+        Benchmark("inference.trees.single", trees_single, len(single), "samples"),
+        Benchmark(
+            "inference.booster.batch",
+            lambda: booster.inplace_predict(X),
+            len(X),
+            "samples",
+        ),
+        Benchmark(
+            "inference.trees.batch", lambda: trees.predict_proba(X), len(X), "samples"
+        ),
+    ]
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(results: List[dict], baseline_path: Path, threshold=0.1):
+    """Print the throughput change of every benchmark against a previous run
+
+    :param threshold: Relative slowdown above which a benchmark is reported as a regression
+    :return: Names of the regressed benchmarks
+    """
+    with baseline_path.open(mode="r", encoding="utf-8") as baseline_f:
+        baseline = {row["name"]: row for row in json.load(baseline_f)["results"]}
+    regressions = []
+    for row in results:
+        if row["name"] not in baseline:
+            continue
+        change = row["throughput"] / baseline[row["name"]]["throughput"] - 1
+        regressed = change < -threshold
+        if regressed:
+            regressions.append(row["name"])
+        print(f"{row['name']:<32} {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark the parsing, feature and inference pipeline"
+    )
+    arg_parser.add_argument("--matches", type=int, default=50, help="Number of matches")
+    arg_parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=None,
+        help="Use the stored matches of this directory (e.g. matches) instead of synthetic ones",
+    )
+    arg_parser.add_argument(
+        "--model", type=Path, default=None, help="Model artifact to benchmark"
+    )
+    arg_parser.add_argument("--filter", default="", help="Only run matching benchmarks")
+    arg_parser.add_argument(
+        "--features",
+        default=None,
+        help="Comma separated FeatureKeys names, only extract these features",
+    )
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument(
+        "--output", type=Path, default=None, help="JSON file to write the results to"
+    )
+    arg_parser.add_argument(
+        "--compare", type=Path, default=None, help="JSON results of a previous run"
+    )
+    args = arg_parser.parse_args()
+
+    if args.fixtures:
+        matches = load_matches(args.fixtures, args.matches)
+    else:
+        matches = synthetic_matches(args.matches)
+    timelines = [timeline for _, timeline in matches]
+    plan = (
+        ExtractionPlan.fromNames(args.features.split(","))
+        if args.features
+        else DEFAULT_PLAN
+    )
+
+    with tempfile.TemporaryDirectory() as matches_dir:
+        benchmarks = parsing_benchmarks(timelines, load_item_costs(), plan)
+        benchmarks.append(dataset_benchmark(matches, Path(matches_dir), plan))
+        benchmarks += inference_benchmarks(timelines, args.model, plan)
+        results = []
+        for benchmark in benchmarks:
+            if args.filter not in benchmark.name:
+                continue
+            results.append(benchmark.measure(args.repeat))
+            row = results[-1]
+            print(
+                f"{row['name']:<32} {row['throughput']:>12.1f} {row['unit']}/s "
+                f"{row['peak_bytes_per_unit']:>10.0f} peak B/{row['unit'][:-1]}"
+            )
+
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "matches": len(timelines),
+        "fixtures": str(args.fixtures) if args.fixtures else "synthetic",
+        "features": plan.getNames(),
+        "results": results,
+    }
+    output_path = args.output or RESULTS_DIR / f"{report['commit'] or 'results'}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open(mode="w", encoding="utf-8") as output_f:
+        json.dump(report, output_f, indent=4)
+    print(f"Results written to {output_path}")
+
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import argparse
+import json
+import os
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from tqdm import tqdm
+
+from src.features.features import DEFAULT_PLAN, ExtractionPlan
+from src.parsers.EventEngine import (
+    FRAME_SAMPLING,
+    JIT_ENABLED,
+    EventTrace,
+    Sampling,
+    resolve_events,
+    trace_events,
+)
+from src.parsers.GameState import GameEventType, GameState
+from src.parsers.Sample import SampleFormatting
+
+EVENT_TABLE_DIR = Path.cwd() / "matches" / "event_table"
+MATCH_TIMELINE_DIR = Path.cwd() / "matches" / "match_timeline"
+EVENT_TABLE_FORMAT_VERSION = 1
+# Missing IDs, team IDs and positions
+MISSING = -1
+
+# Columns with one row per event
+EVENT_COLUMNS = {
+    "match": np.int32,
+    "frame": np.int16,
+    "timestamp": np.int32,
+    "type": np.uint8,
+    "killer": np.int8,
+    "victim": np.int8,
+    "killer_team": np.int16,
+    "team": np.int16,
+    "monster_type": np.uint8,
+    "monster_sub_type": np.uint8,
+    "building_type": np.uint8,
+    "x": np.int32,
+    "y": np.int32,
+}
+# Columns stored as codes of the table's vocabularies, code 0 is a missing value
+CATEGORICAL_COLUMNS = ("type", "monster_type", "monster_sub_type", "building_type")
+# Columns with one row per frame
+FRAME_COLUMNS = {
+    "frame_timestamp": np.int32,
+    "total_gold": np.int32,
+    "level": np.int8,
+}
+
+
+def extract_match_events(match_timeline_filepath: Path):
+    """Flatten the events and participant frames of a timeline into columns
+
+    :param match_timeline_filepath: Path to the match timeline JSON file
+    :return: Tuple (match ID, event columns as lists, frame columns as lists), None if the file can't be read
+    """
+    try:
+        with match_timeline_filepath.open(
+            mode="r", encoding="utf-8"
+        ) as match_timeline_f:
+            timeline = json.load(match_timeline_f)
+    except (IOError, ValueError):
+        return None
+    events: Dict[str, list] = {name: [] for name in EVENT_COLUMNS if name != "match"}
+    frames: Dict[str, list] = {name: [] for name in FRAME_COLUMNS}
+    for index, frame in enumerate(timeline["info"]["frames"]):
+        frames["frame_timestamp"].append(frame["timestamp"])
+        participants = [frame["participantFrames"][str(i + 1)] for i in range(10)]
+        frames["total_gold"].append([p["totalGold"] for p in participants])
+        frames["level"].append([p["level"] for p in participants])
+        for event in frame["events"]:
+            position = event.get("position", {})
+            events["frame"].append(index)
+            events["timestamp"].append(event["timestamp"])
+            events["type"].append(event["type"])
+            events["killer"].append(event.get("killerId", MISSING))
+            events["victim"].append(event.get("victimId", MISSING))
+            events["killer_team"].append(event.get("killerTeamId", MISSING))
+            events["team"].append(event.get("teamId", MISSING))
+            events["monster_type"].append(event.get("monsterType"))
+            events["monster_sub_type"].append(event.get("monsterSubType"))
+            events["building_type"].append(event.get("buildingType"))
+            events["x"].append(position.get("x", MISSING))
+            events["y"].append(position.get("y", MISSING))
+    return timeline["metadata"]["matchId"], events, frames
+
+
+def build_event_table(
+    match_timeline_dir: Path = MATCH_TIMELINE_DIR,
+    table_dir: Path = EVENT_TABLE_DIR,
+    processes=None,
+):
+    """Extract the events of every stored timeline into a columnar table, one .npy file per column
+
+    Timelines are parsed in parallel, the table is written once every timeline is read.
+
+    :param match_timeline_dir: Path to the directory containing the match timeline JSON files
+    :param table_dir: Path to the directory to write the table to (an existing table is replaced)
+    :param processes: Number of parsing processes, defaults to the number of cores
+    :return: Tuple (number of matches, number of events)
+    """
+    match_timeline_filepaths = sorted(match_timeline_dir.glob("*.json"))
+    vocabularies: Dict[str, Dict[Optional[str], int]] = {
+        name: {None: 0} for name in CATEGORICAL_COLUMNS
+    }
+    match_ids: List[str] = []
+    event_chunks: Dict[str, List[np.ndarray]] = {name: [] for name in EVENT_COLUMNS}
+    frame_chunks: Dict[str, List[np.ndarray]] = {name: [] for name in FRAME_COLUMNS}
+    event_counts: List[int] = []
+    frame_counts: List[int] = []
+
+    with Pool(processes or os.cpu_count()) as pool:
+        for extracted in tqdm(
+            pool.imap(extract_match_events, match_timeline_filepaths, chunksize=16),
+            total=len(match_timeline_filepaths),
+        ):
+            if extracted is None:
+                continue
+            match_id, events, frames = extracted
+            for name in CATEGORICAL_COLUMNS:
+                vocabulary = vocabularies[name]
+                events[name] = [
+                    vocabulary.setdefault(value, len(vocabulary))
+                    for value in events[name]
+                ]
+            events["match"] = [len(match_ids)] * len(events["frame"])
+            for name, dtype in EVENT_COLUMNS.items():
+                event_chunks[name].append(np.array(events[name], dtype=dtype))
+            for name, dtype in FRAME_COLUMNS.items():
+                frame_chunks[name].append(np.array(frames[name], dtype=dtype))
+            match_ids.append(match_id)
+            event_counts.append(len(events["frame"]))
+            frame_counts.append(len(frames["frame_timestamp"]))
+
+    table_dir.mkdir(parents=True, exist_ok=True)
+    for chunks, columns in (
+        (event_chunks, EVENT_COLUMNS),
+        (frame_chunks, FRAME_COLUMNS),
+    ):
+        for name, dtype in columns.items():
+            shape = (0, 10) if name in ("total_gold", "level") else (0,)
+            column = (
+                np.concatenate(chunks[name]) if chunks[name] else np.empty(shape, dtype)
+            )
+            np.save(table_dir / f"{name}.npy", column)
+    np.save(
+        table_dir / "event_offsets.npy",
+        np.concatenate([[0], np.cumsum(event_counts)]).astype(np.int64),
+    )
+    np.save(
+        table_dir / "frame_offsets.npy",
+        np.concatenate([[0], np.cumsum(frame_counts)]).astype(np.int64),
+    )
+    metadata = {
+        "format_version": EVENT_TABLE_FORMAT_VERSION,
+        "match_ids": match_ids,
+        # Value of every code, in code order
+        "vocabularies": {
+            name: list(vocabulary) for name, vocabulary in vocabularies.items()
+        },
+    }
+    with (table_dir / "table.json").open(mode="w", encoding="utf-8") as metadata_f:
+        json.dump(metadata, metadata_f)
+    return len(match_ids), sum(event_counts)
+
+
+class EventTable:
+    """The events and per-frame player stats of every stored match, as memory-mapped columns.
+
+    Events of match i are rows eventOffsets[i]:eventOffsets[i + 1] of the event columns (in
+    timeline order) and its frames are rows frameOffsets[i]:frameOffsets[i + 1] of the frame
+    columns. Categorical columns hold codes, see getCode.
+    """
+
+    matchIds: List[str]
+    vocabularies: Dict[str, List[Optional[str]]]
+    columns: Dict[str, np.ndarray]
+    eventOffsets: np.ndarray
+    frameOffsets: np.ndarray
+    _matchIndices: Dict[str, int]
+
+    def __init__(self, table_dir: Path = EVENT_TABLE_DIR, mmap=True) -> None:
+        with (table_dir / "table.json").open(mode="r", encoding="utf-8") as metadata_f:
+            metadata = json.load(metadata_f)
+        if metadata.get("format_version") != EVENT_TABLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported event table version {metadata.get('format_version')}, "
+                "rebuild it with python -m src.event_table"
+            )
+        mmap_mode = "r" if mmap else None
+        self.matchIds = metadata["match_ids"]
+        self.vocabularies = metadata["vocabularies"]
+        self.columns = {
+            name: np.load(table_dir / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in (*EVENT_COLUMNS, *FRAME_COLUMNS)
+        }
+        self.eventOffsets = np.load(table_dir / "event_offsets.npy")
+        self.frameOffsets = np.load(table_dir / "frame_offsets.npy")
+        self._matchIndices = {match_id: i for i, match_id in enumerate(self.matchIds)}
+
+    def __len__(self) -> int:
+        return len(self.matchIds)
+
+    def __contains__(self, matchId: str) -> bool:
+        return matchId in self._matchIndices
+
+    def getMatchIndex(self, matchId: str) -> int:
+        return self._matchIndices[matchId]
+
+    def getCode(self, column: str, value: Optional[str]) -> int:
+        """Code of a value of a categorical column, -1 if no event has it (so it matches nothing)"""
+        vocabulary = self.vocabularies[column]
+        return vocabulary.index(value) if value in vocabulary else MISSING
+
+    def getEvents(self, index: int) -> Dict[str, np.ndarray]:
+        start, end = self.eventOffsets[index], self.eventOffsets[index + 1]
+        return {name: self.columns[name][start:end] for name in EVENT_COLUMNS}
+
+    def getFrames(self, index: int) -> Dict[str, np.ndarray]:
+        start, end = self.frameOffsets[index], self.frameOffsets[index + 1]
+        return {name: self.columns[name][start:end] for name in FRAME_COLUMNS}
+
+    def countEventTypes(self) -> Dict[str, int]:
+        """Number of events of each type in the whole table"""
+        counts = np.bincount(
+            self.columns["type"], minlength=len(self.vocabularies["type"])
+        )
+        return {
+            eventType: int(count)
+            for eventType, count in zip(self.vocabularies["type"], counts)
+            if eventType is not None
+        }
+
+    def toGameEvents(
+        self, events: Dict[str, np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Translate events to normalized GameEvents with the rules of OfflineParser.toGameEvent
+
+        :param events: Event columns (e.g. getEvents of a match)
+        :return: Tuple (frame, type, timestamp, team, player) of the events that change the state
+        """
+        eventType = events["type"]
+        killerTeam = events["killer_team"]
+        monsterType = events["monster_type"]
+        isDragon = monsterType == self.getCode("monster_type", "DRAGON")
+        isEliteKill = eventType == self.getCode("type", "ELITE_MONSTER_KILL")
+        isTowerKill = (eventType == self.getCode("type", "BUILDING_KILL")) & (
+            events["building_type"]
+            != self.getCode("building_type", "INHIBITOR_BUILDING")
+        )
+        isChampionKill = eventType == self.getCode("type", "CHAMPION_KILL")
+        isBaronKill = isEliteKill & (
+            monsterType == self.getCode("monster_type", "BARON_NASHOR")
+        )
+        isElderKill = (
+            isEliteKill
+            & isDragon
+            & (
+                events["monster_sub_type"]
+                == self.getCode("monster_sub_type", "ELDER_DRAGON")
+            )
+        )
+        isDragonKill = (
+            isEliteKill
+            & isDragon
+            & ~isElderKill
+            & ((killerTeam == 100) | (killerTeam == 200))
+        )
+        isSoul = eventType == self.getCode("type", "DRAGON_SOUL_GIVEN")
+
+        gameType = np.full(len(eventType), MISSING, dtype=np.int8)
+        team = np.full(len(eventType), MISSING, dtype=np.int8)
+        player = np.full(len(eventType), MISSING, dtype=np.int8)
+        gameType[isTowerKill] = GameEventType.TOWER_KILL
+        # teamId indicates which team the tower belonged too
+        team[isTowerKill] = np.where(events["team"][isTowerKill] == 200, 0, 1)
+        gameType[isChampionKill] = GameEventType.CHAMPION_KILL
+        player[isChampionKill] = events["victim"][isChampionKill] - 1
+        for isKill, killType in (
+            (isBaronKill, GameEventType.BARON_KILL),
+            (isElderKill, GameEventType.ELDER_KILL),
+            (isDragonKill, GameEventType.DRAGON_KILL),
+        ):
+            gameType[isKill] = killType
+            team[isKill] = np.where(killerTeam[isKill] == 100, 0, 1)
+        gameType[isSoul] = GameEventType.DRAGON_SOUL
+        team[isSoul] = events["team"][isSoul] // 100 - 1
+
+        keep = gameType != MISSING
+        return (
+            events["frame"][keep],
+            gameType[keep],
+            events["timestamp"][keep].astype(np.int64),
+            team[keep],
+            player[keep],
+        )
+
+    def getTrace(self, index: int, jit=JIT_ENABLED) -> EventTrace:
+        """Game state at every frame of a match, without reading its timeline"""
+        frame, gameType, timestamp, team, player = self.toGameEvents(
+            self.getEvents(index)
+        )
+        frameTimes = self.getFrames(index)["frame_timestamp"].astype(np.int64)
+        eventOffsets = np.searchsorted(frame, np.arange(len(frameTimes) + 1))
+        return trace_events(
+            frameTimes, eventOffsets, gameType, timestamp, team, player, jit
+        )
+
+    def getTimeSeriesFeatures(
+        self,
+        index: int,
+        plan: ExtractionPlan = DEFAULT_PLAN,
+        jit=JIT_ENABLED,
+        sampling: Sampling = FRAME_SAMPLING,
+    ) -> List[np.ndarray]:
+        """Same samples as training_data_processor.generate_time_series_features of the match's timeline"""
+        frames = self.getFrames(index)
+        if not sampling.perFrame:
+            _, gameType, timestamp, team, player = self.toGameEvents(
+                self.getEvents(index)
+            )
+            resolved = resolve_events(
+                sampling,
+                frames["frame_timestamp"].astype(np.int64),
+                frames["total_gold"].astype(np.int64),
+                frames["level"].astype(np.int64),
+                gameType,
+                timestamp,
+                team,
+                player,
+                jit,
+            )
+            state = GameState()
+            time_series = []
+            for i, timestamp in enumerate(resolved.sampleTimes.tolist()):
+                state.loadTrace(resolved.trace, i)
+                sample = state.getSample(
+                    timestamp,
+                    resolved.gold[i],  # type: ignore
+                    resolved.level[i],
+                    resolved.alive[i],
+                    plan=plan,
+                )
+                time_series.append(sample.getValue(SampleFormatting.TAKE_DIFF))
+            return time_series
+
+        trace = self.getTrace(index, jit)
+        frameTimes = frames["frame_timestamp"].tolist()
+        gold = frames["total_gold"].astype(np.int64)
+        level = frames["level"].astype(np.int64)
+        state = GameState()
+        time_series = []
+        for i, timestamp in enumerate(frameTimes):
+            state.loadTrace(trace, i)
+            sample = state.getSample(timestamp, gold[i], level[i], plan=plan)
+            time_series.append(sample.getValue(SampleFormatting.TAKE_DIFF))
+        return time_series
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Extract the events of every stored timeline into a columnar table"
+    )
+    arg_parser.add_argument("--processes", type=int, default=None)
+    arg_parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the number of events of each type of an existing table",
+    )
+    args = arg_parser.parse_args()
+    if not args.stats:
+        num_matches, num_events = build_event_table(processes=args.processes)
+        print(
+            f"Wrote {num_events} events of {num_matches} matches to {EVENT_TABLE_DIR}"
+        )
+    table = EventTable()
+    for eventType, count in sorted(
+        table.countEventTypes().items(), key=lambda item: -item[1]
+    ):
+        print(f"{eventType:<32} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,113 +1,181 @@
 from enum import Enum, auto, unique
-from typing import Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+import numpy as np
+
+if TYPE_CHECKING:
+    from src.parsers.GameState import GameState
 
 
-class TeamStat:
-    """A feature that has seperate value for each team"""
+@unique
+class FeatureKeys(Enum):
+    """The feature keys of a feature map, their order is the column order of every sample"""
 
-    team1: Union[float, int]
-    team2: Union[float, int]
+    # auto will assign a unique value to each key
+    TimeStamp = auto()
+    GoldPercentageTop = auto()
+    GoldPercentageJg = auto()
+    GoldPercentageMid = auto()
+    GoldPercentageBot = auto()
+    GoldPercentageSup = auto()
+    TotalTeamLevel = auto()
+    AlivePlayers = auto()
+    TowerKills = auto()
+    DragonSoul = auto()
+    DragonKills = auto()
+    PlayersWithElderBuff = auto()
+    ElderBuffRemaining = auto()
+    PlayersWithBaronBuff = auto()
+    BaronBuffRemaining = auto()
 
-    def getValue(self, flipTeam=False) -> Tuple[Union[float, int], Union[float, int]]:
-        if flipTeam:
-            return (self.team2, self.team1)
-        else:
-            return (self.team1, self.team2)
 
+@unique
+class FeatureInput(Enum):
+    """The data a feature is computed from, parsers skip the inputs no enabled feature needs"""
 
-class GameStat:
-    """A feature that defines a value for the game so only one value is needed"""
+    TIMESTAMP = auto()
+    # Gold of each player (total gold offline, items value live)
+    GOLD = auto()
+    LEVEL = auto()
+    ALIVE = auto()
+    # Objectives and buffs tracked by GameState from the events
+    STATE = auto()
 
-    val: Union[float, int]
 
-    def getValue(self) -> Union[float, int]:
-        return self.val
+class FrameInputs(NamedTuple):
+    """The inputs of the features at one moment of the game, players are indexed like GameEvent.player"""
 
+    timestamp: int
+    gold: Optional[np.ndarray]
+    level: Optional[np.ndarray]
+    alive: Optional[np.ndarray]
+    state: "GameState"
+
+
+Value = Union[float, int]
+
+
+class Feature(NamedTuple):
+    key: FeatureKeys
+    inputs: FrozenSet[FeatureInput]
+    # Returns a value for the game or, for team features, a (team 1, team 2) pair
+    compute: Callable[[FrameInputs], Union[Value, Tuple[Value, Value]]]
+    isTeamStat: bool
 
-class TimeStamp(GameStat):
-    """Game time (the in-game time)"""
 
-    def __init__(self, timestamp: int) -> None:
-        super()
-        self.val = timestamp
+FEATURE_REGISTRY: Dict[FeatureKeys, Feature] = {}
+
+
+def register_feature(key: FeatureKeys, inputs: Iterable[FeatureInput], team=True):
+    """Register the decorated function as the computation of a feature
+
+    :param key: Key of the feature, its position in FeatureKeys is its column
+    :param inputs: The inputs the function reads from FrameInputs
+    :param team: Whether the feature has a value for each team or a single value for the game
+    """
+
+    def register(compute):
+        if key in FEATURE_REGISTRY:
+            raise ValueError(f"Feature {key.name} is already registered")
+        FEATURE_REGISTRY[key] = Feature(key, frozenset(inputs), compute, team)
+        return compute
+
+    return register
+
+
+@register_feature(FeatureKeys.TimeStamp, [FeatureInput.TIMESTAMP], team=False)
+def timestamp(frame: FrameInputs):
+    """Game time (the in-game time)"""
+    return frame.timestamp
 
 
 # This is currently computing gold (NOT PERCENTAGE)
 # We saw some improvement in using this vs. percentage
-class GoldPercentage(TeamStat):
-    """Gold % (player gold / total gold in game)"""
+def lane_gold(position: int):
+    """Gold % (player gold / total gold in game) of the players of a position"""
 
-    def __init__(self, totalGold: int, player1Gold: int, player2Gold: int) -> None:
-        super()
-        # self.team1 = player1Gold / max(totalGold, 1)
-        # self.team2 = player2Gold / max(totalGold, 1)
-        self.team1 = player1Gold
-        self.team2 = player2Gold
+    def compute(frame: FrameInputs):
+        return frame.gold[position], frame.gold[position + 5]  # type: ignore
 
+    return compute
 
-class TotalTeamLevel(TeamStat):
-    """Total team XP"""
 
-    def __init__(self, totalLevelTeam1: int, totalLevelTeam2: int) -> None:
-        super()
-        self.team1 = totalLevelTeam1
-        self.team2 = totalLevelTeam2
+for _key, _position in (
+    (FeatureKeys.GoldPercentageTop, 0),
+    (FeatureKeys.GoldPercentageJg, 1),
+    (FeatureKeys.GoldPercentageMid, 2),
+    (FeatureKeys.GoldPercentageBot, 3),
+    (FeatureKeys.GoldPercentageSup, 4),
+):
+    register_feature(_key, [FeatureInput.GOLD])(lane_gold(_position))
 
 
-class AlivePlayers(TeamStat):
-    """Number of players alive"""
+@register_feature(FeatureKeys.TotalTeamLevel, [FeatureInput.LEVEL])
+def total_team_level(frame: FrameInputs):
+    """Total team XP"""
+    return frame.level[:5].sum(), frame.level[5:].sum()  # type: ignore
 
-    def __init__(self, alivePlayersTeam1: int, alivePlayersTeam2: int) -> None:
-        super()
-        self.team1 = alivePlayersTeam1
-        self.team2 = alivePlayersTeam2
 
+@register_feature(FeatureKeys.AlivePlayers, [FeatureInput.ALIVE])
+def alive_players(frame: FrameInputs):
+    """Number of players alive"""
+    return frame.alive[:5].sum(), frame.alive[5:].sum()  # type: ignore
 
-class TowerKills(TeamStat):
-    """Tower kills"""
 
-    def __init__(self, towerKillsTeam1: int, towerKillsTeam2: int) -> None:
-        super()
-        self.team1 = towerKillsTeam1
-        self.team2 = towerKillsTeam2
+@register_feature(FeatureKeys.TowerKills, [FeatureInput.STATE])
+def tower_kills(frame: FrameInputs):
+    """Tower kills"""
+    towersTaken = frame.state.towersTaken
+    return towersTaken[0], towersTaken[1]
 
 
-class DragonKills(TeamStat):
-    """Dragon kills"""
+@register_feature(FeatureKeys.DragonSoul, [FeatureInput.STATE])
+def dragon_soul(frame: FrameInputs):
+    """Whether a team has dragon soul or not"""
+    return int(frame.state.dragonSoulTaken == 1), int(frame.state.dragonSoulTaken == 2)
 
-    def __init__(self, dragonKillsTeam1: int, dragonKillsTeam2: int) -> None:
-        super()
-        self.team1 = dragonKillsTeam1
-        self.team2 = dragonKillsTeam2
 
+@register_feature(FeatureKeys.DragonKills, [FeatureInput.STATE])
+def dragon_kills(frame: FrameInputs):
+    """Dragon kills"""
+    dragonsTaken = frame.state.dragonsTaken
+    return dragonsTaken[0], dragonsTaken[1]
 
-class TeamHasDragonSoul(TeamStat):
-    """Whether a team has dragon soul or not"""
 
-    def __init__(self, teamOneHasSoul: bool, teamTwoHasSoul: bool) -> None:
-        super()
-        self.team1 = int(teamOneHasSoul)
-        self.team2 = int(teamTwoHasSoul)
+@register_feature(FeatureKeys.PlayersWithElderBuff, [FeatureInput.STATE])
+def players_with_elder(frame: FrameInputs):
+    """Number of players with an active elder buff"""
+    playerHasElder = frame.state.playerHasElder
+    return playerHasElder[:5].sum(), playerHasElder[5:].sum()
 
 
-class PlayersWithActiveBuff(TeamStat):
-    """Number of players with an active buff (baron, elder)"""
+@register_feature(FeatureKeys.ElderBuffRemaining, [FeatureInput.STATE])
+def elder_remaining(frame: FrameInputs):
+    """Elder timer (time until the buff expires for the team)"""
+    return frame.state.getElderBuffDurationByTeam()
 
-    def __init__(
-        self, playersWithActiveTeam1: int, playersWithActiveTeam2: int
-    ) -> None:
-        super()
-        self.team1 = playersWithActiveTeam1
-        self.team2 = playersWithActiveTeam2
 
+@register_feature(FeatureKeys.PlayersWithBaronBuff, [FeatureInput.STATE])
+def players_with_baron(frame: FrameInputs):
+    """Number of players with an active baron buff"""
+    playerHasBaron = frame.state.playerHasBaron
+    return playerHasBaron[:5].sum(), playerHasBaron[5:].sum()
 
-class BuffRemaining(TeamStat):
-    """Baron/Elder timers (time until buff expires for the team)"""
 
-    def __init__(self, durationTeam1: int, durationTeam2: int) -> None:
-        super()
-        self.team1 = durationTeam1
-        self.team2 = durationTeam2
+@register_feature(FeatureKeys.BaronBuffRemaining, [FeatureInput.STATE])
+def baron_remaining(frame: FrameInputs):
+    """Baron timer (time until the buff expires for the team)"""
+    return frame.state.getBaronBuffDurationByTeam()
 
 
 # Maybe later ..
@@ -115,23 +183,71 @@ class BuffRemaining(TeamStat):
 # - Inhibitor timers (how long until an inhibitor respawns) for each inhibitor
 
 
-@unique
-class FeatureKeys(Enum):
-    """The feature keys of a feature map"""
-
-    # auto will assign a unique value to each key
-    TimeStamp = auto()
-    GoldPercentageTop = auto()
-    GoldPercentageJg = auto()
-    GoldPercentageMid = auto()
-    GoldPercentageBot = auto()
-    GoldPercentageSup = auto()
-    TotalTeamLevel = auto()
-    AlivePlayers = auto()
-    TowerKills = auto()
-    DragonSoul = auto()
-    DragonKills = auto()
-    PlayersWithElderBuff = auto()
-    ElderBuffRemaining = auto()
-    PlayersWithBaronBuff = auto()
-    BaronBuffRemaining = auto()
+class ExtractionPlan:
+    """The features enabled for a model, compiled into the computations to run for every sample.
+
+    Columns always follow the FeatureKeys order whatever the order the keys were given in,
+    so a plan built from a model's feature_keys reproduces the columns it was trained on.
+    """
+
+    keys: Tuple[FeatureKeys, ...]
+    gameKeys: Tuple[FeatureKeys, ...]
+    teamKeys: Tuple[FeatureKeys, ...]
+    inputs: FrozenSet[FeatureInput]
+    _gameComputes: List[Callable]
+    _teamComputes: List[Callable]
+
+    def __init__(self, keys: Optional[Iterable[FeatureKeys]] = None) -> None:
+        enabled = set(FeatureKeys if keys is None else keys)
+        if not enabled:
+            raise ValueError("An extraction plan needs at least one feature")
+        unregistered = [key.name for key in enabled if key not in FEATURE_REGISTRY]
+        if unregistered:
+            raise ValueError(f"Features {unregistered} are not registered")
+        features = [FEATURE_REGISTRY[key] for key in FeatureKeys if key in enabled]
+        self.keys = tuple(feature.key for feature in features)
+        self.gameKeys = tuple(f.key for f in features if not f.isTeamStat)
+        self.teamKeys = tuple(f.key for f in features if f.isTeamStat)
+        self.inputs = frozenset().union(*(feature.inputs for feature in features))
+        self._gameComputes = [f.compute for f in features if not f.isTeamStat]
+        self._teamComputes = [f.compute for f in features if f.isTeamStat]
+
+    @classmethod
+    def fromNames(cls, names: Iterable[str]) -> "ExtractionPlan":
+        """Plan of the features named like FeatureKeys (e.g. the feature_keys of a model)"""
+        try:
+            return cls(FeatureKeys[name] for name in names)
+        except KeyError as e:
+            raise ValueError(f"Unknown feature {e}") from None
+
+    def __reduce__(self):
+        # The computations are closures, plans are sent to worker processes by their keys
+        return (ExtractionPlan, (self.keys,))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ExtractionPlan) and self.keys == other.keys
+
+    def __hash__(self) -> int:
+        return hash(self.keys)
+
+    def getNames(self) -> List[str]:
+        return [key.name for key in self.keys]
+
+    def needs(self, featureInput: FeatureInput) -> bool:
+        return featureInput in self.inputs
+
+    def computeGameValues(self, frame: FrameInputs) -> np.ndarray:
+        if not self._gameComputes:
+            return np.zeros(0, dtype=np.int64)
+        return np.array([compute(frame) for compute in self._gameComputes])
+
+    def computeTeamValues(self, frame: FrameInputs) -> np.ndarray:
+        """Values of the team features, shape (2, number of team features)"""
+        if not self._teamComputes:
+            return np.zeros((2, 0), dtype=np.int64)
+        values = [compute(frame) for compute in self._teamComputes]
+        return np.array(values).reshape(-1, 2).T
+
+
+# Every registered feature, the features of the models trained so far
+DEFAULT_PLAN = ExtractionPlan()
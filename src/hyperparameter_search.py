@@ -0,0 +1,195 @@
+import argparse
+import csv
+import itertools
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from random import Random
+from typing import Dict, List, Optional
+import xgboost as xgb
+from src.trainer import PARAMS, load_in_memory_dataset
+from src.utils import group_train_validation_indices
+
+SEARCH_CACHE_DIR = Path.cwd() / "matches" / "dataset" / "search_cache"
+SEARCH_RESULTS_FILEPATH = Path.cwd() / "matches" / "dataset" / "search_results.csv"
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 6, 8],
+    "eta": [0.03, 0.1, 0.3],
+    "min_child_weight": [1, 5, 10],
+    "subsample": [0.7, 1.0],
+    "colsample_bytree": [0.7, 1.0],
+}
+
+# DMatrices of the worker process, loaded once and reused by every trial it runs
+_dtrain: Optional[xgb.DMatrix] = None
+_dval: Optional[xgb.DMatrix] = None
+
+
+def build_search_cache(cache_dir: Path):
+    """Split the dataset by match once and save the train/validation DMatrices in XGBoost's binary format
+
+    :param cache_dir: Path to the directory to save the DMatrices to
+    :return: Tuple (train DMatrix path, validation DMatrix path)
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    train_path = cache_dir / "train.buffer"
+    val_path = cache_dir / "validation.buffer"
+    X, y, groups = load_in_memory_dataset()
+    train_indices, val_indices = group_train_validation_indices(
+        groups, validation_size=0.1, seed=42
+    )
+    xgb.DMatrix(X[train_indices], y[train_indices]).save_binary(train_path)
+    xgb.DMatrix(X[val_indices], y[val_indices]).save_binary(val_path)
+    return train_path, val_path
+
+
+def grid_trials(space: Dict[str, list]) -> List[dict]:
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+
+def random_trials(space: Dict[str, list], num_trials: int, seed=42) -> List[dict]:
+    """num_trials distinct configurations of the grid, all of them if it has fewer"""
+    trials = grid_trials(space)
+    return Random(seed).sample(trials, min(num_trials, len(trials)))
+
+
+def _load_worker_cache(train_path: Path, val_path: Path):
+    global _dtrain, _dval
+    _dtrain = xgb.DMatrix(train_path)
+    _dval = xgb.DMatrix(val_path)
+
+
+def run_trial(trial: dict, nthread: int, num_boost_round: int) -> dict:
+    """Train one trial on the worker's cached DMatrices
+
+    :param trial: XGBoost parameters of the trial
+    :param nthread: Number of threads of the trial
+    :param num_boost_round: Maximum number of boosting rounds
+    :return: Results row with the parameters, wall time, worker peak memory so far and validation metrics
+    """
+    evals_result = {}
+    start = time.perf_counter()
+    booster = xgb.train(
+        {**PARAMS, **trial, "nthread": nthread},
+        _dtrain,  # type: ignore
+        num_boost_round=num_boost_round,
+        evals=[(_dval, "validation")],
+        early_stopping_rounds=10,
+        evals_result=evals_result,
+        verbose_eval=False,
+    )
+    wall_seconds = time.perf_counter() - start
+    best = booster.best_iteration
+    return {
+        **trial,
+        "num_boost_round": num_boost_round,
+        "best_iteration": best,
+        "validation_logloss": evals_result["validation"]["logloss"][best],
+        "validation_accuracy": 1 - evals_result["validation"]["error"][best],
+        "wall_seconds": round(wall_seconds, 3),
+        # Peak of the worker process since it started, including its earlier trials (kilobytes on Linux)
+        "worker_peak_rss_so_far_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def create_trial_pool(cache_paths, workers: int) -> ProcessPoolExecutor:
+    """Process pool whose workers load the cached DMatrices once and keep them for every trial"""
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_load_worker_cache, initargs=cache_paths
+    )
+
+
+def run_trials(
+    pool: ProcessPoolExecutor, trials: List[dict], nthread: int, num_boost_round=100
+) -> List[dict]:
+    futures = [
+        pool.submit(run_trial, trial, nthread, num_boost_round) for trial in trials
+    ]
+    results = []
+    for future in futures:
+        results.append(future.result())
+        print(results[-1])
+    return results
+
+
+def successive_halving(
+    pool: ProcessPoolExecutor,
+    trials: List[dict],
+    nthread: int,
+    min_rounds=10,
+    max_rounds=300,
+    reduction=3,
+) -> List[dict]:
+    """Train every trial with a small budget of rounds and keep the best 1/reduction with reduction times the budget
+
+    :return: Results of every rung, with a 'rung' column
+    """
+    results = []
+    rung = 0
+    num_boost_round = min_rounds
+    while trials:
+        rung_results = run_trials(pool, trials, nthread, num_boost_round)
+        for result in rung_results:
+            result["rung"] = rung
+        results += rung_results
+        if len(trials) == 1 or num_boost_round >= max_rounds:
+            break
+        ranked = sorted(
+            zip(rung_results, trials), key=lambda pair: pair[0]["validation_logloss"]
+        )
+        trials = [trial for _, trial in ranked[: max(1, len(trials) // reduction)]]
+        num_boost_round = min(num_boost_round * reduction, max_rounds)
+        rung += 1
+    return results
+
+
+def write_results(results: List[dict], results_path: Path):
+    fieldnames: List[str] = []
+    for result in results:
+        fieldnames += [key for key in result if key not in fieldnames]
+    with results_path.open(mode="w", encoding="utf-8", newline="") as results_f:
+        writer = csv.DictWriter(results_f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Search XGBoost hyperparameters")
+    arg_parser.add_argument(
+        "--strategy", choices=["grid", "random", "halving"], default="random"
+    )
+    arg_parser.add_argument("--trials", type=int, default=20)
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument(
+        "--nthread",
+        type=int,
+        default=None,
+        help="Threads per trial, defaults to the cores shared evenly between workers",
+    )
+    args = arg_parser.parse_args()
+    nthread = args.nthread or max(1, (os.cpu_count() or 1) // args.workers)
+
+    cache_paths = build_search_cache(SEARCH_CACHE_DIR)
+    with create_trial_pool(cache_paths, args.workers) as pool:
+        if args.strategy == "grid":
+            results = run_trials(pool, grid_trials(SEARCH_SPACE), nthread)
+        elif args.strategy == "random":
+            trials = random_trials(SEARCH_SPACE, args.trials)
+            results = run_trials(pool, trials, nthread)
+        else:
+            trials = random_trials(SEARCH_SPACE, args.trials)
+            results = successive_halving(pool, trials, nthread)
+
+    write_results(results, SEARCH_RESULTS_FILEPATH)
+    best = min(results, key=lambda result: result["validation_logloss"])
+    print(f"Best trial: {best}")
+    print(f"Results written to {SEARCH_RESULTS_FILEPATH}")
+
+
+if __name__ == "__main__":
+    main()
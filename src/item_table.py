@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+ITEM_DATA_PATH = Path.cwd() / "datadragon" / "item.json"
+# Only the item costs of item.json, which is all the live path needs and a fraction of its size
+ITEM_COSTS_PATH = Path.cwd() / "datadragon" / "item_costs.json"
+
+
+def compile_item_costs(
+    item_data_path: Path = ITEM_DATA_PATH, item_costs_path: Path = ITEM_COSTS_PATH
+):
+    """Extract the total cost of every item from the Data Dragon item data
+
+    :param item_data_path: Path to the Data Dragon item.json
+    :param item_costs_path: Path to write the compiled table to
+    :return: Number of items in the table
+    """
+    with open(item_data_path, "r", encoding="utf-8") as f:
+        itemsJson = json.load(f)
+    ids = sorted(int(itemId) for itemId in itemsJson["data"])
+    table = {
+        "version": itemsJson["version"],
+        "ids": ids,
+        "costs": [itemsJson["data"][str(itemId)]["gold"]["total"] for itemId in ids],
+    }
+    with open(item_costs_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, separators=(",", ":"))
+    return len(ids)
+
+
+def load_item_costs(item_costs_path: Path = ITEM_COSTS_PATH) -> Dict[int, int]:
+    """Load the compiled item table as a mapping from item ID to total cost"""
+    with open(item_costs_path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    return dict(zip(table["ids"], table["costs"]))
+
+
+def get_data_dragon_version(item_costs_path: Path = ITEM_COSTS_PATH) -> Optional[str]:
+    try:
+        with open(item_costs_path, "r", encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except IOError:
+        return None
+
+
+def main():
+    num_items = compile_item_costs()
+    print(f"Compiled {num_items} item costs into {ITEM_COSTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+from pathlib import Path
+from typing import List
+import numpy as np
+
+
+class TreeEnsemble:
+    """Gradient boosted trees of a binary:logistic XGBoost booster, evaluated with numpy alone.
+
+    Loading it does not import XGBoost, which is most of the startup time of the live path.
+    Nodes of every tree are stored in flat arrays, leaves have feature -1 and point to themselves.
+    """
+
+    feature: np.ndarray
+    threshold: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    missing: np.ndarray
+    value: np.ndarray
+    roots: np.ndarray
+    baseMargin: float
+    _depth: int
+
+    def __init__(
+        self, feature, threshold, left, right, missing, value, roots, baseMargin
+    ) -> None:
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing = missing
+        self.value = value
+        self.roots = roots
+        self.baseMargin = baseMargin
+        self._depth = self._getDepth()
+
+    @classmethod
+    def fromBooster(cls, booster) -> "TreeEnsemble":
+        """Flatten the trees a booster predicts with (up to its best iteration)"""
+        config = json.loads(booster.save_config())
+        baseScore = float(config["learner"]["learner_model_param"]["base_score"])
+        featureNames = booster.feature_names
+        bestIteration = booster.attr("best_iteration")
+        dump = booster.get_dump(dump_format="json")
+        if bestIteration is not None:
+            dump = dump[: int(bestIteration) + 1]
+
+        feature: List[int] = []
+        threshold: List[float] = []
+        left: List[int] = []
+        right: List[int] = []
+        missing: List[int] = []
+        value: List[float] = []
+        roots: List[int] = []
+
+        def addNode(node: dict) -> int:
+            index = len(feature)
+            feature.append(-1)
+            threshold.append(0.0)
+            left.append(index)
+            right.append(index)
+            missing.append(index)
+            value.append(node.get("leaf", 0.0))
+            if "leaf" in node:
+                return index
+            split = node["split"]
+            feature[index] = (
+                featureNames.index(split) if featureNames else int(split[1:])
+            )
+            threshold[index] = node["split_condition"]
+            children = {child["nodeid"]: addNode(child) for child in node["children"]}
+            left[index] = children[node["yes"]]
+            right[index] = children[node["no"]]
+            missing[index] = children[node["missing"]]
+            return index
+
+        for tree in dump:
+            roots.append(addNode(json.loads(tree)))
+
+        return cls(
+            np.array(feature, dtype=np.int32),
+            np.array(threshold, dtype=np.float32),
+            np.array(left, dtype=np.int32),
+            np.array(right, dtype=np.int32),
+            np.array(missing, dtype=np.int32),
+            np.array(value, dtype=np.float32),
+            np.array(roots, dtype=np.int32),
+            # base_score is a probability, leaves add up in log-odds
+            float(np.log(baseScore / (1 - baseScore))),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "TreeEnsemble":
+        with np.load(path) as trees:
+            return cls(
+                trees["feature"],
+                trees["threshold"],
+                trees["left"],
+                trees["right"],
+                trees["missing"],
+                trees["value"],
+                trees["roots"],
+                float(trees["base_margin"]),
+            )
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            missing=self.missing,
+            value=self.value,
+            roots=self.roots,
+            base_margin=self.baseMargin,
+        )
+
+    def _getDepth(self) -> int:
+        depth = 0
+        nodes = self.roots
+        while len(nodes):
+            inner = nodes[self.feature[nodes] >= 0]
+            if not len(inner):
+                break
+            nodes = np.concatenate([self.left[inner], self.right[inner]])
+            depth += 1
+        return depth
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Same output as XGBClassifier.predict_proba: one (loss, win) probability row per sample"""
+        # XGBoost compares features as float32
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self._depth):
+            feature = self.feature[nodes]
+            x = X[rows, np.maximum(feature, 0)]
+            nodes = np.where(
+                np.isnan(x),
+                self.missing[nodes],
+                np.where(
+                    x < self.threshold[nodes], self.left[nodes], self.right[nodes]
+                ),
+            )
+        margin = self.value[nodes].sum(axis=1, dtype=np.float32) + self.baseMargin
+        p = 1 / (1 + np.exp(-margin))
+        return np.column_stack([1 - p, p])
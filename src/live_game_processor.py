@@ -1,25 +1,30 @@
-import json
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 import requests
-import schedule
+from src.features.features import DEFAULT_PLAN
 from src.parsers.Sample import SampleFormatting
 from src.parsers.LiveFrame import LiveFrame
 from src.parsers.LiveParser import LiveParser
-from src.utils import load_model
+from src.item_table import load_item_costs
+from src.model_artifact import (
+    MODEL_PATH,
+    get_extraction_plan,
+    load_lean_model,
+    read_sidecar,
+)
+from src.live_metrics import LIVE_METRICS, METRICS_PORT, MetricsServer
+from src.profiling import PROFILER, setup_from_env
 
 CERT_PATH = Path.cwd() / "matches" / "riotgames.pem"
-ITEM_DATA_PATH = Path.cwd() / "datadragon" / "item.json"
 load_dotenv()
 HOST = "127.0.0.1" if os.getenv("ENV") != "DOCKER" else "host.docker.internal"
+# Override to point at a stand-in server (e.g. a replayed session) instead of the game client
+LIVE_CLIENT_URL = os.getenv("LIVE_CLIENT_URL", f"https://{HOST}:2999")
 
 
-def collect_live_data(model):
-
-    with open(ITEM_DATA_PATH, "r", encoding="utf-8") as f:
-        itemsJson = json.load(f)
-
+def collect_live_data(model, itemCosts, plan=DEFAULT_PLAN):
     # Starting loop to establish connection and get the first frame right at the start of the game
     team = ""
     while True:
@@ -28,16 +33,25 @@ def collect_live_data(model):
             break
         except requests.exceptions.ConnectionError:
             print(
-                f"Could not establish a connection to the League of Legends Live Client Data API {HOST}. Retrying..."
+                f"Could not establish a connection to the League of Legends Live Client Data API {LIVE_CLIENT_URL}. Retrying..."
             )
         except requests.exceptions.HTTPError:
             print("HTTP error. Retrying...")
 
-    parser = LiveParser(team != "ORDER")
+    parser = LiveParser(team != "ORDER", debug=True, plan=plan)
+    # Predict right away instead of after the first 10 seconds of the schedule
+    try:
+        add_current_frame_to_time_series(parser, itemCosts, model)
+    except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError):
+        LIVE_METRICS.observeError()
+
+    # Not needed before the first prediction, so it isn't imported at startup
+    import schedule
+
     schedule.every(10).seconds.do(
         add_current_frame_to_time_series,
         parser=parser,
-        itemsJson=itemsJson,
+        itemCosts=itemCosts,
         model=model,
     )
 
@@ -46,24 +60,35 @@ def collect_live_data(model):
         try:
             schedule.run_pending()
         except requests.exceptions.ConnectionError:
+            LIVE_METRICS.observeError()
             print(
                 "Could not establish a connection to the League of Legends Live Client Data API. Retrying..."
             )
         except requests.exceptions.HTTPError:
+            LIVE_METRICS.observeError()
             print("HTTP error. Retrying...")
 
 
-def getPlayerTeam():
-    nameReq = requests.get(
-        f"https://{HOST}:2999/liveclientdata/activeplayername", verify=False, timeout=10
-    )
-    playerListReq = requests.get(
-        f"https://{HOST}:2999/liveclientdata/playerlist", verify=False, timeout=10
-    )
-    nameReq.raise_for_status()
-    playerListReq.raise_for_status()
-    name = nameReq.json()
-    for player in playerListReq.json():
+def fetch_live_endpoint(endpoint, base_url=LIVE_CLIENT_URL):
+    """Fetch and decode a single Live Client Data API endpoint
+
+    :param endpoint: Name of the endpoint under /liveclientdata (e.g. 'gamestats')
+    :param base_url: Scheme, host and port of the Live Client Data API
+    :return: Decoded JSON response
+    """
+    with LIVE_METRICS.time(f"fetch.{endpoint}"):
+        response = requests.get(
+            f"{base_url}/liveclientdata/{endpoint}", verify=False, timeout=10
+        )
+        response.raise_for_status()
+    PROFILER.count("bytes_read", len(response.content))
+    with LIVE_METRICS.time(f"json_decode.{endpoint}"):
+        return response.json()
+
+
+def getPlayerTeam(base_url=LIVE_CLIENT_URL):
+    name = fetch_live_endpoint("activeplayername", base_url)
+    for player in fetch_live_endpoint("playerlist", base_url):
         if player["riotId"] == name:
             return player["team"]
     # Should always find player in playerList
@@ -72,36 +97,33 @@ def getPlayerTeam():
 
 def add_current_frame_to_time_series(
     parser,
-    itemsJson,
+    itemCosts,
     model,
+    base_url=LIVE_CLIENT_URL,
 ):
-    response_game_info = requests.get(
-        f"https://{HOST}:2999/liveclientdata/gamestats", verify=False, timeout=10
-    )
-    response_player_info = requests.get(
-        f"https://{HOST}:2999/liveclientdata/playerlist", verify=False, timeout=10
-    )
-    response_event_info = requests.get(
-        f"https://{HOST}:2999/liveclientdata/eventdata", verify=False, timeout=10
-    )
-
-    response_game_info.raise_for_status()
-    response_player_info.raise_for_status()
-
-    game_info = response_game_info.json()
-    player_info = response_player_info.json()
-    events_info = response_event_info.json()
-
-    frame = LiveFrame(
-        game_info["gameTime"],
-        events_info,
-        player_info,
-        itemsJson,
-    )
+    with LIVE_METRICS.time("poll"):
+        game_info = fetch_live_endpoint("gamestats", base_url)
+        player_info = fetch_live_endpoint("playerlist", base_url)
+        events_info = fetch_live_endpoint("eventdata", base_url)
+
+        with LIVE_METRICS.time("LiveFrame"):
+            frame = LiveFrame(
+                game_info["gameTime"],
+                events_info,
+                player_info,
+                itemCosts,
+            )
 
-    sample = parser.getNextFrame(frame)
-    obs = sample.getValue(SampleFormatting.TAKE_DIFF)
-    print(model.predict_proba(obs)[0][1])
+        with LIVE_METRICS.time("LiveParser.getNextFrame"):
+            sample = parser.getNextFrame(frame)
+        with LIVE_METRICS.time("Sample.getValue"):
+            obs = sample.getValue(SampleFormatting.TAKE_DIFF)
+        with LIVE_METRICS.time("predict_proba"):
+            prediction = model.predict_proba(obs)[0][1]
+    LIVE_METRICS.observePrediction(game_info["gameTime"], float(prediction))
+    PROFILER.count("polls")
+    print(prediction)
+    return prediction
 
 
 def get_prediction(frame, model):
@@ -109,8 +131,20 @@ def get_prediction(frame, model):
 
 
 def main():
-    model = load_model("./models/xgboost")
-    collect_live_data(model)
+    setup_from_env()
+    # Everything is loaded before waiting for the game, so the first poll can be predicted at once.
+    # Raises if the model wasn't trained on the samples this code base builds
+    if "--full-model" in sys.argv:
+        from src.model_artifact import load_model_artifact
+
+        model = load_model_artifact()
+    else:
+        model = load_lean_model()
+    # Only the features the model was trained on are computed
+    plan = get_extraction_plan(read_sidecar(MODEL_PATH))
+    if METRICS_PORT:
+        MetricsServer(LIVE_METRICS, port=METRICS_PORT).startInBackground()
+    collect_live_data(model, load_item_costs(), plan)
 
 
 if __name__ == "__main__":
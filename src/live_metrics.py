@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Optional
+import numpy as np
+from src.profiling import PROFILER
+
+# Port of the local Prometheus endpoint of live_game_processor, 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9210"))
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RollingLatency:
+    """Latencies of the last window observations of a stage, plus all-time sum and count"""
+
+    _window: Deque[float]
+    total: float
+    count: int
+
+    def __init__(self, window=256) -> None:
+        self._window = deque(maxlen=window)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self._window.append(seconds)
+        self.total += seconds
+        self.count += 1
+
+    def getQuantiles(self) -> Dict[float, float]:
+        if not self._window:
+            return {}
+        values = np.quantile(np.array(self._window), QUANTILES)
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class StageTime:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics: "LiveMetrics", name: str) -> None:
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        self._metrics.observe(self._name, seconds)
+        if PROFILER.enabled:
+            PROFILER.addTime(self._name, seconds)
+        return False
+
+
+class LiveMetrics:
+    """Latency of every stage of a live prediction and how far the predictions lag behind the game.
+
+    Drift is the wall time elapsed since the first poll minus the game time elapsed since then,
+    it grows when polls are late (or the game is paused).
+    """
+
+    stages: Dict[str, RollingLatency]
+    polls: int
+    errors: int
+    winProbability: Optional[float]
+    _window: int
+    _lock: threading.Lock
+    _firstPoll: Optional[tuple[float, float]]
+    _lastPoll: Optional[tuple[float, float]]
+    _lastPredictionTime: Optional[float]
+
+    def __init__(self, window=256) -> None:
+        self._window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stages = {}
+        self.polls = 0
+        self.errors = 0
+        self.winProbability = None
+        self._firstPoll = None
+        self._lastPoll = None
+        self._lastPredictionTime = None
+
+    def time(self, name: str) -> StageTime:
+        return StageTime(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = RollingLatency(self._window)
+            self.stages[name].observe(seconds)
+
+    def observePrediction(self, gameTime: float, winProbability: float) -> None:
+        """Record a prediction made for the game state at gameTime (in seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            self.polls += 1
+            self.winProbability = winProbability
+            self._lastPredictionTime = now
+            if self._firstPoll is None or gameTime < self._lastPoll[1]:  # type: ignore
+                # First poll of a (new) game
+                self._firstPoll = (now, gameTime)
+            self._lastPoll = (now, gameTime)
+
+    def observeError(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def getDrift(self) -> Optional[float]:
+        if self._firstPoll is None or self._lastPoll is None:
+            return None
+        return (self._lastPoll[0] - self._firstPoll[0]) - (
+            self._lastPoll[1] - self._firstPoll[1]
+        )
+
+    def renderPrometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP winnable_live_stage_seconds Latency of each stage of a live prediction",
+            "# TYPE winnable_live_stage_seconds summary",
+        ]
+        with self._lock:
+            for name, latency in sorted(self.stages.items()):
+                for quantile, value in latency.getQuantiles().items():
+                    lines.append(
+                        f'winnable_live_stage_seconds{{stage="{name}",quantile="{quantile}"}} {value}'
+                    )
+                lines.append(
+                    f'winnable_live_stage_seconds_sum{{stage="{name}"}} {latency.total}'
+                )
+                lines.append(
+                    f'winnable_live_stage_seconds_count{{stage="{name}"}} {latency.count}'
+                )
+            lines += [
+                "# HELP winnable_live_polls_total Predictions made",
+                "# TYPE winnable_live_polls_total counter",
+                f"winnable_live_polls_total {self.polls}",
+                "# HELP winnable_live_errors_total Polls that failed",
+                "# TYPE winnable_live_errors_total counter",
+                f"winnable_live_errors_total {self.errors}",
+            ]
+            if self._lastPoll is not None:
+                lines += [
+                    "# HELP winnable_live_game_time_seconds Game time of the last prediction",
+                    "# TYPE winnable_live_game_time_seconds gauge",
+                    f"winnable_live_game_time_seconds {self._lastPoll[1]}",
+                    "# HELP winnable_live_drift_seconds Wall time minus game time elapsed since the first poll",
+                    "# TYPE winnable_live_drift_seconds gauge",
+                    f"winnable_live_drift_seconds {self.getDrift()}",
+                    "# HELP winnable_live_prediction_age_seconds Wall time since the last prediction",
+                    "# TYPE winnable_live_prediction_age_seconds gauge",
+                    f"winnable_live_prediction_age_seconds {time.monotonic() - self._lastPredictionTime}",  # type: ignore
+                    "# HELP winnable_live_win_probability Last predicted win probability",
+                    "# TYPE winnable_live_win_probability gauge",
+                    f"winnable_live_win_probability {self.winProbability}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the live processor and the functions it calls
+LIVE_METRICS = LiveMetrics()
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves the metrics of a LiveMetrics under /metrics"""
+
+    daemon_threads = True
+    metrics: LiveMetrics
+
+    def __init__(self, metrics: LiveMetrics, host="127.0.0.1", port=METRICS_PORT):
+        self.metrics = metrics
+        super().__init__((host, port), _MetricsRequestHandler)
+
+    def startInBackground(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    server: MetricsServer
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.renderPrometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,86 @@
+import gzip
+import json
+import time
+from pathlib import Path
+import requests
+from src.live_game_processor import LIVE_CLIENT_URL, fetch_live_endpoint
+
+SESSIONS_DIR = Path.cwd() / "matches" / "live_sessions"
+LOG_FORMAT_VERSION = 1
+# Consecutive polls answered 404 after the game started, after which the game is considered over
+GAME_OVER_POLLS = 5
+
+
+def record_session(log_path: Path, interval=1.0, base_url=LIVE_CLIENT_URL):
+    """Record the raw Live Client Data API responses of a game into a compact log
+
+    The log is a gzip-compressed JSON lines file. The first line is a header with the active player name,
+    every following line is a poll: 't' (seconds since the first poll), 'gamestats', 'playerlist' (omitted
+    when unchanged since the previous poll) and 'events' (only the events that are new since the previous poll).
+
+    :param log_path: Path of the log file to write
+    :param interval: Seconds between two polls
+    :param base_url: Scheme, host and port of the Live Client Data API
+    :return: Number of polls recorded, recording stops when the API closes or keeps answering 404
+    """
+    while True:
+        try:
+            active_player_name = fetch_live_endpoint("activeplayername", base_url)
+            break
+        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError):
+            print(f"Waiting for a game on {base_url}...")
+            time.sleep(interval)
+
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    num_polls = 0
+    num_events = 0
+    last_player_list = None
+    not_found_polls = 0
+    start = time.perf_counter()
+    with gzip.open(log_path, mode="wt", encoding="utf-8") as log_f:
+        header = {"version": LOG_FORMAT_VERSION, "activeplayername": active_player_name}
+        log_f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        while True:
+            poll_start = time.perf_counter()
+            try:
+                game_info = fetch_live_endpoint("gamestats", base_url)
+                player_info = fetch_live_endpoint("playerlist", base_url)
+                events_info = fetch_live_endpoint("eventdata", base_url)
+            except requests.exceptions.ConnectionError:
+                # The client closes the API once the game is over
+                break
+            except requests.exceptions.HTTPError as err:
+                # The endpoints answer 404 while the game loads and once it has ended
+                if err.response is not None and err.response.status_code == 404:
+                    not_found_polls += 1
+                    if num_polls and not_found_polls >= GAME_OVER_POLLS:
+                        break
+                time.sleep(max(0.0, interval - (time.perf_counter() - poll_start)))
+                continue
+            not_found_polls = 0
+
+            entry = {"t": round(poll_start - start, 3), "gamestats": game_info}
+            if player_info != last_player_list:
+                entry["playerlist"] = player_info
+                last_player_list = player_info
+            entry["events"] = events_info["Events"][num_events:]
+            num_events = len(events_info["Events"])
+            log_f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            num_polls += 1
+
+            time.sleep(max(0.0, interval - (time.perf_counter() - poll_start)))
+    return num_polls
+
+
+def main():
+    log_path = SESSIONS_DIR / f"session_{time.strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+    print(f"Recording session to {log_path} ...")
+    try:
+        num_polls = record_session(log_path)
+        print(f"Recorded {num_polls} polls")
+    except KeyboardInterrupt:
+        print("Recording stopped")
+
+
+if __name__ == "__main__":
+    main()
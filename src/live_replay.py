@@ -0,0 +1,119 @@
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from src.parsers.Sample import SampleFormatting
+from src.parsers.LiveFrame import LiveFrame
+from src.parsers.LiveParser import LiveParser
+from src.item_table import load_item_costs
+from src.standins.LiveClientStandIn import LiveClientSource, LiveClientStandIn
+
+
+class LiveSessionLog(LiveClientSource):
+    """A Live Client Data API session recorded by live_recorder.py"""
+
+    activePlayerName: str
+    times: List[float]
+    _gameStats: List[dict]
+    _playerLists: List[list]
+    _eventCounts: List[int]
+    _events: List[dict]
+
+    def __init__(self, log_path: Path) -> None:
+        self.times = []
+        self._gameStats = []
+        self._playerLists = []
+        self._eventCounts = []
+        self._events = []
+        with gzip.open(log_path, mode="rt", encoding="utf-8") as log_f:
+            header = json.loads(next(log_f))
+            self.activePlayerName = header["activeplayername"]
+            for line in log_f:
+                entry = json.loads(line)
+                self.times.append(entry["t"])
+                self._gameStats.append(entry["gamestats"])
+                if "playerlist" in entry:
+                    self._playerLists.append(entry["playerlist"])
+                else:
+                    self._playerLists.append(self._playerLists[-1])
+                self._events.extend(entry["events"])
+                self._eventCounts.append(len(self._events))
+
+    def getSnapshot(self, index: int) -> Dict[str, Any]:
+        return {
+            "gamestats": self._gameStats[index],
+            "playerlist": self._playerLists[index],
+            "eventdata": {"Events": self._events[: self._eventCounts[index]]},
+        }
+
+
+def replay_session(log: LiveSessionLog, itemCosts, model=None, speed=0.0):
+    """Run the live path in-process over every poll of a recorded session
+
+    :param log: Recorded session
+    :param itemCosts: Item costs by item ID (see item_table.py)
+    :param model: Optional model to run predictions with
+    :param speed: Playback speed relative to the recorded session, 0 replays as fast as possible
+    :return: Tuple (number of polls processed, elapsed seconds)
+    """
+    team = ""
+    for player in log.getSnapshot(0)["playerlist"]:
+        if player["riotId"] == log.activePlayerName:
+            team = player["team"]
+    parser = LiveParser(team != "ORDER")
+
+    start = time.perf_counter()
+    for index, poll_time in enumerate(log.times):
+        if speed > 0:
+            wait = (poll_time - log.times[0]) / speed - (time.perf_counter() - start)
+            time.sleep(max(0.0, wait))
+        snapshot = log.getSnapshot(index)
+        frame = LiveFrame(
+            snapshot["gamestats"]["gameTime"],
+            snapshot["eventdata"],
+            snapshot["playerlist"],
+            itemCosts,
+        )
+        sample = parser.getNextFrame(frame)
+        if model is not None:
+            model.predict_proba(sample.getValue(SampleFormatting.TAKE_DIFF))
+    return len(log.times), time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Replay a recorded Live Client Data API session"
+    )
+    arg_parser.add_argument("log_path", type=Path)
+    arg_parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve the session on a local stand-in instead of replaying it in-process",
+    )
+    arg_parser.add_argument("--port", type=int, default=2999)
+    arg_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Playback speed, 0 replays as fast as possible",
+    )
+    args = arg_parser.parse_args()
+
+    log = LiveSessionLog(args.log_path)
+    if args.serve:
+        server = LiveClientStandIn([log], port=args.port, speed=args.speed)
+        print(
+            f"Serving {len(log.times)} polls on {server.getBaseUrl()} "
+            f"(set LIVE_CLIENT_URL to use it)"
+        )
+        server.serve_forever()
+    else:
+        num_polls, elapsed = replay_session(log, load_item_costs(), speed=args.speed)
+        print(f"Processed {num_polls} polls in {elapsed:.3f}s")
+        print(f"Throughput: {num_polls / max(elapsed, 1e-9):.1f} polls/s")
+
+
+if __name__ == "__main__":
+    main()
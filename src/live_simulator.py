@@ -0,0 +1,379 @@
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import requests
+from src.live_game_processor import fetch_live_endpoint
+from src.parsers.Frame import Event, Frame
+from src.parsers.GameState import RESPAWN_TIMES_MS
+from src.parsers.LiveFrame import LiveFrame
+from src.parsers.LiveParser import LiveParser
+from src.parsers.Sample import SampleFormatting
+from src.item_table import load_item_costs
+from src.standins.LiveClientStandIn import LiveClientSource, LiveClientStandIn
+
+MATCH_TIMELINE_DIR = Path.cwd() / "matches" / "match_timeline"
+
+POSITIONS = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+DRAGON_TYPES = {
+    "AIR_DRAGON": "Air",
+    "CHEMTECH_DRAGON": "Chemtech",
+    "EARTH_DRAGON": "Earth",
+    "FIRE_DRAGON": "Fire",
+    "HEXTECH_DRAGON": "Hextech",
+    "WATER_DRAGON": "Water",
+    "ELDER_DRAGON": "Elder",
+}
+
+
+class TimelineLiveFeed(LiveClientSource):
+    """Live Client Data API payloads synthesized from a MATCHv5 timeline.
+
+    Participant stats are taken from the latest timeline frame, inventories, scores and deaths
+    are replayed from the events, so a snapshot is available every interval seconds instead
+    of every timeline frame.
+    """
+
+    activePlayerName: str
+    times: List[float]
+    _gameStats: List[dict]
+    _playerLists: List[list]
+    _eventCounts: List[int]
+    _events: List[dict]
+
+    def __init__(
+        self,
+        frames: List[Frame],
+        itemCosts: Dict[int, int],
+        interval=10.0,
+        positions: Optional[List[str]] = None,
+        activePlayer=0,
+    ) -> None:
+        positions = positions or POSITIONS * 2
+        names = [f"Participant{pid}" for pid in range(1, 11)]
+        self.activePlayerName = f"{names[activePlayer]}#SIM"
+        self.times = []
+        self._gameStats = []
+        self._playerLists = []
+        self._eventCounts = []
+        self._events = [{"EventID": 0, "EventName": "GameStart", "EventTime": 0.0}]
+
+        items: List[List[int]] = [[] for _ in range(10)]
+        kills = [0] * 10
+        deaths = [0] * 10
+        assists = [0] * 10
+        deathTime = [-1e9] * 10
+        towersLost = [0, 0]
+        timelineEvents = [event for frame in frames for event in frame.events]
+        nextEvent = 0
+        nextFrame = 0
+        gameEnd = frames[-1].timestamp / 1000
+        for step in range(int(gameEnd // interval) + 1):
+            gameTime = step * interval
+            while (
+                nextFrame + 1 < len(frames)
+                and frames[nextFrame + 1].timestamp / 1000 <= gameTime
+            ):
+                nextFrame += 1
+            frame = frames[nextFrame]
+            while (
+                nextEvent < len(timelineEvents)
+                and timelineEvents[nextEvent].timestamp / 1000 <= gameTime
+            ):
+                event = timelineEvents[nextEvent]
+                nextEvent += 1
+                liveEvent = self._toLiveEvent(event, names, towersLost)
+                if event.type == "ITEM_PURCHASED":
+                    self._addItem(items, event.participantId, event.itemId, itemCosts)
+                elif event.type in ("ITEM_SOLD", "ITEM_DESTROYED"):
+                    self._removeItem(items, event.participantId, event.itemId)
+                elif event.type == "ITEM_UNDO":
+                    self._removeItem(items, event.participantId, event.beforeId)
+                    self._addItem(items, event.participantId, event.afterId, itemCosts)
+                elif event.type == "CHAMPION_KILL" and event.victimId:
+                    deaths[event.victimId - 1] += 1
+                    deathTime[event.victimId - 1] = event.timestamp / 1000
+                    if event.killerId:
+                        kills[event.killerId - 1] += 1
+                    for pid in event.assistingParticipantIds:
+                        assists[pid - 1] += 1
+                if liveEvent is not None:
+                    liveEvent["EventID"] = len(self._events)
+                    self._events.append(liveEvent)
+
+            players = []
+            for index in range(10):
+                participantFrame = frame.participantFrames[str(index + 1)]
+                level = participantFrame.level
+                respawnTimer = max(
+                    0.0,
+                    deathTime[index]
+                    + RESPAWN_TIMES_MS[min(level, 18) - 1] / 1000
+                    - gameTime,
+                )
+                players.append(
+                    _playerPayload(
+                        names[index],
+                        "ORDER" if index < 5 else "CHAOS",
+                        positions[index],
+                        level,
+                        [
+                            {"itemID": itemId, "displayName": str(itemId)}
+                            for itemId in items[index]
+                        ],
+                        respawnTimer,
+                        {
+                            "assists": assists[index],
+                            "creepScore": participantFrame.minionsKilled
+                            + participantFrame.jungleMinionsKilled,
+                            "deaths": deaths[index],
+                            "kills": kills[index],
+                            "wardScore": 0.0,
+                        },
+                    )
+                )
+            self.times.append(gameTime)
+            self._gameStats.append(
+                {
+                    "gameMode": "CLASSIC",
+                    "gameTime": gameTime,
+                    "mapName": "Map11",
+                    "mapNumber": 11,
+                    "mapTerrain": "Default",
+                }
+            )
+            self._playerLists.append(players)
+            self._eventCounts.append(len(self._events))
+
+    def getSnapshot(self, index: int) -> Dict[str, Any]:
+        return {
+            "gamestats": self._gameStats[index],
+            "playerlist": self._playerLists[index],
+            "eventdata": {"Events": self._events[: self._eventCounts[index]]},
+        }
+
+    @staticmethod
+    def _addItem(
+        items: List[List[int]], participantId, itemId, itemCosts: Dict[int, int]
+    ):
+        # Only items known to the Data Dragon version in use can be priced by LiveFrame
+        if participantId and itemId and itemId in itemCosts:
+            items[participantId - 1].append(itemId)
+
+    @staticmethod
+    def _removeItem(items: List[List[int]], participantId, itemId):
+        if participantId and itemId in items[participantId - 1]:
+            items[participantId - 1].remove(itemId)
+
+    @staticmethod
+    def _toLiveEvent(
+        event: Event, names: List[str], towersLost: List[int]
+    ) -> Optional[dict]:
+        liveEvent: Dict[str, Any] = {"EventTime": event.timestamp / 1000}
+        killerName = names[event.killerId - 1] if event.killerId else None
+        if event.type == "CHAMPION_KILL":
+            if not event.victimId:
+                return None
+            liveEvent["EventName"] = "ChampionKill"
+            liveEvent["VictimName"] = names[event.victimId - 1]
+        elif event.type == "BUILDING_KILL" and event.buildingType == "TOWER_BUILDING":
+            team = 0 if event.teamId == 100 else 1
+            towersLost[team] += 1
+            liveEvent["EventName"] = "TurretKilled"
+            liveEvent["TurretKilled"] = f"Turret_T{team + 1}_{towersLost[team]:02}_A"
+        elif event.type == "BUILDING_KILL":
+            liveEvent["EventName"] = "InhibKilled"
+            liveEvent["InhibKilled"] = f"Barracks_T{1 if event.teamId == 100 else 2}"
+        elif event.type == "ELITE_MONSTER_KILL":
+            if killerName is None:
+                # Executions by minions still credit the killing team
+                killerName = names[0 if event.killerTeamId == 100 else 5]
+            if event.monsterType == "DRAGON":
+                liveEvent["EventName"] = "DragonKill"
+                liveEvent["DragonType"] = DRAGON_TYPES.get(
+                    event.monsterSubType, "Fire"  # type: ignore
+                )
+            elif event.monsterType == "BARON_NASHOR":
+                liveEvent["EventName"] = "BaronKill"
+            elif event.monsterType == "RIFTHERALD":
+                liveEvent["EventName"] = "HeraldKill"
+            else:
+                return None
+            liveEvent["Stolen"] = "False"
+        else:
+            return None
+        liveEvent["KillerName"] = killerName or "Minion"
+        liveEvent["Assisters"] = [
+            names[pid - 1] for pid in event.assistingParticipantIds
+        ]
+        return liveEvent
+
+
+def _playerPayload(name, team, position, level, items, respawnTimer, scores) -> dict:
+    return {
+        "championName": "Simulated",
+        "isBot": False,
+        "isDead": respawnTimer > 0,
+        "items": items,
+        "level": level,
+        "position": position,
+        "rawChampionName": "game_character_displayname_Simulated",
+        "respawnTimer": respawnTimer,
+        "runes": {
+            "keystone": {"id": 8005},
+            "primaryRuneTree": {"id": 8000},
+            "secondaryRuneTree": {"id": 8400},
+        },
+        "scores": scores,
+        "skinID": 0,
+        "summonerName": name,
+        "riotId": f"{name}#SIM",
+        "riotIdGameName": name,
+        "riotIdTagLine": "SIM",
+        "summonerSpells": {
+            "summonerSpellOne": {"displayName": "Flash"},
+            "summonerSpellTwo": {"displayName": "Teleport"},
+        },
+        "team": team,
+    }
+
+
+def load_feed(match_timeline_filepath: Path, itemCosts: Dict[int, int], interval=10.0):
+    with match_timeline_filepath.open(mode="r", encoding="utf-8") as match_timeline_f:
+        match_timeline = json.load(match_timeline_f)
+    frames = [Frame(frame) for frame in match_timeline["info"]["frames"]]
+    return TimelineLiveFeed(frames, itemCosts, interval)
+
+
+def serve_feeds(match_timeline_filepaths, port=2999, speed=1.0, interval=10.0):
+    """Serve every timeline as a simulated game on a local Live Client Data API stand-in
+
+    :param match_timeline_filepaths: Paths to the match timeline JSON files, game i is served under /game/<i>
+    :param port: Port to serve on
+    :param speed: Playback speed, 0 advances a game on every 'gamestats' request
+    :param interval: Seconds of game time between two snapshots
+    :return: None
+    """
+    itemCosts = load_item_costs()
+    feeds = [load_feed(path, itemCosts, interval) for path in match_timeline_filepaths]
+    server = LiveClientStandIn(feeds, port=port, speed=speed)
+    print(f"Serving {len(feeds)} simulated games on port {port}", flush=True)
+    server.serve_forever()
+
+
+def run_simulated_client(base_url, itemCosts, latencies: List[float]):
+    """Poll a simulated game through the live path until it ends, recording per-poll latency"""
+    parser = LiveParser()
+    while True:
+        start = time.perf_counter()
+        try:
+            game_info = fetch_live_endpoint("gamestats", base_url)
+            player_info = fetch_live_endpoint("playerlist", base_url)
+            events_info = fetch_live_endpoint("eventdata", base_url)
+        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError):
+            # The game is over, or the stand-in is gone
+            return
+        frame = LiveFrame(game_info["gameTime"], events_info, player_info, itemCosts)
+        parser.getNextFrame(frame).getValue(SampleFormatting.TAKE_DIFF)
+        latencies.append(time.perf_counter() - start)
+
+
+def load_test(match_timeline_filepaths, num_games, port=2999, speed=0.0):
+    """Load-test the live path with many simulated games polled concurrently
+
+    The stand-in runs in its own process so it does not compete with the clients for the GIL.
+
+    :param match_timeline_filepaths: Paths to the match timeline JSON files, reused round-robin
+    :param num_games: Number of concurrent simulated games
+    :param port: Port of the stand-in
+    :param speed: Playback speed, 0 replays every game as fast as possible
+    :return: Dict with the number of polls, throughput and latency percentiles
+    """
+    paths = [
+        match_timeline_filepaths[i % len(match_timeline_filepaths)]
+        for i in range(num_games)
+    ]
+    server = multiprocessing.Process(
+        target=serve_feeds, args=(paths, port, speed), daemon=True
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            fetch_live_endpoint("activeplayername", base_url)
+            break
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+
+    itemCosts = load_item_costs()
+    latencies: List[float] = []
+    clients = [
+        threading.Thread(
+            target=run_simulated_client,
+            args=(f"{base_url}/game/{game}", itemCosts, latencies),
+        )
+        for game in range(num_games)
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    server.terminate()
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if latencies else (0, 0, 0)
+    return {
+        "games": num_games,
+        "polls": len(latencies),
+        "seconds": elapsed,
+        "polls_per_second": len(latencies) / elapsed,
+        "latency_p50_ms": p50 * 1000,
+        "latency_p90_ms": p90 * 1000,
+        "latency_p99_ms": p99 * 1000,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Simulate live games from stored match timelines"
+    )
+    arg_parser.add_argument("--games", type=int, default=1)
+    arg_parser.add_argument("--port", type=int, default=2999)
+    arg_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Playback speed, 0 advances a game on every gamestats request",
+    )
+    arg_parser.add_argument(
+        "--load-test",
+        action="store_true",
+        help="Poll every simulated game concurrently through the live path and report throughput",
+    )
+    args = arg_parser.parse_args()
+
+    timelines = sorted(MATCH_TIMELINE_DIR.iterdir())[: args.games]
+    if not timelines:
+        print(f"No match timelines found in {MATCH_TIMELINE_DIR}")
+        return
+    if args.load_test:
+        print(
+            json.dumps(
+                load_test(timelines, args.games, args.port, args.speed), indent=4
+            )
+        )
+    else:
+        serve_feeds(
+            [timelines[i % len(timelines)] for i in range(args.games)],
+            args.port,
+            args.speed,
+        )
+
+
+if __name__ == "__main__":
+    main()
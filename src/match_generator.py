@@ -0,0 +1,597 @@
+import argparse
+import json
+import math
+import os
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from random import Random
+from typing import List, Optional, Tuple
+from tqdm import tqdm
+from src.parsers.GameState import RESPAWN_TIMES_MS
+
+MATCHES_DIR = Path.cwd() / "matches"
+GAME_VERSION = "14.10.1"
+PLATFORM_ID = "SYN1"
+POSITIONS = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+CHAMPIONS = {
+    "TOP": ["Garen", "Darius", "Ornn", "Fiora", "Jax", "Malphite"],
+    "JUNGLE": ["LeeSin", "Vi", "Amumu", "Graves", "Kindred", "Sejuani"],
+    "MIDDLE": ["Ahri", "Syndra", "Orianna", "Yasuo", "Viktor", "Akali"],
+    "BOTTOM": ["Jinx", "Caitlyn", "Ezreal", "Kaisa", "Jhin", "Ashe"],
+    "UTILITY": ["Thresh", "Lulu", "Nautilus", "Leona", "Karma", "Nami"],
+}
+# fmt: off
+# Starting item, boots and completed items bought in order, with their total cost
+BUILDS = {
+    "TOP": [(1054, 450), (1001, 300), (3047, 1000), (3071, 3000), (3078, 3333), (3065, 2900), (3742, 2900)],
+    "JUNGLE": [(1001, 300), (3111, 1100), (6692, 2800), (3071, 3000), (3142, 2700), (3742, 2900)],
+    "MIDDLE": [(1056, 400), (1001, 300), (3020, 1100), (4645, 3200), (3089, 3600), (3157, 3250), (3135, 3000)],
+    "BOTTOM": [(1055, 450), (1001, 300), (3006, 1100), (6672, 3100), (3031, 3400), (3153, 3200), (3116, 2600)],
+    "UTILITY": [(2003, 50), (1001, 300), (3009, 900), (3190, 2200), (3065, 2900), (3116, 2600)],
+}
+# fmt: on
+BOOTS_UPGRADES = {3006, 3009, 3020, 3047, 3111}
+DRAGON_SUBTYPES = [
+    "AIR_DRAGON",
+    "CHEMTECH_DRAGON",
+    "EARTH_DRAGON",
+    "FIRE_DRAGON",
+    "HEXTECH_DRAGON",
+    "WATER_DRAGON",
+]
+# fmt: off
+# Total experience needed to reach level 2 to 18
+LEVEL_XP = [280, 660, 1140, 1720, 2400, 3180, 4060, 5040, 6120, 7300, 8580, 9960, 11440, 13020, 14700, 16480, 18360]
+# fmt: on
+LANES = ["TOP_LANE", "MID_LANE", "BOT_LANE"]
+TOWER_TYPES = ["OUTER_TURRET", "INNER_TURRET", "BASE_TURRET"]
+FRAME_INTERVAL_MS = 60000
+
+
+class MatchSimulation:
+    """A ranked game played minute by minute, producing MATCHv5-shaped match info and timeline.
+
+    The game is driven by a hidden edge of the blue side that drifts over time and with every
+    objective, so kills, objectives, gold and the winner stay correlated like in real games.
+    Only the fields the parsers and simulators read are filled in with care.
+    """
+
+    matchId: str
+    rng: Random
+    edge: float
+    timestamp: int
+    events: List[dict]
+    frames: List[dict]
+    totalGold: List[float]
+    currentGold: List[float]
+    xp: List[float]
+    minionsKilled: List[int]
+    jungleMinionsKilled: List[int]
+    deadUntil: List[int]
+    builds: List[List[Tuple[int, int]]]
+    inventories: List[List[int]]
+    kills: List[int]
+    deaths: List[int]
+    assists: List[int]
+    towers: List[List[Tuple[str, str, str]]]
+    towersTaken: List[int]
+    dragonsTaken: List[int]
+    dragonSubTypes: List[str]
+    baronsTaken: List[int]
+    soulTeam: Optional[int]
+    nextDragon: int
+    nextBaron: int
+    heraldTaken: bool
+    grubsTaken: bool
+    winner: Optional[int]
+
+    def __init__(self, matchId: str, seed: int) -> None:
+        self.matchId = matchId
+        self.rng = Random(seed)
+        self.edge = self.rng.gauss(0, 0.4)
+        self.timestamp = 0
+        self.events = []
+        self.frames = []
+        self.totalGold = [500.0] * 10
+        self.currentGold = [500.0] * 10
+        self.xp = [0.0] * 10
+        self.minionsKilled = [0] * 10
+        self.jungleMinionsKilled = [0] * 10
+        self.deadUntil = [0] * 10
+        self.builds = [list(BUILDS[POSITIONS[p % 5]]) for p in range(10)]
+        self.inventories = [[] for _ in range(10)]
+        self.kills = [0] * 10
+        self.deaths = [0] * 10
+        self.assists = [0] * 10
+        # Buildings of each team in the order they fall: every tier of every lane, then inhibitors and nexus turrets
+        self.towers = [self._getBuildings() for _ in range(2)]
+        self.towersTaken = [0, 0]
+        self.dragonsTaken = [0, 0]
+        self.dragonSubTypes = []
+        self.baronsTaken = [0, 0]
+        self.soulTeam = None
+        self.nextDragon = 5 * 60000
+        self.nextBaron = 20 * 60000
+        self.heraldTaken = False
+        self.grubsTaken = False
+        self.winner = None
+
+    def _getBuildings(self) -> List[Tuple[str, str, str]]:
+        lanes = list(LANES)
+        buildings = []
+        for towerType in TOWER_TYPES:
+            self.rng.shuffle(lanes)
+            buildings += [("TOWER_BUILDING", towerType, lane) for lane in lanes]
+        buildings += [("INHIBITOR_BUILDING", "", lane) for lane in lanes]
+        buildings += [("TOWER_BUILDING", "NEXUS_TURRET", "MID_LANE")] * 2
+        return buildings
+
+    def _blueWinChance(self) -> float:
+        return 1 / (1 + math.exp(-self.edge))
+
+    def _pickTeam(self, bias=1.0) -> int:
+        """0 for blue, 1 for red, favouring the team ahead"""
+        return 0 if self.rng.random() < 1 / (1 + math.exp(-self.edge * bias)) else 1
+
+    def _alivePlayers(self, team: int, timestamp: int) -> List[int]:
+        return [
+            p for p in range(team * 5, team * 5 + 5) if self.deadUntil[p] <= timestamp
+        ]
+
+    def _level(self, player: int) -> int:
+        return 1 + sum(self.xp[player] >= xp for xp in LEVEL_XP)
+
+    def _addGold(self, players, gold: float):
+        for player in players:
+            self.totalGold[player] += gold
+            self.currentGold[player] += gold
+
+    def _simulateMinute(self, start: int):
+        minute = start // 60000
+        end = start + FRAME_INTERVAL_MS
+        # Passive gold, farm and experience, scaled by how far ahead the team is
+        for player in range(10):
+            sign = 1 if player < 5 else -1
+            share = 1 + 0.08 * math.tanh(sign * self.edge)
+            position = POSITIONS[player % 5]
+            if minute >= 1:
+                self._addGold([player], 122 * share)
+            if position == "JUNGLE":
+                camps = self.rng.randint(3, 6)
+                self.jungleMinionsKilled[player] += camps
+                self._addGold([player], camps * 35 * share)
+            elif position != "UTILITY" and minute >= 1:
+                cs = max(0, round(self.rng.gauss(7, 1.2) * share))
+                self.minionsKilled[player] += cs
+                self._addGold([player], cs * 21)
+            else:
+                self._addGold([player], 40 * share)
+            self.xp[player] += (
+                self.rng.uniform(350, 550)
+                * share
+                * (0.6 if position == "UTILITY" else 1)
+            )
+
+        # Champion kills get more frequent as the game goes on
+        for _ in range(self._poisson(0.25 + 0.04 * min(minute, 30))):
+            self._championKill(start + self.rng.randint(0, FRAME_INTERVAL_MS - 1))
+
+        if minute >= 6 and not self.grubsTaken and self.rng.random() < 0.5:
+            self.grubsTaken = True
+            self._eliteMonsterKill(start + self.rng.randint(0, 59999), "HORDE", None)
+        if 14 <= minute < 20 and not self.heraldTaken and self.rng.random() < 0.4:
+            self.heraldTaken = True
+            self._eliteMonsterKill(
+                start + self.rng.randint(0, 59999), "RIFTHERALD", None
+            )
+        if self.nextDragon < end and self.rng.random() < 0.5:
+            timestamp = max(self.nextDragon, start) + self.rng.randint(0, 30000)
+            if self.soulTeam is None:
+                subType = self._getDragonSubType()
+                team = self._eliteMonsterKill(timestamp, "DRAGON", subType)
+                self.dragonsTaken[team] += 1
+                self.edge += 0.06 if team == 0 else -0.06
+                if self.dragonsTaken[team] == 4:
+                    self.soulTeam = team
+                    self.events.append(
+                        {
+                            "type": "DRAGON_SOUL_GIVEN",
+                            "timestamp": timestamp,
+                            "teamId": 100 * (team + 1),
+                            "name": subType.split("_")[0].capitalize(),
+                        }
+                    )
+                    self.nextDragon = timestamp + 6 * 60000
+                else:
+                    self.nextDragon = timestamp + 5 * 60000
+            else:
+                team = self._eliteMonsterKill(timestamp, "DRAGON", "ELDER_DRAGON")
+                self.edge += 0.5 if team == 0 else -0.5
+                self.nextDragon = timestamp + 6 * 60000
+        if self.nextBaron < end and self.rng.random() < 0.3 + 0.1 * abs(self.edge):
+            timestamp = max(self.nextBaron, start) + self.rng.randint(0, 30000)
+            team = self._eliteMonsterKill(timestamp, "BARON_NASHOR", None)
+            self.baronsTaken[team] += 1
+            self._addGold(range(team * 5, team * 5 + 5), 300)
+            self.edge += 0.4 if team == 0 else -0.4
+            self.nextBaron = timestamp + 6 * 60000
+
+        # Structures start falling after laning, the team ahead pushes more
+        if minute >= 8:
+            for _ in range(self._poisson(0.3 + 0.6 * min(minute - 8, 20) / 20)):
+                self._buildingKill(start + self.rng.randint(0, FRAME_INTERVAL_MS - 1))
+                if self.winner is not None:
+                    return
+
+        for _ in range(self._poisson(2.5)):
+            self.events.append(
+                {
+                    "type": "WARD_PLACED",
+                    "timestamp": start + self.rng.randint(0, 59999),
+                    "wardType": self.rng.choice(
+                        ["YELLOW_TRINKET", "CONTROL_WARD", "SIGHT_WARD"]
+                    ),
+                    "creatorId": self.rng.randint(1, 10),
+                }
+            )
+        self.edge += self.rng.gauss(0, 0.08)
+
+    def _poisson(self, rate: float) -> int:
+        # Knuth's algorithm, the rates are small
+        limit = math.exp(-rate)
+        count = 0
+        product = self.rng.random()
+        while product > limit:
+            count += 1
+            product *= self.rng.random()
+        return count
+
+    def _getDragonSubType(self) -> str:
+        # The third dragon decides the element of the rift and of every dragon after it
+        taken = self.dragonSubTypes
+        if len(taken) < 3:
+            taken.append(
+                self.rng.choice([t for t in DRAGON_SUBTYPES if t not in taken])
+            )
+        else:
+            taken.append(taken[2])
+        return taken[-1]
+
+    def _championKill(self, timestamp: int):
+        team = self._pickTeam(bias=1.5)
+        killers = self._alivePlayers(team, timestamp)
+        victims = self._alivePlayers(1 - team, timestamp)
+        if not killers or not victims:
+            return
+        killer = self.rng.choice(killers)
+        victim = self.rng.choice(victims)
+        assisting = self.rng.sample(
+            [p for p in killers if p != killer],
+            min(len(killers) - 1, self.rng.randint(0, 3)),
+        )
+        self.kills[killer] += 1
+        self.deaths[victim] += 1
+        for player in assisting:
+            self.assists[player] += 1
+        self._addGold([killer], 300)
+        self._addGold(assisting, 150 / max(1, len(assisting)))
+        respawn = (
+            RESPAWN_TIMES_MS[self._level(victim) - 1]
+            / 1000
+            * (1 + 0.015 * max(0, timestamp // 60000 - 15))
+        )
+        self.deadUntil[victim] = timestamp + int(respawn * 1000)
+        self.edge += 0.05 if team == 0 else -0.05
+        self.events.append(
+            {
+                "type": "CHAMPION_KILL",
+                "timestamp": timestamp,
+                "killerId": killer + 1,
+                "victimId": victim + 1,
+                "assistingParticipantIds": [p + 1 for p in assisting],
+                "bounty": 300,
+                "shutdownBounty": 0,
+                "position": self._randomPosition(),
+            }
+        )
+
+    def _eliteMonsterKill(
+        self, timestamp: int, monsterType: str, monsterSubType: Optional[str]
+    ) -> int:
+        team = self._pickTeam(bias=2.0)
+        killers = self._alivePlayers(team, timestamp) or list(
+            range(team * 5, team * 5 + 5)
+        )
+        event = {
+            "type": "ELITE_MONSTER_KILL",
+            "timestamp": timestamp,
+            "killerId": self.rng.choice(killers) + 1,
+            "killerTeamId": 100 * (team + 1),
+            "monsterType": monsterType,
+            "position": self._randomPosition(),
+        }
+        if monsterSubType:
+            event["monsterSubType"] = monsterSubType
+        self.events.append(event)
+        return team
+
+    def _buildingKill(self, timestamp: int):
+        team = self._pickTeam(bias=2.5)
+        enemy = 1 - team
+        buildings = self.towers[enemy]
+        if not buildings:
+            return
+        buildingType, towerType, lane = buildings.pop(0)
+        killers = self._alivePlayers(team, timestamp) or list(
+            range(team * 5, team * 5 + 5)
+        )
+        event = {
+            "type": "BUILDING_KILL",
+            "timestamp": timestamp,
+            "teamId": 100 * (enemy + 1),
+            "buildingType": buildingType,
+            "laneType": lane,
+            "killerId": self.rng.choice(killers) + 1,
+            "assistingParticipantIds": [],
+            "position": self._randomPosition(),
+        }
+        if towerType:
+            event["towerType"] = towerType
+            self.towersTaken[team] += 1
+            self._addGold(range(team * 5, team * 5 + 5), 50)
+        self.edge += 0.08 if team == 0 else -0.08
+        self.events.append(event)
+        if not buildings:
+            # Both nexus turrets are down, the nexus falls with them
+            self.winner = team
+
+    def _buyItems(self, start: int):
+        for player in range(10):
+            build = self.builds[player]
+            inventory = self.inventories[player]
+            timestamp = start + self.rng.randint(0, 50000)
+            while build and self.currentGold[player] >= build[0][1]:
+                itemId, cost = build.pop(0)
+                self.currentGold[player] -= cost
+                self._addItemEvent("ITEM_PURCHASED", timestamp, player, itemId)
+                inventory.append(itemId)
+                if itemId in BOOTS_UPGRADES and 1001 in inventory:
+                    # Upgrading the boots consumes them
+                    inventory.remove(1001)
+                    self._addItemEvent("ITEM_DESTROYED", timestamp, player, 1001)
+                elif len(inventory) > 6:
+                    # Sell the starting item to make room
+                    soldId = inventory.pop(0)
+                    self.currentGold[player] += (
+                        BUILDS[POSITIONS[player % 5]][0][1] * 0.4
+                    )
+                    self._addItemEvent("ITEM_SOLD", timestamp, player, soldId)
+                timestamp += 1
+
+    def _addItemEvent(self, type: str, timestamp: int, player: int, itemId: int):
+        self.events.append(
+            {
+                "type": type,
+                "timestamp": timestamp,
+                "participantId": player + 1,
+                "itemId": itemId,
+            }
+        )
+
+    def _randomPosition(self) -> dict:
+        return {"x": self.rng.randint(0, 14870), "y": self.rng.randint(0, 14870)}
+
+    def _addFrame(self, timestamp: int):
+        self.events.sort(key=lambda event: event["timestamp"])
+        participantFrames = {}
+        for player in range(10):
+            participantFrames[str(player + 1)] = {
+                "participantId": player + 1,
+                "position": self._randomPosition(),
+                "currentGold": int(self.currentGold[player]),
+                "totalGold": int(self.totalGold[player]),
+                "level": self._level(player),
+                "xp": int(self.xp[player]),
+                "minionsKilled": self.minionsKilled[player],
+                "jungleMinionsKilled": self.jungleMinionsKilled[player],
+                "timeEnemySpentControlled": 0,
+            }
+        self.frames.append(
+            {
+                "timestamp": timestamp,
+                "participantFrames": participantFrames,
+                "events": self.events,
+            }
+        )
+        self.events = []
+
+    def play(self, max_minutes=45):
+        self._buyItems(0)
+        self._addFrame(0)
+        minute = 0
+        while self.winner is None:
+            start = minute * FRAME_INTERVAL_MS
+            self._simulateMinute(start)
+            if self.winner is not None:
+                endTimestamp = max(event["timestamp"] for event in self.events) + 1000
+                self.events.append(
+                    {
+                        "type": "GAME_END",
+                        "timestamp": endTimestamp,
+                        "winningTeam": 100 * (self.winner + 1),
+                    }
+                )
+                self._addFrame(endTimestamp)
+                break
+            self._buyItems(start)
+            minute += 1
+            if minute >= max_minutes:
+                # Rare stalemates are decided by the team ahead
+                self.winner = 0 if self._blueWinChance() >= 0.5 else 1
+                self.events.append(
+                    {
+                        "type": "GAME_END",
+                        "timestamp": minute * FRAME_INTERVAL_MS,
+                        "winningTeam": 100 * (self.winner + 1),
+                    }
+                )
+            self._addFrame(minute * FRAME_INTERVAL_MS)
+
+    def getMatchTimeline(self) -> dict:
+        puuids = self._getPuuids()
+        return {
+            "metadata": {
+                "dataVersion": "2",
+                "matchId": self.matchId,
+                "participants": puuids,
+            },
+            "info": {
+                "frameInterval": FRAME_INTERVAL_MS,
+                "frames": self.frames,
+                "gameId": int(self.matchId.split("_")[-1]),
+                "participants": [
+                    {"participantId": p + 1, "puuid": puuids[p]} for p in range(10)
+                ],
+            },
+        }
+
+    def getMatchInfo(self) -> dict:
+        puuids = self._getPuuids()
+        rng = Random(self.matchId)
+        duration = self.frames[-1]["timestamp"] // 1000
+        participants = []
+        for player in range(10):
+            team = player // 5
+            position = POSITIONS[player % 5]
+            participants.append(
+                {
+                    "participantId": player + 1,
+                    "puuid": puuids[player],
+                    "teamId": 100 * (team + 1),
+                    "teamPosition": position,
+                    "championName": rng.choice(CHAMPIONS[position]),
+                    "champLevel": self._level(player),
+                    "kills": self.kills[player],
+                    "deaths": self.deaths[player],
+                    "assists": self.assists[player],
+                    "goldEarned": int(self.totalGold[player]),
+                    "totalMinionsKilled": self.minionsKilled[player],
+                    "neutralMinionsKilled": self.jungleMinionsKilled[player],
+                    "win": self.winner == team,
+                }
+            )
+        teams = [
+            {
+                "teamId": 100 * (team + 1),
+                "win": self.winner == team,
+                "objectives": {
+                    "baron": {"kills": self.baronsTaken[team]},
+                    "champion": {"kills": sum(self.kills[team * 5 : team * 5 + 5])},
+                    "dragon": {"kills": self.dragonsTaken[team]},
+                    "tower": {"kills": self.towersTaken[team]},
+                },
+            }
+            for team in range(2)
+        ]
+        return {
+            "metadata": {
+                "dataVersion": "2",
+                "matchId": self.matchId,
+                "participants": puuids,
+            },
+            "info": {
+                "gameDuration": duration,
+                "gameId": int(self.matchId.split("_")[-1]),
+                "gameMode": "CLASSIC",
+                "gameType": "MATCHED_GAME",
+                "gameVersion": GAME_VERSION,
+                "mapId": 11,
+                "platformId": self.matchId.split("_")[0],
+                "queueId": 420,
+                "participants": participants,
+                "teams": teams,
+            },
+        }
+
+    def _getPuuids(self) -> List[str]:
+        return [f"{self.matchId}-{p + 1:02d}".ljust(78, "0") for p in range(10)]
+
+
+def generate_match(match_id: str, seed: int) -> Tuple[dict, dict]:
+    """Simulate a single match
+
+    :param match_id: Match ID, '<platform>_<game ID>'
+    :param seed: Seed of the simulation, the same seed always gives the same match
+    :return: Tuple (match info, match timeline)
+    """
+    simulation = MatchSimulation(match_id, seed)
+    simulation.play()
+    return simulation.getMatchInfo(), simulation.getMatchTimeline()
+
+
+def write_match(
+    index: int, seed: int, matches_dir: Path, indent: Optional[int] = None
+) -> int:
+    """Generate the index-th match of a seed and save it like training_data_collector.py does
+
+    :return: Size in bytes of the written files
+    """
+    match_id = f"{PLATFORM_ID}_{seed * 10**7 + index}"
+    match_info, match_timeline = generate_match(match_id, seed * 10**7 + index)
+    size = 0
+    for name, data in (("match_info", match_info), ("match_timeline", match_timeline)):
+        filepath = matches_dir / name / f"{name}_{match_id}.json"
+        with filepath.open(mode="w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        size += filepath.stat().st_size
+    return size
+
+
+def generate_matches(
+    num_matches: int,
+    matches_dir: Path = MATCHES_DIR,
+    seed=0,
+    processes=None,
+    indent: Optional[int] = None,
+):
+    """Write num_matches synthetic matches to the match_info and match_timeline directories of matches_dir
+
+    :param num_matches: Number of matches to generate
+    :param matches_dir: Path to the directory containing match_info and match_timeline
+    :param seed: Seed of the whole set, match i of a seed is the same whatever the number of matches or processes
+    :param processes: Number of generating processes, defaults to the number of cores
+    :param indent: JSON indentation, the collector uses 4 but files are much smaller without
+    :return: Total size in bytes of the written files
+    """
+    for name in ("match_info", "match_timeline"):
+        (matches_dir / name).mkdir(parents=True, exist_ok=True)
+    write = partial(write_match, seed=seed, matches_dir=matches_dir, indent=indent)
+    with Pool(processes or os.cpu_count()) as pool:
+        return sum(
+            tqdm(
+                pool.imap_unordered(write, range(num_matches), chunksize=64),
+                total=num_matches,
+            )
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Generate synthetic MATCHv5 match info and timelines for offline testing"
+    )
+    arg_parser.add_argument("--matches", type=int, default=1000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", type=Path, default=MATCHES_DIR)
+    arg_parser.add_argument("--processes", type=int, default=None)
+    arg_parser.add_argument("--indent", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    size = generate_matches(
+        args.matches, args.output, args.seed, args.processes, args.indent
+    )
+    print(f"Wrote {args.matches} matches ({size / 2**20:.1f} MiB) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
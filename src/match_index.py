@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from tqdm import tqdm
+
+MATCH_INDEX_PATH = Path.cwd() / "matches" / "match_index.sqlite"
+MATCH_INFO_PREFIX = "match_info_"
+MATCH_TIMELINE_PREFIX = "match_timeline_"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    label INTEGER NOT NULL,
+    game_version TEXT,
+    patch TEXT,
+    game_duration INTEGER,
+    queue_id INTEGER,
+    tier TEXT,
+    division TEXT,
+    match_info_path TEXT NOT NULL,
+    match_timeline_path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_patch ON matches (patch);
+CREATE INDEX IF NOT EXISTS matches_tier ON matches (tier, division);
+"""
+
+
+class IndexedMatch(NamedTuple):
+    matchId: str
+    # 1 if team 100 (blue side) won, the label of every sample of the match
+    label: int
+    gameVersion: Optional[str]
+    patch: Optional[str]
+    gameDuration: Optional[int]
+    queueId: Optional[int]
+    # Rank and division the match was sampled from by the collector, None if unknown
+    tier: Optional[str]
+    division: Optional[str]
+    matchInfoPath: Path
+    matchTimelinePath: Path
+
+
+def get_label(match_info: dict) -> int:
+    """Label of the samples of a match, whether team 100 (blue side) won"""
+    return int(match_info["info"]["participants"][1]["win"])
+
+
+def get_patch(game_version: Optional[str]) -> Optional[str]:
+    """Patch of a game version, e.g. 14.3 for 14.3.558.5454"""
+    if not game_version:
+        return None
+    return ".".join(game_version.split(".")[:2])
+
+
+class MatchIndex:
+    """SQLite index of the stored matches, to select subsets and read labels without opening match infos.
+
+    Paths are stored relative to the index, so the matches directory can be moved with it.
+    """
+
+    path: Path
+    _connection: sqlite3.Connection
+
+    def __init__(self, path: Path = MATCH_INDEX_PATH) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def __contains__(self, matchId: str) -> bool:
+        return (
+            self._connection.execute(
+                "SELECT 1 FROM matches WHERE match_id = ?", (matchId,)
+            ).fetchone()
+            is not None
+        )
+
+    def countBy(self, column: str) -> Dict[Optional[str], int]:
+        """Number of indexed matches of each value of a column (patch, tier, division, queue_id)"""
+        if column not in ("patch", "tier", "division", "queue_id"):
+            raise ValueError(f"Can't count by {column}")
+        return dict(
+            self._connection.execute(
+                f"SELECT {column}, COUNT(*) FROM matches GROUP BY {column} ORDER BY {column}"
+            ).fetchall()
+        )
+
+    def _toStored(self, path: Path) -> str:
+        return os.path.relpath(path, self.path.parent)
+
+    def _fromStored(self, path: str) -> Path:
+        return self.path.parent / path
+
+    def addMatch(
+        self,
+        match_info: dict,
+        matchInfoPath: Path,
+        matchTimelinePath: Path,
+        tier: Optional[str] = None,
+        division: Optional[str] = None,
+        commit=True,
+    ) -> None:
+        """Index a stored match, replacing its row but keeping a known tier and division"""
+        info = match_info["info"]
+        self._connection.execute(
+            """
+            INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (match_id) DO UPDATE SET
+                label = excluded.label,
+                game_version = excluded.game_version,
+                patch = excluded.patch,
+                game_duration = excluded.game_duration,
+                queue_id = excluded.queue_id,
+                tier = COALESCE(excluded.tier, tier),
+                division = COALESCE(excluded.division, division),
+                match_info_path = excluded.match_info_path,
+                match_timeline_path = excluded.match_timeline_path
+            """,
+            (
+                match_info["metadata"]["matchId"],
+                get_label(match_info),
+                info.get("gameVersion"),
+                get_patch(info.get("gameVersion")),
+                info.get("gameDuration"),
+                info.get("queueId"),
+                tier,
+                division,
+                self._toStored(matchInfoPath),
+                self._toStored(matchTimelinePath),
+            ),
+        )
+        if commit:
+            self._connection.commit()
+
+    def update(self, match_info_dir: Path, match_timeline_dir: Path) -> int:
+        """Index the stored matches that aren't indexed yet, only their match infos are read
+
+        :param match_info_dir: Path to the directory containing the match info JSON files
+        :param match_timeline_dir: Path to the directory containing the match timeline JSON files
+        :return: Number of matches added
+        """
+        indexed = {
+            row[0] for row in self._connection.execute("SELECT match_id FROM matches")
+        }
+        added = 0
+        for match_info_filepath in tqdm(sorted(match_info_dir.glob("*.json"))):
+            match_id = match_info_filepath.stem[len(MATCH_INFO_PREFIX) :]
+            if match_id in indexed:
+                continue
+            match_timeline_filepath = match_timeline_dir / (
+                MATCH_TIMELINE_PREFIX + match_id + ".json"
+            )
+            if not match_timeline_filepath.exists():
+                continue
+            try:
+                with match_info_filepath.open(
+                    mode="r", encoding="utf-8"
+                ) as match_info_f:
+                    match_info = json.load(match_info_f)
+            except (IOError, ValueError):
+                continue
+            self.addMatch(
+                match_info, match_info_filepath, match_timeline_filepath, commit=False
+            )
+            added += 1
+        self._connection.commit()
+        return added
+
+    def select(
+        self,
+        patches: Optional[Iterable[str]] = None,
+        tiers: Optional[Iterable[str]] = None,
+        divisions: Optional[Iterable[str]] = None,
+        queueId: Optional[int] = None,
+        minDuration: Optional[int] = None,
+    ) -> List[IndexedMatch]:
+        """Indexed matches matching every given filter, ordered by match ID
+
+        :param patches: Patches (e.g. 14.3) or patch prefixes ending with a dot (e.g. 14.)
+        :param tiers: Tiers the matches were sampled from (e.g. DIAMOND)
+        :param divisions: Divisions the matches were sampled from (e.g. I)
+        :param queueId: Queue of the matches (e.g. 420 for ranked solo)
+        :param minDuration: Minimum game duration, in the unit of info.gameDuration
+        """
+        conditions = []
+        parameters: list = []
+        if patches is not None:
+            patches = list(patches)
+            conditions.append(
+                "("
+                + " OR ".join(
+                    "patch LIKE ?" if patch.endswith(".") else "patch = ?"
+                    for patch in patches
+                )
+                + ")"
+            )
+            parameters += [
+                patch + "%" if patch.endswith(".") else patch for patch in patches
+            ]
+        for column, values in (("tier", tiers), ("division", divisions)):
+            if values is not None:
+                values = list(values)
+                conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                parameters += values
+        if queueId is not None:
+            conditions.append("queue_id = ?")
+            parameters.append(queueId)
+        if minDuration is not None:
+            conditions.append("game_duration >= ?")
+            parameters.append(minDuration)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(
+            f"SELECT * FROM matches {where} ORDER BY match_id", parameters
+        )
+        return [
+            IndexedMatch(*row[:8], self._fromStored(row[8]), self._fromStored(row[9]))
+            for row in rows
+        ]
+
+
+def main():
+    match_info_dir = Path.cwd() / "matches" / "match_info"
+    match_timeline_dir = Path.cwd() / "matches" / "match_timeline"
+    with MatchIndex() as index:
+        added = index.update(match_info_dir, match_timeline_dir)
+        print(f"Indexed {added} new matches, {len(index)} in {index.path}")
+        if "--stats" in sys.argv:
+            for column in ("patch", "tier", "queue_id"):
+                for value, count in index.countBy(column).items():
+                    print(f"{column} {value}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import json
+import pickle
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+import numpy as np
+from src.features.features import DEFAULT_PLAN, ExtractionPlan
+from src.item_table import get_data_dragon_version
+from src.lean_model import TreeEnsemble
+from src.parsers.Sample import SampleFormatting, getFeatureNames
+
+# XGBoost takes over a second to import, so it's only imported by the functions that need it
+if TYPE_CHECKING:
+    import xgboost as xgb
+
+MODEL_PATH = Path("./models/xgboost")
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def get_artifact_paths(model_path: Path) -> tuple[Path, Path]:
+    """Paths of the native booster (.ubj) and of its JSON sidecar (.json)"""
+    return model_path.with_suffix(".ubj"), model_path.with_suffix(".json")
+
+
+def get_trees_path(model_path: Path) -> Path:
+    """Path of the trees exported for TreeEnsemble, next to the booster"""
+    return model_path.with_suffix(".trees.npz")
+
+
+def get_extraction_plan(metadata: dict) -> ExtractionPlan:
+    """Plan building the samples a model was trained on, from its sidecar"""
+    return ExtractionPlan.fromNames(metadata["feature_keys"])
+
+
+def check_compatibility(metadata: dict, dataDragonVersion: Optional[str] = None):
+    """Raise a ValueError if the samples built by this code base don't match the model's inputs
+
+    :param metadata: Sidecar of the model artifact
+    :param dataDragonVersion: Version of the Data Dragon item data in use, a mismatch only prints a warning
+    """
+    # Raises for features this code base doesn't know (anymore)
+    plan = get_extraction_plan(metadata)
+    if list(metadata["feature_keys"]) != plan.getNames():
+        raise ValueError(
+            f"Model was trained on features {metadata['feature_keys']}, "
+            f"but samples are built with {plan.getNames()}"
+        )
+    featureNames = metadata["feature_names"]
+    expectedNames = getFeatureNames(
+        SampleFormatting[metadata["sample_formatting"]], plan
+    )
+    if featureNames != expectedNames:
+        raise ValueError(
+            f"Model expects columns {featureNames}, "
+            f"but samples have columns {expectedNames}"
+        )
+    modelVersion = metadata.get("data_dragon_version")
+    if dataDragonVersion and modelVersion and modelVersion != dataDragonVersion:
+        print(
+            f"Warning: model was trained with Data Dragon {modelVersion}, "
+            f"item data in use is {dataDragonVersion}"
+        )
+
+
+def read_sidecar(model_path: Path) -> dict:
+    _, sidecar_path = get_artifact_paths(model_path)
+    with sidecar_path.open(mode="r", encoding="utf-8") as sidecar_f:
+        metadata = json.load(sidecar_f)
+    if metadata.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model artifact version {metadata.get('format_version')}"
+        )
+    return metadata
+
+
+class ModelArtifact:
+    """A trained model saved as a native XGBoost booster plus a JSON sidecar describing its inputs.
+
+    The sidecar records the feature schema the model was trained on, so a consumer can check it
+    builds the same samples before predicting.
+    """
+
+    booster: "xgb.Booster"
+    metadata: dict
+    _iterationRange: tuple[int, int]
+
+    def __init__(self, booster: "xgb.Booster", metadata: dict) -> None:
+        self.booster = booster
+        self.metadata = metadata
+        bestIteration = booster.attr("best_iteration")
+        # Models trained with early stopping predict with the best iteration, like XGBClassifier
+        self._iterationRange = (
+            (0, int(bestIteration) + 1) if bestIteration is not None else (0, 0)
+        )
+
+    @property
+    def featureNames(self) -> List[str]:
+        return self.metadata["feature_names"]
+
+    @property
+    def sampleFormatting(self) -> SampleFormatting:
+        return SampleFormatting[self.metadata["sample_formatting"]]
+
+    @property
+    def plan(self) -> ExtractionPlan:
+        return get_extraction_plan(self.metadata)
+
+    def checkCompatibility(self, dataDragonVersion: Optional[str] = None):
+        check_compatibility(self.metadata, dataDragonVersion)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Same output as XGBClassifier.predict_proba: one (loss, win) probability row per sample"""
+        p = self.booster.inplace_predict(
+            np.asarray(X), iteration_range=self._iterationRange
+        )
+        return np.column_stack([1 - p, p])
+
+
+def save_model_artifact(
+    model: Union["xgb.XGBModel", "xgb.Booster"],
+    model_path: Path = MODEL_PATH,
+    strategy: SampleFormatting = SampleFormatting.TAKE_DIFF,
+    plan: ExtractionPlan = DEFAULT_PLAN,
+):
+    """Save a model as a UBJSON booster and a JSON sidecar with its feature schema
+
+    The trees are exported for TreeEnsemble as well, so the live path can predict without XGBoost.
+
+    :param model: Trained XGBClassifier or Booster
+    :param model_path: Path of the artifact without suffix
+    :param strategy: Formatting strategy of the samples the model was trained on
+    :param plan: Features of the samples the model was trained on
+    :return: Tuple (booster path, sidecar path)
+    """
+    import xgboost as xgb
+
+    booster = model.get_booster() if isinstance(model, xgb.XGBModel) else model
+    booster_path, sidecar_path = get_artifact_paths(model_path)
+    booster_path.parent.mkdir(parents=True, exist_ok=True)
+    booster.save_model(booster_path)
+    TreeEnsemble.fromBooster(booster).save(get_trees_path(model_path))
+
+    metadata = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "model_file": booster_path.name,
+        "xgboost_version": xgb.__version__,
+        "sample_formatting": strategy.name,
+        "feature_keys": plan.getNames(),
+        "feature_names": getFeatureNames(strategy, plan),
+        "data_dragon_version": get_data_dragon_version(),
+    }
+    with sidecar_path.open(mode="w", encoding="utf-8") as sidecar_f:
+        json.dump(metadata, sidecar_f, indent=4)
+    return booster_path, sidecar_path
+
+
+def load_model_artifact(model_path: Path = MODEL_PATH, check=True) -> ModelArtifact:
+    """Load a model saved by save_model_artifact
+
+    :param model_path: Path of the artifact without suffix
+    :param check: Whether to verify the feature schema (see ModelArtifact.checkCompatibility)
+    :return: ModelArtifact
+    """
+    import xgboost as xgb
+
+    booster_path, _ = get_artifact_paths(model_path)
+    metadata = read_sidecar(model_path)
+    booster = xgb.Booster()
+    booster.load_model(str(booster_path))
+    artifact = ModelArtifact(booster, metadata)
+    if check:
+        artifact.checkCompatibility(get_data_dragon_version())
+    return artifact
+
+
+def load_lean_model(model_path: Path = MODEL_PATH, check=True) -> TreeEnsemble:
+    """Load the trees exported by save_model_artifact, without importing XGBoost
+
+    :param model_path: Path of the artifact without suffix
+    :param check: Whether to verify the feature schema (see check_compatibility)
+    :return: TreeEnsemble
+    """
+    metadata = read_sidecar(model_path)
+    if check:
+        check_compatibility(metadata, get_data_dragon_version())
+    trees_path = get_trees_path(model_path)
+    if not trees_path.exists():
+        raise ValueError(
+            f"{trees_path} is missing, export it with python -m src.model_artifact --lean"
+        )
+    return TreeEnsemble.load(trees_path)
+
+
+def export_lean_model(model_path: Path = MODEL_PATH) -> Path:
+    """Export the trees of an artifact saved before they were exported by save_model_artifact"""
+    trees_path = get_trees_path(model_path)
+    TreeEnsemble.fromBooster(load_model_artifact(model_path, check=False).booster).save(
+        trees_path
+    )
+    return trees_path
+
+
+def convert_pickled_model(pickle_path: Path, model_path: Path = MODEL_PATH):
+    """Convert a model pickled by older versions of trainer.py into an artifact"""
+    with open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    return save_model_artifact(model, model_path)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.model_artifact <pickled model path> | --lean")
+        return
+    if sys.argv[1] == "--lean":
+        print(f"Wrote {export_lean_model()}")
+        return
+    booster_path, sidecar_path = convert_pickled_model(Path(sys.argv[1]))
+    print(f"Wrote {booster_path} and {sidecar_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+import os
+from typing import Callable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from src.parsers.Frame import Event, Frame
+from src.parsers.GameState import (
+    BARON_BUFF_DURATION_MS,
+    ELDER_BUFF_DURATION_MS,
+    RESPAWN_TIMES_MS,
+    GameEvent,
+    GameEventType,
+)
+
+# numba is optional, without it parsers process the events one by one with GameState
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Set JIT_ENGINE=0 to parse with GameState even when numba is installed
+JIT_ENABLED = njit is not None and os.getenv("JIT_ENGINE", "1") != "0"
+
+_RESPAWN_TIMES_MS = np.array(RESPAWN_TIMES_MS, dtype=np.int64)
+
+# Plain ints, numba freezes module globals as compile-time constants
+_TOWER_KILL = int(GameEventType.TOWER_KILL)
+_CHAMPION_KILL = int(GameEventType.CHAMPION_KILL)
+_DRAGON_KILL = int(GameEventType.DRAGON_KILL)
+_ELDER_KILL = int(GameEventType.ELDER_KILL)
+_BARON_KILL = int(GameEventType.BARON_KILL)
+_DRAGON_SOUL = int(GameEventType.DRAGON_SOUL)
+
+
+def run_state_machine(
+    frameTimes, eventOffsets, eventTypes, eventTimes, eventTeams, eventPlayers
+):
+    """The GameState event state machine over a whole match, returning the state at every frame
+
+    Written for numba (arrays and scalars only), the same rules as GameState.processTime and
+    GameState.processEvent applied to the events eventOffsets[i]:eventOffsets[i + 1] of frame i.
+
+    :return: Tuple of arrays with one row per frame (towers taken, dragons taken, dragon soul,
+    player alive, player has baron, player has elder, baron time left, elder time left)
+    """
+    numFrames = len(frameTimes)
+    towersTaken = np.zeros((numFrames, 2), np.int64)
+    dragonsTaken = np.zeros((numFrames, 2), np.int64)
+    dragonSoulTaken = np.zeros(numFrames, np.int64)
+    isPlayerAlive = np.ones((numFrames, 10), np.bool_)
+    playerHasBaron = np.zeros((numFrames, 10), np.bool_)
+    playerHasElder = np.zeros((numFrames, 10), np.bool_)
+    baronBuffTimeLeft = np.zeros(numFrames, np.int64)
+    elderBuffTimeLeft = np.zeros(numFrames, np.int64)
+
+    towers = np.zeros(2, np.int64)
+    dragons = np.zeros(2, np.int64)
+    alive = np.ones(10, np.bool_)
+    hasBaron = np.zeros(10, np.bool_)
+    hasElder = np.zeros(10, np.bool_)
+    soul = 0
+    baronLeft = 0
+    elderLeft = 0
+    lastTime = 0
+    for frame in range(numFrames):
+        currTime = frameTimes[frame]
+        alive[:] = True
+        elapsed = currTime - lastTime
+        if elapsed > 0:
+            if baronLeft > 0 and elapsed < baronLeft:
+                baronLeft -= elapsed
+            else:
+                baronLeft = 0
+                hasBaron[:] = False
+            if elderLeft > 0 and elapsed < elderLeft:
+                elderLeft -= elapsed
+            else:
+                elderLeft = 0
+                hasElder[:] = False
+        lastTime = currTime
+
+        for event in range(eventOffsets[frame], eventOffsets[frame + 1]):
+            eventType = eventTypes[event]
+            team = eventTeams[event]
+            if eventType == _CHAMPION_KILL:
+                player = eventPlayers[event]
+                alive[player] = False
+                hasBaron[player] = False
+                hasElder[player] = False
+            elif eventType == _TOWER_KILL:
+                towers[team] += 1
+            elif eventType == _DRAGON_KILL:
+                dragons[team] += 1
+            elif eventType == _BARON_KILL:
+                baronLeft = BARON_BUFF_DURATION_MS - (currTime - eventTimes[event])
+                hasBaron[team * 5 : team * 5 + 5] = True
+            elif eventType == _ELDER_KILL:
+                elderLeft = ELDER_BUFF_DURATION_MS - (currTime - eventTimes[event])
+                hasElder[team * 5 : team * 5 + 5] = True
+            elif eventType == _DRAGON_SOUL:
+                soul = team + 1
+
+        towersTaken[frame] = towers
+        dragonsTaken[frame] = dragons
+        dragonSoulTaken[frame] = soul
+        isPlayerAlive[frame] = alive
+        playerHasBaron[frame] = hasBaron
+        playerHasElder[frame] = hasElder
+        baronBuffTimeLeft[frame] = baronLeft
+        elderBuffTimeLeft[frame] = elderLeft
+    return (
+        towersTaken,
+        dragonsTaken,
+        dragonSoulTaken,
+        isPlayerAlive,
+        playerHasBaron,
+        playerHasElder,
+        baronBuffTimeLeft,
+        elderBuffTimeLeft,
+    )
+
+
+# Compiled on first use and cached in __pycache__, so only the first process ever pays for it
+_compiledStateMachine = (
+    njit(cache=True, nogil=True)(run_state_machine) if njit is not None else None
+)
+
+
+class EventTrace:
+    """The game state at every frame of a match, as computed by run_state_machine.
+
+    GameState.loadTrace points a GameState at one of its rows, so samples are assembled
+    by the same extraction plans as with events processed one by one.
+    """
+
+    towersTaken: np.ndarray
+    dragonsTaken: np.ndarray
+    dragonSoulTaken: np.ndarray
+    isPlayerAlive: np.ndarray
+    playerHasBaron: np.ndarray
+    playerHasElder: np.ndarray
+    baronBuffTimeLeft: np.ndarray
+    elderBuffTimeLeft: np.ndarray
+
+    def __init__(self, states) -> None:
+        (
+            self.towersTaken,
+            self.dragonsTaken,
+            self.dragonSoulTaken,
+            self.isPlayerAlive,
+            self.playerHasBaron,
+            self.playerHasElder,
+            self.baronBuffTimeLeft,
+            self.elderBuffTimeLeft,
+        ) = states
+
+    def __len__(self) -> int:
+        return len(self.dragonSoulTaken)
+
+
+def trace_match(
+    frames: List[Frame],
+    toGameEvent: Callable[[Event], Optional[GameEvent]],
+    eventTypes=None,
+    jit=True,
+) -> EventTrace:
+    """Encode the events of a match as integer arrays and run the state machine over them
+
+    :param frames: Frames of the match, in order
+    :param toGameEvent: Translation of a raw event to a normalized event (see OfflineParser.toGameEvent)
+    :param eventTypes: Types of the raw events that can change the state, the others are skipped
+    :param jit: Whether to run the numba-compiled state machine, False runs it as plain Python
+    :return: EventTrace with one row per frame
+    """
+    return trace_events(
+        np.array([frame.timestamp for frame in frames], dtype=np.int64),
+        *encode_events(frames, toGameEvent, eventTypes),
+        jit,
+    )
+
+
+def encode_events(
+    frames: List[Frame],
+    toGameEvent: Callable[[Event], Optional[GameEvent]],
+    eventTypes=None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Normalized events of a match as arrays (see trace_match)
+
+    :return: Tuple (event offsets of each frame, types, times, teams, players)
+    """
+    types: List[int] = []
+    times: List[int] = []
+    teams: List[int] = []
+    players: List[int] = []
+    eventOffsets = np.zeros(len(frames) + 1, dtype=np.int64)
+    for index, frame in enumerate(frames):
+        for event in frame.events:
+            if eventTypes is not None and event.type not in eventTypes:
+                continue
+            gameEvent = toGameEvent(event)
+            if gameEvent is not None:
+                types.append(gameEvent.type)
+                times.append(gameEvent.timestamp)
+                teams.append(gameEvent.team)
+                players.append(gameEvent.player)
+        eventOffsets[index + 1] = len(types)
+
+    return (
+        eventOffsets,
+        np.array(types, dtype=np.int8),
+        np.array(times, dtype=np.int64),
+        np.array(teams, dtype=np.int8),
+        np.array(players, dtype=np.int8),
+    )
+
+
+def trace_events(
+    frameTimes: np.ndarray,
+    eventOffsets: np.ndarray,
+    eventTypes: np.ndarray,
+    eventTimes: np.ndarray,
+    eventTeams: np.ndarray,
+    eventPlayers: np.ndarray,
+    jit=True,
+) -> EventTrace:
+    """Run the state machine over normalized events already encoded as arrays (see run_state_machine)"""
+    stateMachine = _compiledStateMachine if jit else run_state_machine
+    if stateMachine is None:
+        raise ValueError("numba is not installed, the JIT engine is unavailable")
+    return EventTrace(
+        stateMachine(
+            frameTimes, eventOffsets, eventTypes, eventTimes, eventTeams, eventPlayers
+        )
+    )
+
+
+class Sampling(NamedTuple):
+    """When the samples of a match are taken, by default at every frame of its timeline (every minute)"""
+
+    # Also sample every interval milliseconds (the live processor polls every 10 seconds)
+    interval: Optional[int] = None
+    # Also sample at the time of every event changing the game state
+    atEvents: bool = False
+
+    @property
+    def perFrame(self) -> bool:
+        return self.interval is None and not self.atEvents
+
+    def getSampleTimes(
+        self, frameTimes: np.ndarray, eventTimes: np.ndarray
+    ) -> np.ndarray:
+        """Sorted sample times between the first and the last frame, always including the last one"""
+        if self.interval is not None and self.interval <= 0:
+            raise ValueError(f"Sampling interval must be positive, got {self.interval}")
+        start, end = frameTimes[0], frameTimes[-1]
+        times = [frameTimes[-1:]]
+        if self.interval is not None:
+            times.append(np.arange(start, end, self.interval, dtype=np.int64))
+        if self.atEvents:
+            times += [
+                frameTimes,
+                eventTimes[(eventTimes >= start) & (eventTimes <= end)],
+            ]
+        return np.unique(np.concatenate(times)).astype(np.int64)
+
+
+FRAME_SAMPLING = Sampling()
+
+
+def interpolate_frames(
+    frameTimes: np.ndarray, values: np.ndarray, times: np.ndarray, floor=False
+) -> np.ndarray:
+    """Per-player stats (e.g. total gold) at the given times, linearly interpolated between frames
+
+    :param frameTimes: Times of the frames
+    :param values: Stats of each player at each frame, shape (number of frames, 10)
+    :param times: Times to interpolate at, between the first and the last frame
+    :param floor: Round down instead of to the nearest integer (e.g. for levels)
+    :return: int64 array of shape (len(times), 10)
+    """
+    if len(frameTimes) < 2:
+        return np.repeat(values[:1], len(times), axis=0).astype(np.int64)
+    before = np.clip(
+        np.searchsorted(frameTimes, times, side="right") - 1, 0, len(frameTimes) - 2
+    )
+    span = frameTimes[before + 1] - frameTimes[before]
+    weight = np.clip((times - frameTimes[before]) / np.maximum(span, 1), 0, 1)
+    interpolated = values[before] + weight[:, None] * (
+        values[before + 1] - values[before]
+    )
+    return (np.floor(interpolated) if floor else np.rint(interpolated)).astype(np.int64)
+
+
+class ResolvedMatch(NamedTuple):
+    """Inputs of the samples of a match at the times of a Sampling"""
+
+    sampleTimes: np.ndarray
+    trace: EventTrace
+    # Stats of each player at each sample time, None when not given
+    gold: Optional[np.ndarray]
+    level: np.ndarray
+    # Whether each player is alive at each sample time, from the respawn time of their deaths
+    alive: np.ndarray
+
+
+def resolve_events(
+    sampling: Sampling,
+    frameTimes: np.ndarray,
+    frameGold: Optional[np.ndarray],
+    frameLevel: np.ndarray,
+    eventTypes: np.ndarray,
+    eventTimes: np.ndarray,
+    eventTeams: np.ndarray,
+    eventPlayers: np.ndarray,
+    jit=True,
+) -> ResolvedMatch:
+    """Inputs of the samples of a match at any resolution, from its frames and normalized events
+
+    The state machine runs once over the events sorted by time, with the sample times in place of
+    the frame times, so the cost is linear in events and samples. Player stats only exist at frames
+    and are interpolated in between. Whether a player is alive comes from the base respawn time at
+    their level when killed, like the live client reports it, instead of kills since the last sample.
+
+    :param sampling: When to sample, not per frame
+    :param frameTimes: Times of the frames
+    :param frameGold: Total gold of each player at each frame, None if not needed
+    :param frameLevel: Level of each player at each frame
+    :return: ResolvedMatch with one row per sample time
+    """
+    order = np.argsort(eventTimes, kind="stable")
+    eventTypes, eventTimes, eventTeams, eventPlayers = (
+        eventTypes[order],
+        eventTimes[order],
+        eventTeams[order],
+        eventPlayers[order],
+    )
+    sampleTimes = sampling.getSampleTimes(frameTimes, eventTimes)
+    eventOffsets = np.concatenate(
+        ([0], np.searchsorted(eventTimes, sampleTimes, side="right"))
+    ).astype(np.int64)
+    # Events after the last frame are dropped, the state machine only reads eventOffsets[-1] events
+    trace = trace_events(
+        sampleTimes, eventOffsets, eventTypes, eventTimes, eventTeams, eventPlayers, jit
+    )
+
+    alive = np.ones((len(sampleTimes), 10), dtype=bool)
+    kills = np.flatnonzero(eventTypes[: eventOffsets[-1]] == _CHAMPION_KILL)
+    if len(kills):
+        killTimes = eventTimes[kills]
+        killLevels = interpolate_frames(frameTimes, frameLevel, killTimes, floor=True)
+        victims = eventPlayers[kills].astype(np.int64)
+        respawnTimes = (
+            killTimes
+            + _RESPAWN_TIMES_MS[
+                np.clip(killLevels[np.arange(len(kills)), victims], 1, 18) - 1
+            ]
+        )
+        first = np.searchsorted(sampleTimes, killTimes, side="left")
+        last = np.searchsorted(sampleTimes, respawnTimes, side="left")
+        for victim, start, stop in zip(victims, first, last):
+            alive[start:stop, victim] = False
+
+    return ResolvedMatch(
+        sampleTimes,
+        trace,
+        (
+            interpolate_frames(frameTimes, frameGold, sampleTimes)
+            if frameGold is not None
+            else None
+        ),
+        interpolate_frames(frameTimes, frameLevel, sampleTimes, floor=True),
+        alive,
+    )
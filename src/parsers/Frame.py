@@ -51,6 +51,10 @@ class Event:
     assistingParticipantIds: List[int]
     wardType: Optional[str]
     creatorId: Optional[int]
+    participantId: Optional[int]
+    itemId: Optional[int]
+    beforeId: Optional[int]
+    afterId: Optional[int]
 
     def __init__(self, data: dict):
         self.type = data["type"]
@@ -66,6 +70,10 @@ class Event:
         self.buildingType = data.get("buildingType")
         self.monsterType = data.get("monsterType")
         self.monsterSubType = data.get("monsterSubType")
+        self.participantId = data.get("participantId")
+        self.itemId = data.get("itemId")
+        self.beforeId = data.get("beforeId")
+        self.afterId = data.get("afterId")
 
 
 class Frame:
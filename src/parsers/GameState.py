@@ -0,0 +1,206 @@
+from enum import IntEnum, unique
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+import numpy as np
+from src.parsers.Sample import Sample
+from src.features.features import DEFAULT_PLAN, ExtractionPlan, FrameInputs
+
+if TYPE_CHECKING:
+    from src.parsers.EventEngine import EventTrace
+
+BARON_BUFF_DURATION_MS = 180000
+ELDER_BUFF_DURATION_MS = 150000
+# fmt: off
+# Base respawn time of a champion killed at each level (1 to 18), later games add to it
+RESPAWN_TIMES_MS = (
+    10000, 10000, 12000, 12000, 14000, 16000, 20000, 25000, 28000,
+    32500, 35000, 37500, 40000, 42500, 45000, 47500, 50000, 52500,
+)
+# fmt: on
+
+
+@unique
+class GameEventType(IntEnum):
+    """The events that change the game state, independent of the data source"""
+
+    TOWER_KILL = 0
+    CHAMPION_KILL = 1
+    DRAGON_KILL = 2
+    ELDER_KILL = 3
+    BARON_KILL = 4
+    DRAGON_SOUL = 5
+
+
+class GameEvent(NamedTuple):
+    """A normalized event.
+
+    Times are in milliseconds, team is 0 for team 1 (blue side, ORDER) and 1 for team 2
+    (red side, CHAOS) and players are indexed 0-4 for team 1 and 5-9 for team 2 (by position).
+    """
+
+    type: GameEventType
+    timestamp: int
+    # The team credited with the event (taking the tower/dragon/buff/soul)
+    team: int = -1
+    # The player the event happened to (the victim of a kill)
+    player: int = -1
+
+
+class GameState:
+    """The game state engine shared by the offline and live parsers.
+
+    Parsers only translate their raw data into normalized events and per-player stats,
+    the state machine and the feature assembly are the same for training and inference.
+    """
+
+    _lastTimeStamp: int
+    _isPlayerAlive: np.ndarray
+    # Dragon info, 0 = Nope, 1= Team 1, 2= Team 2
+    _dragonsTaken: np.ndarray
+    _dragonSoulTaken: int
+    # Elder info
+    _elderBuffTimeLeft: int
+    _playerHasElder: np.ndarray
+    # Baron info
+    _baronBuffTimeLeft: int
+    _playerHasBaron: np.ndarray
+    _towersTaken: np.ndarray
+
+    def __init__(self) -> None:
+        self.setDefaults()
+
+    def setDefaults(self) -> None:
+        self._lastTimeStamp = 0
+        self._dragonSoulTaken = 0
+        self._baronBuffTimeLeft = 0
+        self._elderBuffTimeLeft = 0
+        self._isPlayerAlive = np.ones(10, dtype=bool)
+        self._playerHasBaron = np.zeros(10, dtype=bool)
+        self._playerHasElder = np.zeros(10, dtype=bool)
+        self._towersTaken = np.zeros(2, dtype=np.int64)
+        self._dragonsTaken = np.zeros(2, dtype=np.int64)
+
+    @property
+    def dragonsTaken(self) -> np.ndarray:
+        return self._dragonsTaken
+
+    @property
+    def dragonSoulTaken(self) -> int:
+        return self._dragonSoulTaken
+
+    @property
+    def towersTaken(self) -> np.ndarray:
+        return self._towersTaken
+
+    @property
+    def playerHasBaron(self) -> np.ndarray:
+        return self._playerHasBaron
+
+    @property
+    def playerHasElder(self) -> np.ndarray:
+        return self._playerHasElder
+
+    def getBaronBuffDurationByTeam(self):
+        team1HasBaron = self._playerHasBaron[:5].any()
+        team1 = self._baronBuffTimeLeft if team1HasBaron else 0
+        team2 = self._baronBuffTimeLeft if not team1HasBaron else 0
+        return team1, team2
+
+    def getElderBuffDurationByTeam(self):
+        team1HasElder = self._playerHasElder[:5].any()
+        team1 = self._elderBuffTimeLeft if team1HasElder else 0
+        team2 = self._elderBuffTimeLeft if not team1HasElder else 0
+        return team1, team2
+
+    def resetIsPlayerAlive(self):
+        self._isPlayerAlive[:] = True
+
+    def setBaronBuffTimeLeft(self, elapsed: int):
+        if self._baronBuffTimeLeft > 0 and elapsed < self._baronBuffTimeLeft:
+            self._baronBuffTimeLeft -= elapsed
+        else:
+            self._baronBuffTimeLeft = 0
+            self._playerHasBaron[:] = False
+
+    def setElderBuffTimeLeft(self, elapsed: int):
+        if self._elderBuffTimeLeft > 0 and elapsed < self._elderBuffTimeLeft:
+            self._elderBuffTimeLeft -= elapsed
+        else:
+            self._elderBuffTimeLeft = 0
+            self._playerHasElder[:] = False
+
+    def processTime(self, newTimeStamp: int):
+        elapsed = newTimeStamp - self._lastTimeStamp
+        if elapsed > 0:
+            self.setBaronBuffTimeLeft(elapsed)
+            self.setElderBuffTimeLeft(elapsed)
+            self.resetIsPlayerAlive()
+        self._lastTimeStamp = newTimeStamp
+
+    def processEvent(self, event: GameEvent, currTime: int):
+        if event.type == GameEventType.CHAMPION_KILL:
+            self._isPlayerAlive[event.player] = False
+            self._playerHasBaron[event.player] = False
+            self._playerHasElder[event.player] = False
+        elif event.type == GameEventType.TOWER_KILL:
+            self._towersTaken[event.team] += 1
+        elif event.type == GameEventType.DRAGON_KILL:
+            self._dragonsTaken[event.team] += 1
+        elif event.type == GameEventType.BARON_KILL:
+            self._baronBuffTimeLeft = BARON_BUFF_DURATION_MS - (
+                currTime - event.timestamp
+            )
+            self._playerHasBaron[event.team * 5 : event.team * 5 + 5] = True
+        elif event.type == GameEventType.ELDER_KILL:
+            self._elderBuffTimeLeft = ELDER_BUFF_DURATION_MS - (
+                currTime - event.timestamp
+            )
+            self._playerHasElder[event.team * 5 : event.team * 5 + 5] = True
+        elif event.type == GameEventType.DRAGON_SOUL:
+            self._dragonSoulTaken = event.team + 1
+
+    def processEvents(self, events: Iterable[GameEvent], currTime: int):
+        for event in events:
+            self.processEvent(event, currTime)
+
+    def loadTrace(self, trace: "EventTrace", frameIndex: int):
+        """Set the state to the state of a frame computed by the event engine"""
+        self._towersTaken = trace.towersTaken[frameIndex]
+        self._dragonsTaken = trace.dragonsTaken[frameIndex]
+        self._dragonSoulTaken = trace.dragonSoulTaken[frameIndex]
+        self._isPlayerAlive = trace.isPlayerAlive[frameIndex]
+        self._playerHasBaron = trace.playerHasBaron[frameIndex]
+        self._playerHasElder = trace.playerHasElder[frameIndex]
+        self._baronBuffTimeLeft = trace.baronBuffTimeLeft[frameIndex]
+        self._elderBuffTimeLeft = trace.elderBuffTimeLeft[frameIndex]
+
+    def getSample(
+        self,
+        timestamp: int,
+        gold: Optional[np.ndarray],
+        level: Optional[np.ndarray],
+        alive: Optional[np.ndarray] = None,
+        flipTeam=False,
+        debug=False,
+        plan: ExtractionPlan = DEFAULT_PLAN,
+    ) -> Sample:
+        """Assemble the features of the current state
+
+        :param timestamp: Game time in milliseconds
+        :param gold: Gold of each player, indexed like GameEvent.player (None if the plan does not need it)
+        :param level: Level of each player, indexed like GameEvent.player (None if the plan does not need it)
+        :param alive: Whether each player is alive, defaults to the state tracked from kill events
+        :param flipTeam: Whether to present team 2 as the first team
+        :param debug: Whether to print the features
+        :param plan: The features to compute
+        :return: Sample of the current state
+        """
+        if alive is None:
+            alive = self._isPlayerAlive
+        frame = FrameInputs(timestamp, gold, level, alive, self)
+        return Sample(
+            plan,
+            plan.computeGameValues(frame),
+            plan.computeTeamValues(frame),
+            flipTeam,
+            debug,
+        )
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Item:
@@ -15,10 +15,10 @@ class Item:
     displayName: str
     itemCost: int
 
-    def __init__(self, data: dict, itemsInfo: dict):
+    def __init__(self, data: dict, itemCosts: Dict[int, int]):
         self.itemID = data["itemID"]
         self.displayName = data["displayName"]
-        self.itemCost = itemsInfo["data"][str(self.itemID)]["gold"]["total"]
+        self.itemCost = itemCosts[self.itemID]
 
 
 class Rune:
@@ -127,11 +127,11 @@ class Player:
     summonerSpells: SummonerSpell
     team: str
 
-    def __init__(self, data: dict, itemsInfo: dict):
+    def __init__(self, data: dict, itemCosts: Dict[int, int]):
         self.championName = data["championName"]
         self.isBot = data["isBot"]
         self.isDead = data["isDead"]
-        self.items = [Item(item_data, itemsInfo) for item_data in data["items"]]
+        self.items = [Item(item_data, itemCosts) for item_data in data["items"]]
         self.level = data["level"]
         position = data.get("position", "MIDDLE")
         self.position = position if position != "" else "JUNGLE"
@@ -192,9 +192,14 @@ class LiveFrame:
     players: List[Player]
 
     def __init__(
-        self, timestamp: int, eventsData: dict, playersData: dict, itemsInfo: dict
+        self,
+        timestamp: int,
+        eventsData: dict,
+        playersData: dict,
+        itemCosts: Dict[int, int],
     ):
         # Initialize the events list with Event objects
-        self.timestamp = timestamp * 60000
+        # gameTime is in seconds, parsers work in milliseconds
+        self.timestamp = int(timestamp * 1000)
         self.events = [LiveEvent(eventData) for eventData in eventsData["Events"]]
-        self.players = [Player(playerData, itemsInfo) for playerData in playersData]
+        self.players = [Player(playerData, itemCosts) for playerData in playersData]
@@ -1,240 +1,194 @@
-from typing import Dict, List, Optional, Tuple
+from typing import List, Optional
+import numpy as np
+from src.features.features import DEFAULT_PLAN, ExtractionPlan, FeatureInput
+from src.parsers.EventEngine import (
+    FRAME_SAMPLING,
+    JIT_ENABLED,
+    EventTrace,
+    ResolvedMatch,
+    Sampling,
+    encode_events,
+    resolve_events,
+    trace_match,
+)
 from src.parsers.Frame import Event, Frame
+from src.parsers.GameState import GameEvent, GameEventType, GameState
 from src.parsers.Sample import Sample
-from src.features.features import (
-    AlivePlayers,
-    BuffRemaining,
-    DragonKills,
-    FeatureKeys,
-    GameStat,
-    GoldPercentage,
-    PlayersWithActiveBuff,
-    TeamHasDragonSoul,
-    TeamStat,
-    TimeStamp,
-    TotalTeamLevel,
-    TowerKills,
+from src.profiling import PROFILER
+
+# The raw events toGameEvent can translate, every other event leaves the state unchanged
+STATE_EVENT_TYPES = frozenset(
+    ("BUILDING_KILL", "CHAMPION_KILL", "ELITE_MONSTER_KILL", "DRAGON_SOUL_GIVEN")
 )
 
 
 class OfflineParser:
     """An implementation of the Parser interface that enables collection of 'offline' data.
 
-    Parses data from the MATCHv5 endpoint and creates samples for training.
+    Parses data from the MATCHv5 endpoint and creates samples for training. With jit, the
+    events of the whole match are run through the compiled state machine of EventEngine up
+    front, otherwise they're processed frame by frame by GameState.
+
+    By default there is one sample per frame (every minute). Other samplings (e.g. every 10
+    seconds, like the live processor) are resolved up front by EventEngine.resolve_events.
     """
 
-    _lastTimeStamp: int
-    # 0 = Nope, 1= Team 1, 2= Team 2
     _frames: List[Frame]
-    _isPlayerAlive: List[bool]
-    # Dragon info
-    _dragonsTaken: Tuple[int, int]
-    _dragonSoulTaken: int
-    # Elder info
-    _edlerBuffDurationInMS: int
-    _elderBuffTimeLeft: int
-    _playerHasElder: List[bool]
-    # Baron info
-    _baronBuffDurationInMS: int
-    _baronBuffTimeLeft: int
-    _playerHasBaron: List[bool]
-    _towersTaken: Tuple[int, int]
-
-    def __init__(self, frames: List[Frame]) -> None:
-        self.setDefaults()
+    _state: GameState
+    _plan: ExtractionPlan
+    _trace: Optional[EventTrace]
+    _frameIndex: int
+    _resolved: Optional[ResolvedMatch]
+
+    def __init__(
+        self,
+        frames: List[Frame],
+        plan: ExtractionPlan = DEFAULT_PLAN,
+        jit=JIT_ENABLED,
+        sampling: Sampling = FRAME_SAMPLING,
+    ) -> None:
+        self._state = GameState()
         self._frames = frames[::-1]
+        self._plan = plan
+        self._trace = None
+        self._frameIndex = 0
+        self._resolved = None
+        if not sampling.perFrame and frames:
+            with PROFILER.stage("OfflineParser.resolveEvents"):
+                self._resolved = self.resolveEvents(frames, sampling, jit)
+        elif jit:
+            with PROFILER.stage("OfflineParser.traceMatch"):
+                self._trace = trace_match(frames, self.toGameEvent, STATE_EVENT_TYPES)
 
     def setDefaults(self) -> None:
-        self._lastTimeStamp = 0
-        self._dragonSoulTaken = 0
-        self._baronBuffDurationInMS = 180000
-        self._edlerBuffDurationInMS = 150000
-        self._baronBuffTimeLeft = 0
-        self._elderBuffTimeLeft = 0
-        self._isPlayerAlive = [True] * 10
-        self._playerHasBaron = [False] * 10
-        self._playerHasElder = [False] * 10
-        self._towersTaken = (0, 0)
-        self._dragonsTaken = (0, 0)
-
-    def getTotalGold(self, frame: Frame) -> int:
-        totalGold = 0
-        for pid in frame.participantFrames:
-            totalGold += frame.participantFrames[pid].currentGold
-        return totalGold
-
-    def getBaronBuffDurationByTeam(self):
-        team1HasBaron = True in self._playerHasBaron[:5]
-        team1 = self._baronBuffTimeLeft if team1HasBaron else 0
-        team2 = self._baronBuffTimeLeft if not team1HasBaron else 0
-        return team1, team2
-
-    def getElderBuffDurationByTeam(self):
-        team1HasElder = True in self._playerHasElder[:5]
-        team1 = self._elderBuffTimeLeft if team1HasElder else 0
-        team2 = self._elderBuffTimeLeft if not team1HasElder else 0
-        return team1, team2
-
-    def resetIsPlayerAlive(self):
-        self._isPlayerAlive = [True] * 10
-
-    def setBaronBuffTimeLeft(self, elapsed: int):
-        if self._baronBuffTimeLeft > 0 and elapsed < self._baronBuffTimeLeft:
-            self._baronBuffTimeLeft -= elapsed
-        else:
-            self._baronBuffTimeLeft = 0
-            self._playerHasBaron = [False] * 10
-
-    def setElderBuffTimeLeft(self, elapsed: int):
-        if self._elderBuffTimeLeft > 0 and elapsed < self._elderBuffTimeLeft:
-            self._elderBuffTimeLeft -= elapsed
-        else:
-            self._elderBuffTimeLeft = 0
-            self._playerHasElder = [False] * 10
-
-    def processTime(self, newTimeStamp: int):
-        elapsed = newTimeStamp - self._lastTimeStamp
-        if elapsed > 0:
-            self.setBaronBuffTimeLeft(elapsed)
-            self.setElderBuffTimeLeft(elapsed)
-            # Atleast one minute has passed on every update so respawn everyone
-            self.resetIsPlayerAlive()
-
-    def processBuildingKill(self, event: Event):
-        if event.buildingType == "INHIBITOR_BUILDING":
-            return
-        # teamId indicates which team the tower belonged too
-        # the number of towers destroyed by each team
-        team1 = self._towersTaken[0] + int(event.teamId == 200)
-        team2 = self._towersTaken[1] + int(event.teamId == 100)
-        self._towersTaken = (team1, team2)
-
-    def processChampionKill(self, event: Event):
-        player = event.victimId - 1  # type: ignore
-        self._isPlayerAlive[player] = False
-        self._playerHasBaron[player] = False
-        self._playerHasElder[player] = False
-
-    def processEliteMonsterKill(self, event: Event, currTime: int):
-        elapsed = currTime - event.timestamp
-        playerBuffStatus = []
-        if event.monsterType == "BARON_NASHOR":
-            self._baronBuffTimeLeft = self._baronBuffDurationInMS - elapsed
-            playerBuffStatus = self._playerHasBaron
-        elif event.monsterType == "DRAGON" and event.monsterSubType == "ELDER_DRAGON":
-            self._elderBuffTimeLeft = self._edlerBuffDurationInMS - elapsed
-            playerBuffStatus = self._playerHasElder
-        elif event.monsterType == "DRAGON":
-            team1 = self._dragonsTaken[0] + int(event.killerTeamId == 100)
-            team2 = self._dragonsTaken[1] + int(event.killerTeamId == 200)
-            self._dragonsTaken = (team1, team2)
-            return
-        else:
+        self._state.setDefaults()
+
+    def toGameEvent(self, event: Event) -> Optional[GameEvent]:
+        if event.type == "BUILDING_KILL":
+            if event.buildingType == "INHIBITOR_BUILDING":
+                return None
+            # teamId indicates which team the tower belonged too
+            return GameEvent(
+                GameEventType.TOWER_KILL,
+                event.timestamp,
+                0 if event.teamId == 200 else 1,
+            )
+        elif event.type == "CHAMPION_KILL":
+            return GameEvent(
+                GameEventType.CHAMPION_KILL, event.timestamp, player=event.victimId - 1  # type: ignore
+            )
+        elif event.type == "ELITE_MONSTER_KILL":
+            team = 0 if event.killerTeamId == 100 else 1
+            if event.monsterType == "BARON_NASHOR":
+                return GameEvent(GameEventType.BARON_KILL, event.timestamp, team)
+            elif (
+                event.monsterType == "DRAGON" and event.monsterSubType == "ELDER_DRAGON"
+            ):
+                return GameEvent(GameEventType.ELDER_KILL, event.timestamp, team)
+            elif event.monsterType == "DRAGON" and event.killerTeamId in (100, 200):
+                return GameEvent(GameEventType.DRAGON_KILL, event.timestamp, team)
             # Could also be void grubs - not yet considered
-            return
-
-        teamOffset = 0 if event.killerTeamId == 100 else 5
-        for player in range(5):
-            playerBuffStatus[player + teamOffset] = True
-
-    def processDragonSoulGiven(self, event: Event):
-        self._dragonSoulTaken = event.teamId // 100  # type: ignore
+            return None
+        elif event.type == "DRAGON_SOUL_GIVEN":
+            return GameEvent(
+                GameEventType.DRAGON_SOUL, event.timestamp, event.teamId // 100 - 1  # type: ignore
+            )
+        # noop - we don't care about the other events (for now)
+        return None
 
     def processEvents(self, frame: Frame):
         for event in frame.events:
-            if event.type == "BUILDING_KILL":
-                self.processBuildingKill(event)
-            elif event.type == "CHAMPION_KILL":
-                self.processChampionKill(event)
-            elif event.type == "ELITE_MONSTER_KILL":
-                self.processEliteMonsterKill(event, frame.timestamp)
-            elif event.type == "DRAGON_SOUL_GIVEN":
-                self.processDragonSoulGiven(event)
-            else:
-                # noop - we don't care about the other events (for now)
-                pass
+            gameEvent = self.toGameEvent(event)
+            if gameEvent is not None:
+                self._state.processEvent(gameEvent, frame.timestamp)
+        if PROFILER.enabled:
+            for event in frame.events:
+                PROFILER.count(f"events.{event.type}")
+
+    def resolveEvents(
+        self, frames: List[Frame], sampling: Sampling, jit=JIT_ENABLED
+    ) -> ResolvedMatch:
+        eventOffsets, *events = encode_events(
+            frames, self.toGameEvent, STATE_EVENT_TYPES
+        )
+        stats = np.array(
+            [
+                [
+                    (
+                        frame.participantFrames[str(player + 1)].totalGold,
+                        frame.participantFrames[str(player + 1)].level,
+                    )
+                    for player in range(10)
+                ]
+                for frame in frames
+            ],
+            dtype=np.int64,
+        )
+        if PROFILER.enabled:
+            for frame in frames:
+                for event in frame.events:
+                    PROFILER.count(f"events.{event.type}")
+        return resolve_events(
+            sampling,
+            np.array([frame.timestamp for frame in frames], dtype=np.int64),
+            stats[:, :, 0] if self._plan.needs(FeatureInput.GOLD) else None,
+            stats[:, :, 1],
+            *events,
+            jit=jit,
+        )
+
+    def getNextResolvedSample(self) -> Optional[Sample]:
+        resolved: ResolvedMatch = self._resolved  # type: ignore
+        i = self._frameIndex
+        if i >= len(resolved.sampleTimes):
+            return None
+        self._frameIndex += 1
+        self._state.loadTrace(resolved.trace, i)
+        with PROFILER.stage("GameState.getSample"):
+            return self._state.getSample(
+                int(resolved.sampleTimes[i]),
+                resolved.gold[i] if resolved.gold is not None else None,
+                resolved.level[i] if self._plan.needs(FeatureInput.LEVEL) else None,
+                resolved.alive[i],
+                plan=self._plan,
+            )
 
     def getNextFrame(self) -> Optional[Sample]:
+        if self._resolved is not None:
+            return self.getNextResolvedSample()
         if not self._frames:
             return None
         currFrame = self._frames.pop()
-        self.resetIsPlayerAlive()
-        self.processTime(currFrame.timestamp)
-        self.processEvents(currFrame)
-
-        # Gold % (player gold / total gold in game)
-        totalGold = self.getTotalGold(currFrame)
-        # Total team Lvls
-        totalLevelTeam1 = 0
-        totalLevelTeam2 = 0
-        # # of players alive
-        totalPlayersAliveTeam1 = 0
-        totalPlayersAliveTeam2 = 0
-        # # of players with Baron active
-        numOfPlayersWithBaronTeam1 = 0
-        numOfPlayersWithBaronTeam2 = 0
-        # # of players with Elder active
-        numOfPlayersWithElderTeam1 = 0
-        numOfPlayersWithElderTeam2 = 0
-        goldPercentages: List[GoldPercentage] = []
-        for player in range(1, 6):
-            enemyPlayer = player + 5
-            playerGoldTeam1 = currFrame.participantFrames[str(player)].totalGold
-            playerGoldTeam2 = currFrame.participantFrames[str(enemyPlayer)].totalGold
-            goldPercentages += [
-                GoldPercentage(
-                    totalGold,
-                    playerGoldTeam1,
-                    playerGoldTeam2,
-                )
-            ]
-            totalLevelTeam1 += currFrame.participantFrames[str(player)].level
-            totalLevelTeam2 += currFrame.participantFrames[str(enemyPlayer)].level
-            totalPlayersAliveTeam1 += self._isPlayerAlive[player - 1]
-            totalPlayersAliveTeam2 += self._isPlayerAlive[enemyPlayer - 1]
-            numOfPlayersWithBaronTeam1 += int(self._playerHasBaron[player - 1])
-            numOfPlayersWithBaronTeam2 += int(self._playerHasBaron[enemyPlayer - 1])
-            numOfPlayersWithElderTeam1 += int(self._playerHasElder[player - 1])
-            numOfPlayersWithElderTeam2 += int(self._playerHasElder[enemyPlayer - 1])
-
-        # Tower kills
-        towerKillsTeam1, towerKillsTeam2 = self._towersTaken
-        # Dragon kills (whether a team has dragon soul or not)
-        dragonsKilledTeam1, dragonsKillsTeam2 = self._dragonsTaken
-        gameFeatures: Dict[FeatureKeys, GameStat] = {
-            FeatureKeys.TimeStamp: TimeStamp(timestamp=currFrame.timestamp),
-        }
-        teamFeatures: Dict[FeatureKeys, TeamStat] = {
-            FeatureKeys.GoldPercentageTop: goldPercentages[0],
-            FeatureKeys.GoldPercentageJg: goldPercentages[1],
-            FeatureKeys.GoldPercentageMid: goldPercentages[2],
-            FeatureKeys.GoldPercentageBot: goldPercentages[3],
-            FeatureKeys.GoldPercentageSup: goldPercentages[4],
-            FeatureKeys.TotalTeamLevel: TotalTeamLevel(
-                totalLevelTeam1, totalLevelTeam2
-            ),
-            FeatureKeys.AlivePlayers: AlivePlayers(
-                totalPlayersAliveTeam1, totalPlayersAliveTeam2
-            ),
-            FeatureKeys.DragonSoul: TeamHasDragonSoul(
-                self._dragonSoulTaken == 1, self._dragonSoulTaken == 2
-            ),
-            FeatureKeys.TowerKills: TowerKills(towerKillsTeam1, towerKillsTeam2),
-            FeatureKeys.DragonKills: DragonKills(dragonsKilledTeam1, dragonsKillsTeam2),
-            FeatureKeys.PlayersWithElderBuff: PlayersWithActiveBuff(
-                numOfPlayersWithElderTeam1, numOfPlayersWithElderTeam2
-            ),
-            FeatureKeys.PlayersWithBaronBuff: PlayersWithActiveBuff(
-                numOfPlayersWithBaronTeam1, numOfPlayersWithBaronTeam2
-            ),
-            FeatureKeys.BaronBuffRemaining: BuffRemaining(
-                *self.getBaronBuffDurationByTeam()
-            ),
-            FeatureKeys.ElderBuffRemaining: BuffRemaining(
-                *self.getElderBuffDurationByTeam()
-            ),
-        }
-        self._lastTimeStamp = currFrame.timestamp
-        return Sample(gameFeatures, teamFeatures)
-        # Maybe later...
-        # - Inhibitor timers (how long until an inhibitor respawns) for each inhibitor
+        if self._trace is not None:
+            self._state.loadTrace(self._trace, self._frameIndex)
+            self._frameIndex += 1
+            if PROFILER.enabled:
+                for event in currFrame.events:
+                    PROFILER.count(f"events.{event.type}")
+        else:
+            self._state.resetIsPlayerAlive()
+            self._state.processTime(currFrame.timestamp)
+            with PROFILER.stage("OfflineParser.processEvents"):
+                self.processEvents(currFrame)
+
+        gold = level = None
+        if self._plan.needs(FeatureInput.GOLD):
+            gold = np.array(
+                [
+                    currFrame.participantFrames[str(player + 1)].totalGold
+                    for player in range(10)
+                ],
+                dtype=np.int64,
+            )
+        if self._plan.needs(FeatureInput.LEVEL):
+            level = np.array(
+                [
+                    currFrame.participantFrames[str(player + 1)].level
+                    for player in range(10)
+                ],
+                dtype=np.int64,
+            )
+        with PROFILER.stage("GameState.getSample"):
+            return self._state.getSample(
+                currFrame.timestamp, gold, level, plan=self._plan
+            )
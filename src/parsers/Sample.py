@@ -1,7 +1,7 @@
 from enum import Enum, unique
-from typing import Dict, List, Union
+from typing import List
 import numpy as np
-from src.features.features import FeatureKeys, GameStat, TeamStat
+from src.features.features import DEFAULT_PLAN, ExtractionPlan
 
 
 @unique
@@ -24,31 +24,27 @@ class Sample:
 
     def __init__(
         self,
-        gameFeatures: Dict[FeatureKeys, GameStat],
-        teamFeatures: Dict[FeatureKeys, TeamStat],
+        plan: ExtractionPlan,
+        gameValues: np.ndarray,
+        teamValues: np.ndarray,
         flipTeam=False,
         debug=False,
     ):
-        team1Features: List[Union[float, int]] = []
-        team2Features: List[Union[float, int]] = []
-        gameValues: List[Union[float, int]] = []
+        """
+        :param plan: The plan the values were computed by
+        :param gameValues: Values of plan.gameKeys
+        :param teamValues: Values of plan.teamKeys for team 1 then team 2, shape (2, len(plan.teamKeys))
+        """
+        if flipTeam:
+            teamValues = teamValues[::-1]
         if debug:
             print("STATS:")
-        for key in FeatureKeys:
-            if key in gameFeatures:
-                val = gameFeatures[key].getValue()
-                gameValues += [val]
-                if debug:
-                    print(f"   {key}: {val}")
-
-            else:
-                team1, team2 = teamFeatures[key].getValue(flipTeam=flipTeam)
-                team1Features += [team1]
-                team2Features += [team2]
-                if debug:
-                    print(f"   {key}: team: {team1}, enemy: {team2}")
-        self.teamValues = np.array([team1Features, team2Features])
-        self.gameValues = np.array(gameValues)
+            for key, val in zip(plan.gameKeys, gameValues):
+                print(f"   {key}: {val}")
+            for key, team1, team2 in zip(plan.teamKeys, *teamValues):
+                print(f"   {key}: team: {team1}, enemy: {team2}")
+        self.teamValues = teamValues
+        self.gameValues = gameValues
 
     def getValue(self, strategy: SampleFormatting) -> np.ndarray:
         if strategy == SampleFormatting.BY_TEAM:
@@ -62,3 +58,13 @@ class Sample:
         else:
             # Should be unreachable
             assert False
+
+
+def getFeatureNames(
+    strategy: SampleFormatting, plan: ExtractionPlan = DEFAULT_PLAN
+) -> List[str]:
+    """Names of the columns of Sample.getValue(strategy) for the samples of a plan, in order"""
+    gameNames = [key.name for key in plan.gameKeys]
+    if strategy == SampleFormatting.TAKE_DIFF:
+        return gameNames + [f"{key.name}Diff" for key in plan.teamKeys]
+    return gameNames + [key.name for key in plan.teamKeys]
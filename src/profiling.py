@@ -0,0 +1,156 @@
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict
+
+# Set to a path to enable profiling and write the stage report there when the process exits
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT")
+# Set to a path to also run the whole process under cProfile, .html writes a pyinstrument report instead
+CPROFILE_OUTPUT = os.getenv("CPROFILE_OUTPUT")
+# Counters reported as a rate per second of wall time
+RATE_COUNTERS = ("matches", "frames", "polls", "bytes_read")
+
+_DISABLED_STAGE = nullcontext()
+
+
+class StageTimer:
+    """Context manager adding the time spent in its block to a stage of a Profiler"""
+
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profiler.addTime(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Profiler:
+    """Per-stage timers and counters of a pipeline run.
+
+    When disabled, stage() returns a shared no-op context manager and count() returns at once,
+    so instrumented code only pays for a method call. Loops over many small items should still
+    check enabled before building stage names. Stages and counters can be updated from threads.
+    """
+
+    enabled: bool
+    stageTimes: Dict[str, float]
+    stageCalls: Dict[str, int]
+    counters: Dict[str, int]
+    _start: float
+    _lock: threading.Lock
+
+    def __init__(self, enabled=False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stageTimes = {}
+        self.stageCalls = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return StageTimer(self, name)
+
+    def addTime(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stageTimes[name] = self.stageTimes.get(name, 0.0) + seconds
+            self.stageCalls[name] = self.stageCalls.get(name, 0) + 1
+
+    def count(self, name: str, n=1) -> None:
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def getReport(self) -> dict:
+        wallSeconds = time.perf_counter() - self._start
+        return {
+            "wall_seconds": wallSeconds,
+            "stages": {
+                name: {
+                    "calls": self.stageCalls[name],
+                    "total_seconds": seconds,
+                    "mean_microseconds": seconds / self.stageCalls[name] * 1e6,
+                    "share_of_wall": seconds / wallSeconds,
+                }
+                for name, seconds in sorted(
+                    self.stageTimes.items(), key=lambda item: -item[1]
+                )
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "rates_per_second": {
+                name: self.counters[name] / wallSeconds
+                for name in RATE_COUNTERS
+                if name in self.counters
+            },
+        }
+
+    def writeReport(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.getReport(), f, indent=4)
+
+
+# Shared by every instrumented module of a process
+PROFILER = Profiler()
+
+
+def setup_from_env():
+    """Enable profiling if PROFILE_OUTPUT or CPROFILE_OUTPUT is set, writing the reports at exit
+
+    Called at the start of the main() of every instrumented script.
+    """
+    if PROFILE_OUTPUT:
+        PROFILER.enabled = True
+        PROFILER.reset()
+        atexit.register(PROFILER.writeReport, Path(PROFILE_OUTPUT))
+    if CPROFILE_OUTPUT:
+        start_function_profiler(Path(CPROFILE_OUTPUT))
+
+
+def start_function_profiler(path: Path):
+    """Profile every function call until exit, as a pstats file (snakeviz, gprof2dot...) or a pyinstrument HTML report
+
+    :param path: Path of the report, a .html suffix uses pyinstrument (optional, not in requirements.txt)
+    """
+    if path.suffix == ".html":
+        try:
+            from pyinstrument import Profiler as SamplingProfiler
+        except ImportError:
+            path = path.with_suffix(".prof")
+            print(
+                "pyinstrument is not installed (pip install pyinstrument), "
+                f"writing a cProfile report to {path} instead"
+            )
+        else:
+            sampler = SamplingProfiler()
+            sampler.start()
+
+            def write_html():
+                sampler.stop()
+                path.write_text(sampler.output_html(), encoding="utf-8")
+
+            atexit.register(write_html)
+            return
+    profile = cProfile.Profile()
+    profile.enable()
+
+    def write_stats():
+        profile.disable()
+        profile.dump_stats(path)
+
+    atexit.register(write_stats)
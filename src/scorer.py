@@ -0,0 +1,143 @@
+import json
+import os
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import List
+import numpy as np
+from tqdm import tqdm
+
+from src.features.features import DEFAULT_PLAN, ExtractionPlan, FeatureKeys
+from src.training_data_processor import generate_time_series_features
+from src.model_artifact import load_model_artifact
+
+MATCH_TIMELINE_DIR = Path.cwd() / "matches" / "match_timeline"
+SCORES_FILEPATH = Path.cwd() / "matches" / "scores" / "win_probabilities.npz"
+MATCH_TIMELINE_PREFIX = "match_timeline_"
+
+
+def featurize_match(match_timeline_filepath: Path, plan: ExtractionPlan = DEFAULT_PLAN):
+    """Generate the feature matrix of a whole match
+
+    :param match_timeline_filepath: Path to the match timeline JSON file
+    :param plan: The features the model was trained on
+    :return: Tuple (match ID, 2D numpy array with one row per frame), the matrix is None if the file can't be read
+    """
+    match_id = match_timeline_filepath.stem[len(MATCH_TIMELINE_PREFIX) :]
+    try:
+        with match_timeline_filepath.open(
+            mode="r", encoding="utf-8"
+        ) as match_timeline_f:
+            match_timeline = json.load(match_timeline_f)
+    except (IOError, ValueError):
+        return match_id, None
+    return match_id, np.vstack(generate_time_series_features(match_timeline, plan))
+
+
+def score_matches(
+    match_timeline_dir: Path,
+    model,
+    output_path: Path,
+    batch_size=100000,
+    processes=None,
+    plan: ExtractionPlan = DEFAULT_PLAN,
+):
+    """Compute the per-frame win probability curve of every stored match
+
+    Matches are parsed in parallel by a pool of processes, while the model is called on batches
+    of at least batch_size frames spanning many matches.
+
+    :param match_timeline_dir: Path to the directory containing the match timeline JSON files
+    :param model: Model with a predict_proba method, e.g. a ModelArtifact
+    :param output_path: Path to the .npz file to write the curves to
+    :param batch_size: Minimum number of frames per model call
+    :param processes: Number of parsing processes, defaults to the number of cores
+    :param plan: The features the model was trained on, TimeStamp must be one of them
+    :return: Number of matches scored
+    """
+    if FeatureKeys.TimeStamp not in plan.gameKeys:
+        raise ValueError(
+            "Scoring needs the TimeStamp feature to timestamp the curves, "
+            f"the model's features are {plan.getNames()}"
+        )
+    # Game features come first in every sample, in the order of the plan
+    timestamp_column = plan.gameKeys.index(FeatureKeys.TimeStamp)
+    match_timeline_filepaths = sorted(match_timeline_dir.glob("*.json"))
+    match_ids: List[str] = []
+    lengths: List[int] = []
+    timestamps: List[np.ndarray] = []
+    probabilities: List[np.ndarray] = []
+    batch: List[np.ndarray] = []
+    batchRows = 0
+
+    def flush():
+        X = np.vstack(batch)
+        timestamps.append(X[:, timestamp_column].astype(np.int32))
+        probabilities.append(model.predict_proba(X)[:, 1].astype(np.float32))
+        batch.clear()
+
+    with Pool(processes or os.cpu_count()) as pool:
+        for match_id, X in tqdm(
+            pool.imap(
+                partial(featurize_match, plan=plan),
+                match_timeline_filepaths,
+                chunksize=16,
+            ),
+            total=len(match_timeline_filepaths),
+        ):
+            if X is None:
+                continue
+            match_ids.append(match_id)
+            lengths.append(len(X))
+            batch.append(X)
+            batchRows += len(X)
+            if batchRows >= batch_size:
+                flush()
+                batchRows = 0
+    if batch:
+        flush()
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        output_path,
+        match_ids=np.array(match_ids),
+        # Curve of match i is rows offsets[i]:offsets[i + 1]
+        offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        timestamps=np.concatenate(timestamps) if timestamps else np.empty(0, np.int32),
+        win_probabilities=(
+            np.concatenate(probabilities) if probabilities else np.empty(0, np.float32)
+        ),
+    )
+    return len(match_ids)
+
+
+def load_scores(scores_path: Path):
+    """Load the curves written by score_matches
+
+    :param scores_path: Path to the .npz file
+    :return: Dict mapping each match ID to a tuple (timestamps, win probabilities)
+    """
+    with np.load(scores_path) as scores:
+        offsets = scores["offsets"]
+        timestamps = scores["timestamps"]
+        win_probabilities = scores["win_probabilities"]
+        match_ids = scores["match_ids"]
+    return {
+        match_id: (
+            timestamps[offsets[i] : offsets[i + 1]],
+            win_probabilities[offsets[i] : offsets[i + 1]],
+        )
+        for i, match_id in enumerate(match_ids)
+    }
+
+
+def main():
+    model = load_model_artifact()
+    num_matches = score_matches(
+        MATCH_TIMELINE_DIR, model, SCORES_FILEPATH, plan=model.plan
+    )
+    print(f"Scored {num_matches} matches into {SCORES_FILEPATH}")
+
+
+if __name__ == "__main__":
+    main()
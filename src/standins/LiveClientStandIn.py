@@ -0,0 +1,139 @@
+import json
+import re
+from abc import ABC, abstractmethod
+import threading
+import time
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+LIVE_CLIENT_ENDPOINTS = ("activeplayername", "playerlist", "eventdata", "gamestats")
+
+
+class LiveClientSource(ABC):
+    """A source of Live Client Data API payloads for a single game.
+
+    Implementations provide the times (in seconds since the start of the source) at which
+    the payloads change and the payloads themselves at a given time.
+    """
+
+    activePlayerName: str
+    times: List[float]
+
+    @abstractmethod
+    def getSnapshot(self, index: int) -> Dict[str, Any]:
+        """Payloads by endpoint name ('playerlist', 'eventdata', 'gamestats') of the index-th time"""
+
+    def getSnapshotAt(self, elapsed: float) -> Optional[Dict[str, Any]]:
+        """Latest payloads at the given time, None once the source is exhausted"""
+        if elapsed > self.times[-1]:
+            return None
+        return self.getSnapshot(max(bisect_right(self.times, elapsed) - 1, 0))
+
+
+class GameClock:
+    """Decides which snapshot of a source is served.
+
+    With a positive speed, the source is played back in real time (scaled by speed).
+    With speed 0, the source is played back as fast as possible: every 'gamestats' request
+    advances the game to the next snapshot.
+    """
+
+    _source: LiveClientSource
+    _speed: float
+    _start: Optional[float]
+    _index: int
+    _lock: threading.Lock
+
+    def __init__(self, source: LiveClientSource, speed=1.0) -> None:
+        self._source = source
+        self._speed = speed
+        self._start = None
+        self._index = -1
+        self._lock = threading.Lock()
+
+    def getSnapshot(self, endpoint: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._speed == 0:
+                if endpoint == "gamestats":
+                    self._index += 1
+                index = max(self._index, 0)
+                if index >= len(self._source.times):
+                    return None
+                return self._source.getSnapshot(index)
+            # The game starts with the first request
+            if self._start is None:
+                self._start = time.perf_counter()
+            elapsed = (time.perf_counter() - self._start) * self._speed
+        return self._source.getSnapshotAt(self._source.times[0] + elapsed)
+
+
+class LiveClientStandIn(ThreadingHTTPServer):
+    """A local stand-in for the Live Client Data API serving one or more games.
+
+    The first game is served under /liveclientdata/<endpoint> like the game client does,
+    every game i is also served under /game/<i>/liveclientdata/<endpoint> so many games
+    can be simulated concurrently on a single port.
+    """
+
+    daemon_threads = True
+    clocks: List[GameClock]
+
+    def __init__(
+        self,
+        sources: List[LiveClientSource],
+        host="127.0.0.1",
+        port=2999,
+        speed=1.0,
+    ) -> None:
+        self.clocks = [GameClock(source, speed) for source in sources]
+        self.sources = sources
+        super().__init__((host, port), _LiveClientRequestHandler)
+
+    def getBaseUrl(self, game=0) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/game/{game}"
+
+    def startInBackground(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+_PATH_PATTERN = re.compile(r"^(?:/game/(\d+))?/liveclientdata/(\w+)$")
+
+
+class _LiveClientRequestHandler(BaseHTTPRequestHandler):
+    server: LiveClientStandIn
+
+    def do_GET(self):
+        match = _PATH_PATTERN.match(self.path.split("?")[0])
+        if not match or match.group(2) not in LIVE_CLIENT_ENDPOINTS:
+            self.send_error(404)
+            return
+        game = int(match.group(1) or 0)
+        endpoint = match.group(2)
+        if game >= len(self.server.clocks):
+            self.send_error(404)
+            return
+
+        if endpoint == "activeplayername":
+            payload = self.server.sources[game].activePlayerName
+        else:
+            snapshot = self.server.clocks[game].getSnapshot(endpoint)
+            if snapshot is None:
+                # The game is over
+                self.send_error(404)
+                return
+            payload = snapshot[endpoint]
+
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Silence per-request logging, it dominates the cost of serving many games
+        pass
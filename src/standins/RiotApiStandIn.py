@@ -0,0 +1,382 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+from src.match_generator import PLATFORM_ID, generate_match
+
+# Riot's limits for development keys: 20 requests every second and 100 every 2 minutes
+DEFAULT_RATE_LIMITS = ((20, 1), (100, 120))
+ENTRIES_PER_PAGE = 205
+MATCHLIST_SIZE = 20
+
+
+class RiotApiSource:
+    """Matches served by RiotApiStandIn, and the summoners and matchlists leading to them.
+
+    Summoners of the league entries and matchlists are derived from hashes of their IDs, so the same
+    requests always get the same responses. Any PUUID has a matchlist, including the participants of
+    the served matches, so snowball crawls never run out of summoners.
+    """
+
+    matchIds: List[str]
+    _loadMatch: Callable[[str], Tuple[dict, dict]]
+    _numPages: int
+
+    def __init__(
+        self,
+        matchIds: Sequence[str],
+        loadMatch: Callable[[str], Tuple[dict, dict]],
+        numPages=50,
+    ) -> None:
+        self.matchIds = list(matchIds)
+        self._loadMatch = loadMatch
+        self._numPages = numPages
+        self._matchJson = lru_cache(maxsize=256)(self._matchJson)  # type: ignore
+
+    def getEntries(self, queue: str, tier: str, division: str, page: int) -> list:
+        if not 1 <= page <= self._numPages:
+            return []
+        return [
+            {
+                "leagueId": f"{tier}-{division}",
+                "queueType": queue,
+                "tier": tier,
+                "rank": division,
+                "summonerId": f"{tier}-{division}-{page}-{entry}",
+                "leaguePoints": (page * 7 + entry) % 100,
+                "wins": 20 + entry % 50,
+                "losses": 20 + page % 50,
+            }
+            for entry in range(ENTRIES_PER_PAGE)
+        ]
+
+    def getSummoner(self, summonerId: str) -> dict:
+        return {
+            "id": summonerId,
+            "puuid": f"puuid-{summonerId}".ljust(78, "0"),
+            "summonerLevel": 30 + zlib.crc32(summonerId.encode()) % 500,
+        }
+
+    def getMatchlist(self, puuid: str, start=0, count=MATCHLIST_SIZE) -> List[str]:
+        matchlist = random.Random(zlib.crc32(puuid.encode())).sample(
+            self.matchIds, min(MATCHLIST_SIZE, len(self.matchIds))
+        )
+        return matchlist[start : start + count]
+
+    def _matchJson(self, matchId: str) -> Tuple[bytes, bytes]:
+        match_info, match_timeline = self._loadMatch(matchId)
+        return (
+            json.dumps(match_info, separators=(",", ":")).encode("utf-8"),
+            json.dumps(match_timeline, separators=(",", ":")).encode("utf-8"),
+        )
+
+    def getMatchJson(self, matchId: str, timeline=False) -> Optional[bytes]:
+        """Match info (or timeline) JSON, None if the match isn't served"""
+        try:
+            return self._matchJson(matchId)[timeline]
+        except (KeyError, IOError):
+            return None
+
+
+def generated_source(num_matches: int, seed=0) -> RiotApiSource:
+    """Source serving num_matches matches simulated on request, the same ones match_generator.py writes"""
+
+    def load(match_id: str) -> Tuple[dict, dict]:
+        platform, _, game_id = match_id.partition("_")
+        index = int(game_id) - seed * 10**7 if game_id.isdigit() else -1
+        if platform != PLATFORM_ID or not 0 <= index < num_matches:
+            raise KeyError(match_id)
+        return generate_match(match_id, seed * 10**7 + index)
+
+    return RiotApiSource(
+        [f"{PLATFORM_ID}_{seed * 10**7 + index}" for index in range(num_matches)], load
+    )
+
+
+def stored_source(match_info_dir: Path, match_timeline_dir: Path) -> RiotApiSource:
+    """Source serving the matches stored by training_data_collector.py"""
+    match_ids = sorted(
+        path.stem[len("match_info_") :] for path in match_info_dir.glob("*.json")
+    )
+
+    def load(match_id: str) -> Tuple[dict, dict]:
+        match_info_filepath = match_info_dir / f"match_info_{match_id}.json"
+        match_timeline_filepath = match_timeline_dir / f"match_timeline_{match_id}.json"
+        if not match_info_filepath.exists():
+            raise KeyError(match_id)
+        return (
+            json.loads(match_info_filepath.read_bytes()),
+            json.loads(match_timeline_filepath.read_bytes()),
+        )
+
+    return RiotApiSource(match_ids, load)
+
+
+class RateLimit:
+    """Sliding windows of requests of a routing value, answering like Riot's application rate limits"""
+
+    _limits: Tuple[Tuple[int, float], ...]
+    _requests: Dict[str, Deque[float]]
+    _lock: threading.Lock
+
+    def __init__(self, limits=DEFAULT_RATE_LIMITS) -> None:
+        self._limits = tuple(limits)
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def getHeader(self) -> str:
+        return ",".join(f"{count}:{seconds:g}" for count, seconds in self._limits)
+
+    def acquire(self, key: str) -> Tuple[Optional[float], str]:
+        """Count a request, returning (seconds to retry after if it's over a limit, count header)"""
+        now = time.monotonic()
+        with self._lock:
+            requests = self._requests.setdefault(key, deque())
+            longest = max((seconds for _, seconds in self._limits), default=0)
+            while requests and requests[0] <= now - longest:
+                requests.popleft()
+            counts = [
+                sum(1 for sent in requests if sent > now - seconds)
+                for _, seconds in self._limits
+            ]
+            retryAfter = None
+            for (count, seconds), sent in zip(self._limits, counts):
+                if sent >= count:
+                    # The window frees up when its oldest request leaves it
+                    oldest = [t for t in requests if t > now - seconds][-count]
+                    wait = oldest + seconds - now
+                    retryAfter = max(retryAfter or 0, wait)
+            if retryAfter is None:
+                requests.append(now)
+                counts = [sent + 1 for sent in counts]
+        countHeader = ",".join(
+            f"{sent}:{seconds:g}" for sent, (_, seconds) in zip(counts, self._limits)
+        )
+        return retryAfter, countHeader
+
+
+class RiotApiStandIn(ThreadingHTTPServer):
+    """A local stand-in for the Riot API endpoints used by training_data_collector.py.
+
+    Point a LolWatcher at it with LolWatcher(kernel_url=standIn.getBaseUrl()), requests are then
+    served under /<platform or routing value>/lol/... Responses are delayed by latency seconds (plus
+    up to jitter seconds), requests over the rate limits of a routing value get a 429 with Retry-After,
+    and errorRate of the other requests fail with a 500 or 503. The random delays and errors are
+    drawn from seed, so runs with the same requests are reproducible.
+    """
+
+    daemon_threads = True
+    source: RiotApiSource
+    rateLimit: Optional[RateLimit]
+    latency: float
+    jitter: float
+    errorRate: float
+    requestCounts: Dict[int, int]
+    _random: random.Random
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        source: RiotApiSource,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        rate_limits: Optional[Sequence[Tuple[int, float]]] = DEFAULT_RATE_LIMITS,
+        error_rate=0.0,
+        seed=0,
+    ) -> None:
+        self.source = source
+        self.rateLimit = RateLimit(rate_limits) if rate_limits else None
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = error_rate
+        self.requestCounts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        super().__init__((host, port), _RiotApiRequestHandler)
+
+    def getBaseUrl(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{{platform}}"
+
+    def startInBackground(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def drawConditions(self) -> Tuple[float, Optional[int]]:
+        """Delay of a response and the error status to answer with, if any"""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            error = None
+            if self._random.random() < self.errorRate:
+                error = self._random.choice((500, 503))
+        return delay, error
+
+    def countResponse(self, status: int) -> None:
+        with self._lock:
+            self.requestCounts[status] = self.requestCounts.get(status, 0) + 1
+
+
+_ROUTES = (
+    ("entries", re.compile(r"^/lol/league/v4/entries/(\w+)/(\w+)/(\w+)$")),
+    ("summoner", re.compile(r"^/lol/summoner/v4/summoners/([^/]+)$")),
+    ("matchlist", re.compile(r"^/lol/match/v5/matches/by-puuid/([^/]+)/ids$")),
+    ("timeline", re.compile(r"^/lol/match/v5/matches/([^/]+)/timeline$")),
+    ("match", re.compile(r"^/lol/match/v5/matches/([^/]+)$")),
+)
+
+
+class _RiotApiRequestHandler(BaseHTTPRequestHandler):
+    server: RiotApiStandIn
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, headers: Dict[str, str]) -> None:
+        self.server.countResponse(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendError(self, status: int, message: str, headers: Dict[str, str]) -> None:
+        body = json.dumps({"status": {"message": message, "status_code": status}})
+        self._send(status, body.encode("utf-8"), headers)
+
+    def _route(self, path: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        source = self.server.source
+        for name, pattern in _ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if name == "entries":
+                page = int(query.get("page", ["1"])[0])
+                payload: object = source.getEntries(*match.groups(), page)
+            elif name == "summoner":
+                payload = source.getSummoner(match.group(1))
+            elif name == "matchlist":
+                payload = source.getMatchlist(
+                    match.group(1),
+                    int(query.get("start", ["0"])[0]),
+                    int(query.get("count", [str(MATCHLIST_SIZE)])[0]),
+                )
+            else:
+                return source.getMatchJson(match.group(1), name == "timeline")
+            return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        routing, _, path = url.path.lstrip("/").partition("/")
+        path = "/" + path
+        headers: Dict[str, str] = {}
+        delay, error = self.server.drawConditions()
+        if delay > 0:
+            time.sleep(delay)
+
+        rateLimit = self.server.rateLimit
+        if rateLimit is not None:
+            retryAfter, countHeader = rateLimit.acquire(routing)
+            headers["X-App-Rate-Limit"] = rateLimit.getHeader()
+            headers["X-App-Rate-Limit-Count"] = countHeader
+            if retryAfter is not None:
+                headers["Retry-After"] = str(max(int(retryAfter + 0.999), 1))
+                headers["X-Rate-Limit-Type"] = "application"
+                self._sendError(429, "Rate limit exceeded", headers)
+                return
+        if error is not None:
+            self._sendError(error, "Internal server error", headers)
+            return
+
+        body = self._route(path, parse_qs(url.query))
+        if body is None:
+            self._sendError(404, "Data not found", headers)
+            return
+        self._send(200, body, headers)
+
+    def log_message(self, format, *args):
+        # Silence per-request logging, it dominates the cost of serving fast crawls
+        pass
+
+
+def parse_rate_limits(rate_limits: str) -> List[Tuple[int, float]]:
+    """Rate limits written like Riot's X-App-Rate-Limit header, e.g. 20:1,100:120"""
+    limits = []
+    for limit in rate_limits.split(","):
+        count, seconds = limit.split(":")
+        limits.append((int(count), float(seconds)))
+    return limits
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Serve the Riot API endpoints used by the collector from synthetic or stored matches"
+    )
+    arg_parser.add_argument("--port", type=int, default=8090)
+    arg_parser.add_argument(
+        "--matches", type=int, default=10000, help="Number of synthetic matches"
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=None,
+        help="Serve the stored matches of this directory (e.g. matches) instead of synthetic ones",
+    )
+    arg_parser.add_argument(
+        "--latency", type=float, default=0.05, help="Response delay in seconds"
+    )
+    arg_parser.add_argument(
+        "--jitter", type=float, default=0.05, help="Random extra delay in seconds"
+    )
+    arg_parser.add_argument(
+        "--rate-limits",
+        default="20:1,100:120",
+        help="Application rate limits per routing value, 'none' to disable",
+    )
+    arg_parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of the requests failing with a 500 or 503",
+    )
+    args = arg_parser.parse_args()
+
+    if args.fixtures:
+        source = stored_source(
+            args.fixtures / "match_info", args.fixtures / "match_timeline"
+        )
+    else:
+        source = generated_source(args.matches, args.seed)
+    server = RiotApiStandIn(
+        source,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limits=(
+            None if args.rate_limits == "none" else parse_rate_limits(args.rate_limits)
+        ),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(
+        f"Serving {len(source.matchIds)} matches, "
+        f"use LolWatcher(kernel_url='{server.getBaseUrl()}')"
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from queue import Empty, Queue
+from typing import List, Optional, Tuple
+import numpy as np
+from src.item_table import load_item_costs
+from src.live_simulator import MATCH_TIMELINE_DIR, load_feed
+from src.standins.LiveClientStandIn import LiveClientStandIn
+
+
+def time_to_first_prediction(base_url: str, full_model=False, timeout=60.0) -> float:
+    """Start live_game_processor against a running stand-in and time its first prediction
+
+    :param base_url: URL of the stand-in game
+    :param full_model: Whether to predict with the XGBoost booster instead of the lean model
+    :param timeout: Seconds to wait for the first prediction
+    :return: Seconds from process start to the first prediction on its stdout
+    """
+    command = [sys.executable, "-m", "src.live_game_processor"]
+    if full_model:
+        command.append("--full-model")
+    env = {**os.environ, "LIVE_CLIENT_URL": base_url, "PYTHONUNBUFFERED": "1"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    # Lines are read by a thread, so a process hanging without printing can't block past the timeout
+    lines: "Queue[Optional[Tuple[float, str]]]" = Queue()
+
+    def read_lines():
+        for line in process.stdout:  # type: ignore
+            lines.put((time.perf_counter(), line))
+        lines.put(None)
+
+    threading.Thread(target=read_lines, daemon=True).start()
+    try:
+        while True:
+            try:
+                timed_line = lines.get(
+                    timeout=max(0.0, start + timeout - time.perf_counter())
+                )
+            except Empty:
+                raise TimeoutError(
+                    f"live_game_processor made no prediction within {timeout} seconds"
+                ) from None
+            if timed_line is None:
+                raise RuntimeError(
+                    "live_game_processor exited before its first prediction"
+                )
+            read_time, line = timed_line
+            try:
+                float(line)
+            except ValueError:
+                continue
+            return read_time - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def benchmark_startup(match_timeline_filepath: Path, runs=5, full_model=False):
+    """Time to first prediction of live_game_processor, over fresh processes each joining a new game
+
+    :return: Dict with the mean, min and max time to first prediction in seconds
+    """
+    itemCosts = load_item_costs()
+    feeds = [load_feed(match_timeline_filepath, itemCosts) for _ in range(runs)]
+    # Speed 0 keeps every game on its first snapshot until it's polled
+    server = LiveClientStandIn(feeds, port=0, speed=0.0)
+    server.startInBackground()
+    timings: List[float] = []
+    try:
+        for run in range(runs):
+            timings.append(time_to_first_prediction(server.getBaseUrl(run), full_model))
+    finally:
+        server.shutdown()
+    return {
+        "model": "full" if full_model else "lean",
+        "runs": runs,
+        "mean_seconds": round(float(np.mean(timings)), 3),
+        "min_seconds": round(min(timings), 3),
+        "max_seconds": round(max(timings), 3),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Measure the time to first prediction of live_game_processor"
+    )
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also measure startup with the full XGBoost model",
+    )
+    args = arg_parser.parse_args()
+
+    match_timeline_filepath = next(MATCH_TIMELINE_DIR.glob("*.json"))
+    print(benchmark_startup(match_timeline_filepath, args.runs))
+    if args.compare:
+        print(benchmark_startup(match_timeline_filepath, args.runs, full_model=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,305 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
 import xgboost as xgb
 import matplotlib.pyplot as plt
-from src.training_data_processor import DATASET_FILEPATH, DATASET_LABELS_FILEPATH
-from src.utils import load_dataset, save_model, split_train_validation
-
-X, y = load_dataset(DATASET_FILEPATH, DATASET_LABELS_FILEPATH)
-model: xgb.XGBClassifier = xgb.XGBClassifier(
-    objective="binary:logistic", random_state=42, early_stopping_rounds=10
+from src.training_data_processor import (
+    DATASET_FILEPATH,
+    DATASET_GROUPS_FILEPATH,
+    DATASET_LABELS_FILEPATH,
+    DATASET_FEATURES_FILEPATH,
+    DATASET_SHARDS_DIR,
+    SHARDS_FEATURES_FILEPATH,
+    load_feature_keys,
+)
+from src.utils import (
+    get_shard_groups_path,
+    group_kfold_indices,
+    group_train_validation_indices,
+    is_validation_group,
+    list_dataset_shards,
+    load_dataset,
+    load_dataset_shard,
 )
-X = X.squeeze()
-X, X_val, y, y_val = split_train_validation(X, y, validation_size=0.1)
-print(X.shape, y.shape)
-model.fit(X, y, eval_set=[(X_val, y_val)], verbose=True)
-
-print(model.score(X, y))
-print(model.score(X_val, y_val))
-p = xgb.plot_importance(model, importance_type="weight")
-# Save the plot to a file
-plt.savefig("feature_importance.png")
-
-# These are some sanity checks, uncomment to run them
-
-# Start state: should be 50/50
-# print(model.predict_proba([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]))
-save_model(model, "./models/xgboost")
+from src.model_artifact import MODEL_PATH, save_model_artifact
+
+EXTERNAL_MEMORY_CACHE_DIR = Path.cwd() / "matches" / "dataset" / "xgb_cache"
+PARAMS = {
+    "objective": "binary:logistic",
+    "tree_method": "hist",
+    "seed": 42,
+    # Early stopping watches the last metric, logloss like the baseline XGBClassifier
+    "eval_metric": ["error", "logloss"],
+}
+
+
+class ShardIterator(xgb.DataIter):
+    """Feeds XGBoost one memory-mapped shard at a time.
+
+    Each batch is a (features path, labels path, row indices) tuple, so the train and
+    validation sets can be different rows of the same shards without copying whole shards.
+    """
+
+    _batches: List[Tuple[Path, Path, np.ndarray]]
+    _index: int
+
+    def __init__(self, batches: List[Tuple[Path, Path, np.ndarray]], cache_prefix=None):
+        self._batches = batches
+        self._index = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> int:
+        if self._index == len(self._batches):
+            return 0
+        features_path, labels_path, rows = self._batches[self._index]
+        X, y = load_dataset_shard(features_path, labels_path)
+        input_data(data=X[rows], label=y[rows])
+        self._index += 1
+        return 1
+
+    def reset(self) -> None:
+        self._index = 0
+
+
+class IndexBatchIterator(xgb.DataIter):
+    """Feeds XGBoost the given rows of an in-memory dataset in bounded batches.
+
+    Only one batch of rows is ever copied, so splits and folds cost no copy of the dataset.
+    """
+
+    _X: np.ndarray
+    _y: np.ndarray
+    _indices: np.ndarray
+    _batchSize: int
+    _start: int
+
+    def __init__(self, X, y, indices, batch_size=1 << 18):
+        self._X = X
+        self._y = y
+        self._indices = indices
+        self._batchSize = batch_size
+        self._start = 0
+        super().__init__()
+
+    def next(self, input_data) -> int:
+        if self._start >= len(self._indices):
+            return 0
+        rows = self._indices[self._start : self._start + self._batchSize]
+        input_data(data=self._X[rows], label=self._y[rows])
+        self._start += self._batchSize
+        return 1
+
+    def reset(self) -> None:
+        self._start = 0
+
+
+def split_shards(shards, validation_size: float = 0.1):
+    """Split the rows of every shard by match so no match is in both the train and validation sets"""
+    train_batches = []
+    validation_batches = []
+    for features_path, labels_path in shards:
+        groups_path = get_shard_groups_path(features_path)
+        if not groups_path.exists():
+            raise ValueError(
+                f"{groups_path} is missing, regenerate the shards to split them by match"
+            )
+        is_validation_row = is_validation_group(
+            np.load(groups_path, mmap_mode="r"), validation_size
+        )
+        train_batches.append(
+            (features_path, labels_path, np.flatnonzero(~is_validation_row))
+        )
+        validation_batches.append(
+            (features_path, labels_path, np.flatnonzero(is_validation_row))
+        )
+    return train_batches, validation_batches
+
+
+def train_booster(dtrain, dval, nthread=None, num_boost_round=100, verbose=True):
+    evals_result = {}
+    booster = xgb.train(
+        {**PARAMS, "nthread": nthread or os.cpu_count()},
+        dtrain,
+        num_boost_round=num_boost_round,
+        evals=[(dtrain, "train"), (dval, "validation")],
+        early_stopping_rounds=10,
+        evals_result=evals_result,
+        verbose_eval=verbose,
+    )
+    return booster, evals_result
+
+
+def to_classifier(booster: xgb.Booster) -> xgb.XGBClassifier:
+    # Wrap the booster so the model keeps the XGBClassifier interface used everywhere else
+    model = xgb.XGBClassifier()
+    model.load_model(booster.save_raw(raw_format="ubj"))
+    return model
+
+
+def load_in_memory_dataset():
+    X, y = load_dataset(DATASET_FILEPATH, DATASET_LABELS_FILEPATH)
+    X = X.reshape(len(X), -1)
+    if DATASET_GROUPS_FILEPATH.exists():
+        groups = np.load(DATASET_GROUPS_FILEPATH)
+    else:
+        print(
+            f"{DATASET_GROUPS_FILEPATH} is missing, every frame is its own group and "
+            "frames of a match will leak between train and validation"
+        )
+        groups = np.arange(len(y))
+    return X, y, groups
+
+
+def train_in_memory(nthread=None):
+    X, y, groups = load_in_memory_dataset()
+    train_indices, val_indices = group_train_validation_indices(
+        groups, validation_size=0.1
+    )
+    print(
+        X.shape, y.shape, f"{len(train_indices)} train / {len(val_indices)} validation"
+    )
+    dtrain = xgb.QuantileDMatrix(
+        IndexBatchIterator(X, y, train_indices), nthread=nthread
+    )
+    dval = xgb.QuantileDMatrix(
+        IndexBatchIterator(X, y, val_indices), ref=dtrain, nthread=nthread
+    )
+    booster, evals_result = train_booster(dtrain, dval, nthread)
+
+    best = booster.best_iteration
+    print(1 - evals_result["train"]["error"][best])
+    print(1 - evals_result["validation"]["error"][best])
+    return to_classifier(booster)
+
+
+def cross_validate(n_splits=5, nthread=None):
+    """Train one model per match-grouped fold, with the folds trained in parallel
+
+    :param n_splits: Number of folds
+    :param nthread: Total number of threads, shared evenly between the folds
+    :return: List of (validation logloss, validation accuracy) of each fold
+    """
+    X, y, groups = load_in_memory_dataset()
+    folds = group_kfold_indices(groups, n_splits, seed=42)
+    # XGBoost releases the GIL, so threads train folds in parallel on the same arrays
+    fold_nthread = max(1, (nthread or os.cpu_count() or 1) // n_splits)
+
+    def train_fold(fold):
+        train_indices, val_indices = fold
+        dtrain = xgb.QuantileDMatrix(
+            IndexBatchIterator(X, y, train_indices), nthread=fold_nthread
+        )
+        dval = xgb.QuantileDMatrix(
+            IndexBatchIterator(X, y, val_indices), ref=dtrain, nthread=fold_nthread
+        )
+        booster, evals_result = train_booster(dtrain, dval, fold_nthread, verbose=False)
+        best = booster.best_iteration
+        return (
+            evals_result["validation"]["logloss"][best],
+            1 - evals_result["validation"]["error"][best],
+        )
+
+    with ThreadPoolExecutor(max_workers=n_splits) as executor:
+        results = list(executor.map(train_fold, folds))
+    for fold, (logloss, accuracy) in enumerate(results):
+        print(f"Fold {fold}: logloss {logloss:.4f}, accuracy {accuracy:.4f}")
+    print(
+        f"Mean: logloss {np.mean([r[0] for r in results]):.4f}, "
+        f"accuracy {np.mean([r[1] for r in results]):.4f}"
+    )
+    return results
+
+
+def train_out_of_core(
+    shards_dir: Path, nthread=None, external_memory=False, num_boost_round=100
+):
+    """Train on a sharded dataset without loading it in memory
+
+    By default the shards are streamed once into a QuantileDMatrix, which only keeps the
+    quantized (1 byte per feature) data in memory. With external_memory the quantized pages
+    are cached on disk as well, for datasets that don't fit in memory even when quantized.
+
+    :param shards_dir: Path to the directory containing the dataset shards
+    :param nthread: Number of threads used to build the matrices and train, defaults to all cores
+    :param external_memory: Whether to use XGBoost external memory
+    :param num_boost_round: Maximum number of boosting rounds
+    :return: Trained model
+    """
+    shards = list_dataset_shards(shards_dir)
+    if not shards:
+        raise ValueError(f"No dataset shards in {shards_dir}")
+    nthread = nthread or os.cpu_count()
+    train_batches, validation_batches = split_shards(shards, validation_size=0.1)
+
+    if external_memory:
+        EXTERNAL_MEMORY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        dtrain = xgb.DMatrix(
+            ShardIterator(train_batches, str(EXTERNAL_MEMORY_CACHE_DIR / "train")),
+            nthread=nthread,
+        )
+        dval = xgb.DMatrix(
+            ShardIterator(
+                validation_batches, str(EXTERNAL_MEMORY_CACHE_DIR / "validation")
+            ),
+            nthread=nthread,
+        )
+    else:
+        dtrain = xgb.QuantileDMatrix(ShardIterator(train_batches), nthread=nthread)
+        dval = xgb.QuantileDMatrix(
+            ShardIterator(validation_batches), ref=dtrain, nthread=nthread
+        )
+    print(dtrain.num_row(), dtrain.num_col())
+
+    booster, _ = train_booster(dtrain, dval, nthread, num_boost_round)
+    return to_classifier(booster)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Train the win prediction model")
+    arg_parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help=f"Train from the dataset shards in {DATASET_SHARDS_DIR} (see training_data_processor.py --shards)",
+    )
+    arg_parser.add_argument(
+        "--external-memory",
+        action="store_true",
+        help="Cache the quantized training data on disk (implies --out-of-core)",
+    )
+    arg_parser.add_argument(
+        "--folds",
+        type=int,
+        default=0,
+        help="Only evaluate with k-fold cross validation grouped by match",
+    )
+    arg_parser.add_argument("--nthread", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    if args.folds:
+        cross_validate(args.folds, args.nthread)
+        return
+    if args.out_of_core or args.external_memory:
+        model = train_out_of_core(
+            DATASET_SHARDS_DIR, args.nthread, external_memory=args.external_memory
+        )
+        plan = load_feature_keys(SHARDS_FEATURES_FILEPATH)
+    else:
+        model = train_in_memory(args.nthread)
+        plan = load_feature_keys(DATASET_FEATURES_FILEPATH)
+
+    p = xgb.plot_importance(model, importance_type="weight")
+    # Save the plot to a file
+    plt.savefig("feature_importance.png")
+
+    # These are some sanity checks, uncomment to run them
+
+    # Start state: should be 50/50
+    # print(model.predict_proba([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]))
+    save_model_artifact(model, MODEL_PATH, plan=plan)
+
+
+if __name__ == "__main__":
+    main()
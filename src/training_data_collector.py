@@ -1,10 +1,136 @@
 from riotwatcher import LolWatcher, ApiError
-from random import choice, randint
+from riotwatcher.Handlers.RateLimit import BasicRateLimiter
+from abc import ABC, abstractmethod
+from random import choice, randint, sample
+from collections import deque
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+import argparse
+import gzip
 import json
 import os
+from queue import Queue
+import threading
+import time
 from dotenv import load_dotenv
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
 from tqdm import tqdm
+import numpy as np
+from src.match_index import (
+    MATCH_INDEX_PATH,
+    MATCH_INFO_PREFIX,
+    MATCH_TIMELINE_PREFIX,
+    MatchIndex,
+    get_label,
+)
+from src.features.features import DEFAULT_PLAN, ExtractionPlan
+from src.training_data_processor import (
+    DATASET_SHARDS_DIR,
+    SHARDS_FEATURES_FILEPATH,
+    generate_time_series_features,
+    load_feature_keys,
+    load_shards_match_ids,
+    record_shards_match_ids,
+    save_feature_keys,
+)
+from src.utils import DatasetShardWriter, list_dataset_shards, match_group_id
+from src.profiling import PROFILER, setup_from_env
+
+# Raw matches saved by the streaming mode (--stream --archive), one gzipped JSON per match
+MATCH_ARCHIVE_DIR = Path.cwd() / "matches" / "archive"
+# Retries of an API request answered 429 or 5xx before giving up
+MAX_API_RETRIES = 3
+
+
+def create_lol_watcher(api_key, api_url: Optional[str] = None) -> LolWatcher:
+    """LolWatcher with its own rate limiter, or sending its requests to api_url (e.g. a RiotApiStandIn)
+
+    :param api_key: Riot API key
+    :param api_url: Base URL of a server standing in for the API, with a {platform} placeholder
+    """
+    if api_url:
+        return LolWatcher(kernel_url=api_url)
+    return LolWatcher(api_key, rate_limiter=BasicRateLimiter())
+
+
+def call_api(stage: str, request: Callable, **kwargs):
+    """Send an API request timed as stage, retrying it when it's answered 429 (rate limited) or 5xx
+
+    Retries wait the response's Retry-After, or 1, 2, 4... seconds without it.
+    """
+    for attempt in range(MAX_API_RETRIES + 1):
+        try:
+            with PROFILER.stage(stage):
+                return request(**kwargs)
+        except ApiError as err:
+            status_code = err.response.status_code
+            if attempt == MAX_API_RETRIES or (status_code != 429 and status_code < 500):
+                raise
+            PROFILER.count(f"api_retries.{status_code}")
+            time.sleep(float(err.response.headers.get("Retry-After", 2**attempt)))
+    raise AssertionError("unreachable, the last attempt returns or raises")
+
+
+def fetch_random_summoner(
+    lol_watcher: LolWatcher, region, queue, rank, division, page, exclude=()
+):
+    """Fetch a random summoner of a page of a rank and division
+
+    :param lol_watcher: LolWatcher instance
+    :param region: String indicating match region
+    :param queue: String indicating match queue type
+    :param rank: String indicating match rank
+    :param division: String indicating the division of the match rank
+    :param page: Integer indicating the page number to fetch the summoner from
+    :param exclude: Summoner IDs not to choose, e.g. the summoners already harvested
+    :return: Tuple (summoner ID, PUUID), None if the page has no (other) summoners
+    """
+    rank_summoners = call_api(
+        "api.league.entries",
+        lol_watcher.league.entries,
+        region=region,
+        queue=queue,
+        tier=rank,
+        division=division,
+        page=page,
+    )
+    candidates = [
+        summoner
+        for summoner in rank_summoners or []  # type: ignore
+        if summoner["summonerId"] not in exclude
+    ]
+    if not candidates:
+        return None
+    summoner_id = choice(candidates)["summonerId"]
+
+    summoner_info = call_api(
+        "api.summoner.by_id",
+        lol_watcher.summoner.by_id,
+        region=region,
+        encrypted_summoner_id=summoner_id,
+    )
+    return summoner_id, summoner_info["puuid"]  # type: ignore
+
+
+def fetch_matchlist(lol_watcher: LolWatcher, region, puuid) -> List[str]:
+    """Fetch the IDs of the latest ranked solo matches of a summoner (up to 20)
+
+    :param lol_watcher: LolWatcher instance
+    :param region: String indicating match region
+    :param puuid: String indicating the summoner PUUID
+    :return: Match IDs, most recent first
+    """
+    matchlist = call_api(
+        "api.match.matchlist_by_puuid",
+        lol_watcher.match.matchlist_by_puuid,
+        region=region,
+        puuid=puuid,
+        queue=420,
+    )
+    PROFILER.count("matchlists")
+    return matchlist or []  # type: ignore
 
 
 def fetch_random_match_id(lol_watcher: LolWatcher, region, queue, rank, division, page):
@@ -18,23 +144,241 @@ def fetch_random_match_id(lol_watcher: LolWatcher, region, queue, rank, division
     :param page: Integer indicating the page number to fetch the match from
     :return: Random match ID
     """
-    rank_summoners = lol_watcher.league.entries(
-        region=region, queue=queue, tier=rank, division=division, page=page
-    )
-    if not rank_summoners:
+    summoner = fetch_random_summoner(lol_watcher, region, queue, rank, division, page)
+    if summoner is None:
         return None
-    summoner = choice(rank_summoners)  # type: ignore
-    summoner_id = summoner["summonerId"]
+    _, puuid = summoner
+    matchlist = fetch_matchlist(lol_watcher, region, puuid)
+    return choice(matchlist) if matchlist else None
 
-    summoner_info = lol_watcher.summoner.by_id(
-        region=region, encrypted_summoner_id=summoner_id
-    )
-    summoner_puuid = summoner_info["puuid"]  # type: ignore
 
-    summoner_matches = lol_watcher.match.matchlist_by_puuid(
-        region=region, puuid=summoner_puuid, queue=420
-    )
-    return choice(summoner_matches)  # type: ignore
+class MatchLedger:
+    """Match IDs already stored or queued for download, shared by the collecting threads"""
+
+    _matchIds: Set[str]
+    _lock: threading.Lock
+
+    def __init__(self, matchIds: Iterable[str] = ()) -> None:
+        self._matchIds = set(matchIds)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._matchIds)
+
+    def __contains__(self, matchId: str) -> bool:
+        return matchId in self._matchIds
+
+    def claim(self, matchIds: Iterable[str]) -> List[str]:
+        """Add match IDs to the ledger, returning the ones that weren't in it yet"""
+        with self._lock:
+            claimed = [matchId for matchId in matchIds if matchId not in self._matchIds]
+            self._matchIds.update(claimed)
+        return claimed
+
+
+class MatchStore(ABC):
+    """Stores the downloaded matches from a background thread, so the collecting threads don't wait on
+    the disk. Subclasses implement _store, and _open and _close for resources that must be used from
+    the storing thread (e.g. an SQLite connection).
+    """
+
+    _queue: "Queue[Optional[tuple]]"
+    _thread: threading.Thread
+    _error: Optional[BaseException]
+
+    def _start(self, max_pending=64) -> None:
+        self._queue = Queue(max_pending)
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _open(self) -> None:
+        pass
+
+    @abstractmethod
+    def _store(self, match_info, match_timeline, rank, division) -> None:
+        pass
+
+    def _close(self) -> None:
+        pass
+
+    def _run(self) -> None:
+        self._open()
+        try:
+            while True:
+                match = self._queue.get()
+                if match is None:
+                    return
+                if self._error is None:
+                    try:
+                        self._store(*match)
+                    except Exception as err:
+                        # Reported to the collecting threads, the queue is still drained
+                        self._error = err
+        finally:
+            self._close()
+
+    def put(self, match_info, match_timeline, rank=None, division=None) -> None:
+        """Queue a match to store, blocking while max_pending matches are queued"""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((match_info, match_timeline, rank, division))
+
+    def close(self) -> None:
+        """Store the queued matches and stop the storing thread"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class MatchWriter(MatchStore):
+    """Saves the downloaded matches with store_match from a background thread, the match index (an SQLite
+    connection only usable from the thread that opened it) is then only written from one thread.
+    """
+
+    _matchInfoDir: Path
+    _matchTimelineDir: Path
+    _indexPath: Optional[Path]
+    _matchIndex: Optional[MatchIndex]
+
+    def __init__(
+        self,
+        match_info_dir: Path,
+        match_timeline_dir: Path,
+        index_path: Optional[Path] = MATCH_INDEX_PATH,
+        max_pending=64,
+    ) -> None:
+        self._matchInfoDir = match_info_dir
+        self._matchTimelineDir = match_timeline_dir
+        self._indexPath = index_path
+        self._matchIndex = None
+        self._start(max_pending)
+
+    def _open(self) -> None:
+        if self._indexPath is not None:
+            self._matchIndex = MatchIndex(self._indexPath)
+
+    def _store(self, match_info, match_timeline, rank, division) -> None:
+        store_match(
+            match_info,
+            match_timeline,
+            self._matchInfoDir,
+            self._matchTimelineDir,
+            self._matchIndex,
+            rank,
+            division,
+        )
+
+    def _close(self) -> None:
+        if self._matchIndex is not None:
+            self._matchIndex.close()
+
+
+class MatchFeaturizer(MatchStore):
+    """Featurizes the downloaded matches as they arrive and appends their samples to dataset shards, instead
+    of saving them as JSON for training_data_processor.py to read back. The raw matches can still be archived
+    as compressed JSON.
+
+    IDs of the matches whose samples are in a written shard are appended to match_ids.txt in the shards
+    directory, so later runs skip them. Samples of the last shard are only written by close().
+    """
+
+    _shards: DatasetShardWriter
+    _shardsDir: Path
+    _plan: ExtractionPlan
+    _archiveDir: Optional[Path]
+    _pendingIds: List[str]
+
+    def __init__(
+        self,
+        shards_dir: Path,
+        plan: ExtractionPlan = DEFAULT_PLAN,
+        archive_dir: Optional[Path] = None,
+        shard_size=1000000,
+        max_pending=64,
+    ) -> None:
+        self._shardsDir = shards_dir
+        self._shards = DatasetShardWriter(shards_dir, shard_size)
+        self._plan = plan
+        self._archiveDir = archive_dir
+        if archive_dir is not None:
+            archive_dir.mkdir(parents=True, exist_ok=True)
+        self._pendingIds = []
+        self._start(max_pending)
+
+    def _recordMatchIds(self) -> None:
+        record_shards_match_ids(self._shardsDir, self._pendingIds)
+        self._pendingIds = []
+
+    def _store(self, match_info, match_timeline, rank, division) -> None:
+        match_id = match_info["metadata"]["matchId"]
+        if self._archiveDir is not None:
+            with PROFILER.stage("archive"):
+                with gzip.open(
+                    self._archiveDir / (match_id + ".json.gz"),
+                    mode="wt",
+                    encoding="utf-8",
+                ) as archive_f:
+                    json.dump(
+                        {"match_info": match_info, "match_timeline": match_timeline},
+                        archive_f,
+                        ensure_ascii=False,
+                    )
+        time_series = generate_time_series_features(match_timeline, self._plan)
+        PROFILER.count("matches")
+        if not time_series:
+            return
+        numShards = self._shards.numShards
+        self._shards.append(
+            np.vstack(time_series),
+            np.full(len(time_series), get_label(match_info)),
+            np.full(len(time_series), match_group_id(match_id)),
+        )
+        self._pendingIds.append(match_id)
+        if self._shards.numShards != numShards:
+            self._recordMatchIds()
+
+    def _close(self) -> None:
+        if self._error is None:
+            self._shards.close()
+            self._recordMatchIds()
+
+
+def harvest_match_ids(matchlist: List[str], seen: MatchLedger, max_per_player=None):
+    """Pick the matches of a matchlist to download, at most max_per_player random ones not seen yet
+
+    The picked matches are claimed in seen, so a match shared by several matchlists (or regions'
+    crawls) is only downloaded once.
+
+    :param matchlist: Match IDs of a summoner
+    :param seen: Match IDs already stored or queued
+    :param max_per_player: Maximum number of matches to take from one summoner, None for all
+    :return: Match IDs to download
+    """
+    eligible = [
+        match_id for match_id in dict.fromkeys(matchlist) if match_id not in seen
+    ]
+    if max_per_player is not None and len(eligible) > max_per_player:
+        eligible = sample(eligible, max_per_player)
+    return seen.claim(eligible)
+
+
+def stored_match_ids(match_info_dir: Path) -> Set[str]:
+    """IDs of the matches whose match info is stored in match_info_dir"""
+    return {
+        match_info_filepath.stem[len(MATCH_INFO_PREFIX) :]
+        for match_info_filepath in match_info_dir.glob(MATCH_INFO_PREFIX + "*.json")
+    }
 
 
 def fetch_match_info(lol_watcher: LolWatcher, region, match_id):
@@ -45,7 +389,9 @@ def fetch_match_info(lol_watcher: LolWatcher, region, match_id):
     :param match_id: String indicating match ID
     :return:
     """
-    return lol_watcher.match.by_id(region=region, match_id=match_id)
+    return call_api(
+        "api.match.by_id", lol_watcher.match.by_id, region=region, match_id=match_id
+    )
 
 
 def fetch_match_timeline(lol_watcher: LolWatcher, region, match_id):
@@ -56,7 +402,62 @@ def fetch_match_timeline(lol_watcher: LolWatcher, region, match_id):
     :param match_id: String indicating match ID
     :return:
     """
-    return lol_watcher.match.timeline_by_match(region=region, match_id=match_id)
+    return call_api(
+        "api.match.timeline_by_match",
+        lol_watcher.match.timeline_by_match,
+        region=region,
+        match_id=match_id,
+    )
+
+
+def store_match(
+    match_info,
+    match_timeline,
+    match_info_dir: Path,
+    match_timeline_dir: Path,
+    match_index: Optional[MatchIndex] = None,
+    rank=None,
+    division=None,
+):
+    """Save a match info to 'match_info_[ID].json' and its timeline to 'match_timeline_[ID].json'
+
+    :param match_info: Match info returned by the API
+    :param match_timeline: Match timeline returned by the API
+    :param match_info_dir: Path to the directory to save the match info JSON files to
+    :param match_timeline_dir: Path to the directory to save the match timeline JSON files to
+    :param match_index: Index to add the match to, with the rank and division it was sampled from
+    :param rank: Rank the match was sampled from
+    :param division: Division the match was sampled from
+    :return: None
+    """
+    match_id = match_info["metadata"]["matchId"]
+    match_info_filepath = match_info_dir / (MATCH_INFO_PREFIX + match_id + ".json")
+    match_timeline_filepath = match_timeline_dir / (
+        MATCH_TIMELINE_PREFIX + match_id + ".json"
+    )
+
+    with PROFILER.stage("write"):
+        with match_info_filepath.open(mode="w", encoding="utf-8") as match_info_f:
+            json.dump(match_info, match_info_f, ensure_ascii=False, indent=4)
+
+        with match_timeline_filepath.open(
+            mode="w", encoding="utf-8"
+        ) as match_timeline_f:
+            json.dump(
+                match_timeline,
+                match_timeline_f,
+                ensure_ascii=False,
+                indent=4,
+            )
+    if match_index is not None:
+        match_index.addMatch(
+            match_info,
+            match_info_filepath,
+            match_timeline_filepath,
+            tier=rank,
+            division=division,
+        )
+    PROFILER.count("matches")
 
 
 def generate_data(
@@ -70,11 +471,19 @@ def generate_data(
     num_samples,
     match_info_dir,
     match_timeline_dir,
+    match_index: Optional[MatchIndex] = None,
+    max_matches_per_player: Optional[int] = 1,
+    ledger: Optional[MatchLedger] = None,
+    writer: Optional[MatchStore] = None,
 ):
     """Fetch num_samples number of match infos and match timelines for each combination of ranks and divisions,
     saving each match info to a file named 'match_info_[ID].json' and each match timeline to a file named
     'match_timeline_[ID].json'.
 
+    Each matchlist lookup (a random summoner of a random page) queues up to max_matches_per_player of the
+    summoner's matches, skipping the matches already stored. At most num_samples lookups are made for each
+    combination, so with a cap of 1 (one random match per summoner) a combination may get fewer matches.
+
     :param region: String indicating match region
     :param queue: String indicating match queue type
     :param ranks: Iterable indicating all ranks to fetch matches from
@@ -84,14 +493,159 @@ def generate_data(
     :param num_samples: Number of random matches to fetch from each combination of ranks and divisions
     :param match_info_dir: Path to the directory to save the match info JSON files to
     :param match_timeline_dir: Path to the directory to save the match timeline JSON files to
+    :param match_index: Index to add the stored matches to, with the rank and division they were sampled from
+    :param max_matches_per_player: Maximum number of matches taken from one matchlist, None for all of them
+    :param ledger: Match IDs not to download, shared with other collecting threads, defaults to the stored ones
+    :param writer: Store saving (or featurizing) the matches in the background, instead of store_match with match_index
     :return: None
     """
+    seen = (
+        ledger if ledger is not None else MatchLedger(stored_match_ids(match_info_dir))
+    )
+    store = (
+        writer.put
+        if writer is not None
+        else partial(
+            store_match,
+            match_info_dir=match_info_dir,
+            match_timeline_dir=match_timeline_dir,
+            match_index=match_index,
+        )
+    )
+    harvested_summoners: Set[str] = set()
 
     for rank in ranks:
         for div in divisions:
-            for _ in tqdm(range(num_samples), desc=f"{rank}+{div}"):
-                try:
-                    match_id = fetch_random_match_id(
+            pending: Deque[str] = deque()
+            lookups = 0
+            with tqdm(total=num_samples, desc=f"{rank}+{div}") as progress:
+                while progress.n < num_samples:
+                    try:
+                        if not pending:
+                            if lookups >= num_samples:
+                                # Could not find more matches from this
+                                break
+                            lookups += 1
+                            summoner = fetch_random_summoner(
+                                lol_watcher,
+                                region,
+                                queue,
+                                rank,
+                                div,
+                                randint(min_page, max_page),
+                                exclude=harvested_summoners,
+                            )
+                            if summoner is None:
+                                continue
+                            summoner_id, puuid = summoner
+                            harvested_summoners.add(summoner_id)
+                            pending.extend(
+                                harvest_match_ids(
+                                    fetch_matchlist(lol_watcher, region, puuid),
+                                    seen,
+                                    max_matches_per_player,
+                                )
+                            )
+                            continue
+
+                        match_id = pending.popleft()
+                        match_info = fetch_match_info(lol_watcher, region, match_id)
+                        match_timeline = fetch_match_timeline(
+                            lol_watcher, region, match_id
+                        )
+                        store(match_info, match_timeline, rank=rank, division=div)
+                        progress.update()
+                    except ApiError as err:
+                        PROFILER.count(f"api_errors.{err.response.status_code}")
+                        if err.response.status_code == 404:
+                            pass
+                        else:
+                            print("APIError: " + str(err.response.status_code))
+                            return
+
+
+def snowball_data(
+    lol_watcher: LolWatcher,
+    region,
+    queue,
+    ranks,
+    divisions,
+    min_page,
+    max_page,
+    num_samples,
+    match_info_dir,
+    match_timeline_dir,
+    match_index: Optional[MatchIndex] = None,
+    max_matches_per_player: Optional[int] = 5,
+    max_depth=2,
+    ledger: Optional[MatchLedger] = None,
+    writer: Optional[MatchStore] = None,
+):
+    """Fetch num_samples matches for each combination of ranks and divisions like generate_data, but
+    discover most of them by crawling the matchlists of the participants of the downloaded matches.
+
+    Each combination has its own breadth-first frontier of summoners: the participants of a downloaded
+    match are queued in the frontier the match was found from, since matchmaking pairs players of
+    similar ranks. Ranks drift as the crawl goes deeper, so participants more than max_depth matchlists
+    away from a summoner of the league entries are dropped and the frontier is seeded again from the
+    league entries when it runs out. The combination with the fewest matches is crawled first.
+
+    :param region: String indicating match region
+    :param queue: String indicating match queue type
+    :param ranks: Iterable indicating all ranks to fetch matches from
+    :param divisions: Iterable indicating all rank divisions to fetch matches from
+    :param min_page: Lower bound (inclusive) on the range of pages to randomly choose seed summoners from
+    :param max_page: Upper bound (inclusive) on the range of pages to randomly choose seed summoners from
+    :param num_samples: Number of matches to fetch from each combination of ranks and divisions
+    :param match_info_dir: Path to the directory to save the match info JSON files to
+    :param match_timeline_dir: Path to the directory to save the match timeline JSON files to
+    :param match_index: Index to add the stored matches to, with the rank and division they were sampled from
+    :param max_matches_per_player: Maximum number of matches taken from one matchlist, None for all of them
+    :param max_depth: Maximum number of matchlists between a crawled summoner and a seed summoner
+    :param ledger: Match IDs not to download, shared with other collecting threads, defaults to the stored ones
+    :param writer: Store saving (or featurizing) the matches in the background, instead of store_match with match_index
+    :return: None
+    """
+    seen = (
+        ledger if ledger is not None else MatchLedger(stored_match_ids(match_info_dir))
+    )
+    store = (
+        writer.put
+        if writer is not None
+        else partial(
+            store_match,
+            match_info_dir=match_info_dir,
+            match_timeline_dir=match_timeline_dir,
+            match_index=match_index,
+        )
+    )
+    seen_players: Set[str] = set()
+    strata = [(rank, div) for rank in ranks for div in divisions]
+    counts = {stratum: 0 for stratum in strata}
+    # Summoner PUUIDs to crawl and their distance to a seed summoner
+    frontiers: Dict[Tuple[str, str], Deque[Tuple[str, int]]] = {
+        stratum: deque() for stratum in strata
+    }
+    # Seed lookups left before giving up on a combination, as many as generate_data makes
+    seeds_left = {stratum: num_samples for stratum in strata}
+
+    with tqdm(total=num_samples * len(strata), desc="snowball") as progress:
+        while True:
+            active = [
+                stratum
+                for stratum in strata
+                if counts[stratum] < num_samples
+                and (frontiers[stratum] or seeds_left[stratum] > 0)
+            ]
+            if not active:
+                break
+            stratum = min(active, key=counts.__getitem__)
+            rank, div = stratum
+            frontier = frontiers[stratum]
+            try:
+                if not frontier:
+                    seeds_left[stratum] -= 1
+                    summoner = fetch_random_summoner(
                         lol_watcher,
                         region,
                         queue,
@@ -99,45 +653,167 @@ def generate_data(
                         div,
                         randint(min_page, max_page),
                     )
-                    if not match_id:
-                        # Could not find more matches from this
-                        continue
+                    PROFILER.count("snowball.seeds")
+                    if summoner is not None and summoner[1] not in seen_players:
+                        seen_players.add(summoner[1])
+                        frontier.append((summoner[1], 0))
+                    continue
+
+                puuid, depth = frontier.popleft()
+                match_ids = harvest_match_ids(
+                    fetch_matchlist(lol_watcher, region, puuid),
+                    seen,
+                    min(
+                        max_matches_per_player or num_samples,
+                        num_samples - counts[stratum],
+                    ),
+                )
+                for match_id in match_ids:
                     match_info = fetch_match_info(lol_watcher, region, match_id)
                     match_timeline = fetch_match_timeline(lol_watcher, region, match_id)
+                    store(match_info, match_timeline, rank=rank, division=div)
+                    counts[stratum] += 1
+                    progress.update()
+                    if depth >= max_depth:
+                        continue
+                    for participant in match_info["metadata"].get(  # type: ignore
+                        "participants", []
+                    ):
+                        if participant not in seen_players:
+                            seen_players.add(participant)
+                            frontier.append((participant, depth + 1))
+            except ApiError as err:
+                PROFILER.count(f"api_errors.{err.response.status_code}")
+                if err.response.status_code == 404:
+                    pass
+                else:
+                    print("APIError: " + str(err.response.status_code))
+                    return
 
-                    match_info_filepath = match_info_dir / (
-                        "match_info_" + match_id + ".json"
-                    )
-                    match_timeline_filepath = match_timeline_dir / (
-                        "match_timeline_" + match_id + ".json"
-                    )
 
-                    with match_info_filepath.open(
-                        mode="w", encoding="utf-8"
-                    ) as match_info_f:
-                        json.dump(
-                            match_info, match_info_f, ensure_ascii=False, indent=4
-                        )
+def collect_regions(
+    api_key,
+    regions,
+    queue,
+    ranks,
+    divisions,
+    min_page,
+    max_page,
+    num_samples,
+    match_info_dir,
+    match_timeline_dir,
+    index_path: Optional[Path] = MATCH_INDEX_PATH,
+    snowball=False,
+    writer: Optional[MatchStore] = None,
+    ledger: Optional[MatchLedger] = None,
+    api_url: Optional[str] = None,
+    **crawl_options,
+):
+    """Collect num_samples matches for each combination of ranks and divisions in each region, one thread
+    per region (see generate_data and snowball_data).
 
-                    with match_timeline_filepath.open(
-                        mode="w", encoding="utf-8"
-                    ) as match_timeline_f:
-                        json.dump(
-                            match_timeline,
-                            match_timeline_f,
-                            ensure_ascii=False,
-                            indent=4,
-                        )
-                except ApiError as err:
-                    if err.response.status_code == 404:
-                        pass
-                    else:
-                        print("APIError: " + str(err.response.status_code))
-                        return
+    Rate limits apply per region, so each region's LolWatcher has its own rate limiter and the regions are
+    crawled concurrently. The regions share one ledger, so a match is only downloaded once, and one writer.
+    Match-v5 calls of regions routed to the same cluster (e.g. NA1 and BR1 to americas) share its limits.
+
+    :param api_key: Riot API key
+    :param regions: Iterable indicating the regions to collect from (e.g. NA1, EUW1, KR)
+    :param index_path: Path of the match index to add the stored matches to, None not to index them
+    :param snowball: Whether to crawl with snowball_data instead of generate_data
+    :param writer: Store to give the matches to, defaults to a MatchWriter closed once every region is done
+    :param ledger: Match IDs not to download, defaults to the stored ones
+    :param api_url: Base URL of a server standing in for the Riot API (see create_lol_watcher)
+    :param crawl_options: Keyword arguments of generate_data or snowball_data (e.g. max_matches_per_player)
+    :return: None
+    """
+    regions = list(regions)
+    if ledger is None:
+        ledger = MatchLedger(stored_match_ids(match_info_dir))
+    collect = snowball_data if snowball else generate_data
+    with (
+        MatchWriter(match_info_dir, match_timeline_dir, index_path)
+        if writer is None
+        else nullcontext(writer)
+    ) as match_store, ThreadPoolExecutor(
+        len(regions), thread_name_prefix="collector"
+    ) as executor:
+        futures = [
+            executor.submit(
+                collect,
+                create_lol_watcher(api_key, api_url),
+                region,
+                queue,
+                ranks,
+                divisions,
+                min_page,
+                max_page,
+                num_samples,
+                match_info_dir,
+                match_timeline_dir,
+                ledger=ledger,
+                writer=match_store,
+                **crawl_options,
+            )
+            for region in regions
+        ]
+        for future in futures:
+            future.result()
 
 
 def main():
-    region = "NA1"
+    arg_parser = argparse.ArgumentParser(
+        description="Download ranked matches from the Riot API"
+    )
+    arg_parser.add_argument(
+        "--per-player",
+        type=int,
+        default=None,
+        help="Matches to download from each summoner's matchlist, 0 for all of them (up to 20). "
+        "Defaults to 1, or 5 with --snowball",
+    )
+    arg_parser.add_argument(
+        "--snowball",
+        action="store_true",
+        help="Discover matches from the matchlists of the participants of the downloaded matches",
+    )
+    arg_parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=2,
+        help="With --snowball, how many matchlists away from a league entry to crawl",
+    )
+    arg_parser.add_argument(
+        "--regions",
+        default="NA1",
+        help="Comma separated regions to collect from (e.g. NA1,EUW1,KR), crawled concurrently",
+    )
+    arg_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=f"Featurize the matches as they are downloaded into the shards of {DATASET_SHARDS_DIR} "
+        "instead of saving them as JSON",
+    )
+    arg_parser.add_argument(
+        "--archive",
+        action="store_true",
+        help=f"With --stream, also save the raw matches as compressed JSON in {MATCH_ARCHIVE_DIR}",
+    )
+    arg_parser.add_argument(
+        "--features",
+        default=None,
+        help="With --stream, comma separated FeatureKeys names to generate (e.g. TimeStamp,TowerKills)",
+    )
+    arg_parser.add_argument(
+        "--api-url",
+        default=os.getenv("RIOT_API_URL"),
+        help="Send the requests to a server standing in for the Riot API, e.g. "
+        "http://127.0.0.1:8090/{platform} for python -m src.standins.RiotApiStandIn",
+    )
+    args = arg_parser.parse_args()
+    if args.per_player is None:
+        args.per_player = 5 if args.snowball else 1
+    setup_from_env()
+    regions = args.regions.split(",")
     queue = "RANKED_SOLO_5x5"
     non_apex_ranks = [
         # "IRON",
@@ -176,22 +852,86 @@ def main():
 
     load_dotenv()
     API_KEY = os.getenv("API_KEY")
-    if not API_KEY:
+    if not API_KEY and not args.api_url:
         print("Missing API Key in .env")
         return
-    lol_watcher = LolWatcher(API_KEY)
-    generate_data(
-        lol_watcher,
-        region,
-        queue,
-        non_apex_ranks,
-        divisions,
-        min_page,
-        max_page,
-        num_samples_per_rank,
-        match_info_dir,
-        match_timeline_dir,
-    )
+    crawl_options = {"max_matches_per_player": args.per_player or None}
+    if args.snowball:
+        crawl_options["max_depth"] = args.max_depth
+    if args.stream:
+        plan = (
+            ExtractionPlan.fromNames(args.features.split(","))
+            if args.features
+            else DEFAULT_PLAN
+        )
+        if (
+            list_dataset_shards(DATASET_SHARDS_DIR)
+            and load_feature_keys(SHARDS_FEATURES_FILEPATH) != plan
+        ):
+            print(f"The shards in {DATASET_SHARDS_DIR} have other features")
+            return
+        save_feature_keys(SHARDS_FEATURES_FILEPATH, plan)
+        ledger = MatchLedger(
+            stored_match_ids(match_info_dir) | load_shards_match_ids(DATASET_SHARDS_DIR)
+        )
+        with MatchFeaturizer(
+            DATASET_SHARDS_DIR, plan, MATCH_ARCHIVE_DIR if args.archive else None
+        ) as featurizer:
+            collect_regions(
+                API_KEY,
+                regions,
+                queue,
+                non_apex_ranks,
+                divisions,
+                min_page,
+                max_page,
+                num_samples_per_rank,
+                match_info_dir,
+                match_timeline_dir,
+                None,
+                args.snowball,
+                writer=featurizer,
+                ledger=ledger,
+                api_url=args.api_url,
+                **crawl_options,
+            )
+        return
+    if len(regions) > 1:
+        collect_regions(
+            API_KEY,
+            regions,
+            queue,
+            non_apex_ranks,
+            divisions,
+            min_page,
+            max_page,
+            num_samples_per_rank,
+            match_info_dir,
+            match_timeline_dir,
+            MATCH_INDEX_PATH,
+            args.snowball,
+            api_url=args.api_url,
+            **crawl_options,
+        )
+        return
+
+    lol_watcher = create_lol_watcher(API_KEY, args.api_url)
+    collect = snowball_data if args.snowball else generate_data
+    with MatchIndex(MATCH_INDEX_PATH) as match_index:
+        collect(
+            lol_watcher,
+            regions[0],
+            queue,
+            non_apex_ranks,
+            divisions,
+            min_page,
+            max_page,
+            num_samples_per_rank,
+            match_info_dir,
+            match_timeline_dir,
+            match_index,
+            **crawl_options,
+        )
 
 
 if __name__ == "__main__":
@@ -1,87 +1,469 @@
+import argparse
 import json
 from pathlib import Path
-from typing import List
+from functools import partial
+from typing import Iterable, List, Optional, Set
 import numpy as np
 from tqdm import tqdm
 
+from src.event_table import EVENT_TABLE_DIR, EventTable
+from src.features.features import DEFAULT_PLAN, ExtractionPlan
+from src.match_index import (
+    MATCH_INDEX_PATH,
+    MATCH_INFO_PREFIX,
+    IndexedMatch,
+    MatchIndex,
+    get_label,
+)
 from src.parsers.Sample import SampleFormatting
 from src.parsers.OfflineParser import OfflineParser
+from src.parsers.EventEngine import FRAME_SAMPLING, Sampling
 from src.parsers.Frame import Frame
+from src.prefetch_loader import PrefetchLoader
+from src.profiling import PROFILER, setup_from_env
+from src.utils import (
+    DatasetShardWriter,
+    get_shard_groups_path,
+    list_dataset_shards,
+    match_group_id,
+)
 
 processed_dataset_dir = Path.cwd() / "matches" / "dataset"
 DATASET_FILEPATH = processed_dataset_dir / "dataset_good.npy"
 DATASET_LABELS_FILEPATH = processed_dataset_dir / "dataset_labels_good.npy"
+# Match group ID of every sample, so frames of a match are never split between train and validation
+DATASET_GROUPS_FILEPATH = processed_dataset_dir / "dataset_groups_good.npy"
+DATASET_SHARDS_DIR = processed_dataset_dir / "shards"
+# Features of the dataset (and of the shards in DATASET_SHARDS_DIR), read by the trainer
+DATASET_FEATURES_FILEPATH = processed_dataset_dir / "dataset_features_good.json"
+SHARDS_FEATURES_FILEPATH = DATASET_SHARDS_DIR / "features.json"
+# IDs of the matches whose samples are in the shards of a directory, skipped when adding to the shards
+SHARDS_MATCH_IDS_FILENAME = "match_ids.txt"
+# Threads reading the files of the next matches while one is parsed, and how many matches they read ahead
+PREFETCH_THREADS = 4
+PREFETCH_READ_AHEAD = 8
 
 
-def generate_time_series_features(timeline):
+def generate_time_series_features(
+    timeline, plan: ExtractionPlan = DEFAULT_PLAN, sampling: Sampling = FRAME_SAMPLING
+):
     """Generate a multivariate time series with the given features as individual variables
 
     :param timeline: Dict containing the match timeline
-    :param features_list: Iterable containing instances of ParticipantFeature or derived classes corresponding to
-    features to be added to the time series
+    :param plan: The features to add to the time series
+    :param sampling: When to sample, by default at every frame
     :return: Time series as a 2D list, where columns correspond to feature observations (with the first column being
     the timestamp), and rows corresponding to the timestamp of the observations
     """
     time_series = []
-    frames: List[Frame] = [Frame(frame) for frame in timeline["info"]["frames"]]
-    parser = OfflineParser(frames)
+    with PROFILER.stage("Frame"):
+        frames: List[Frame] = [Frame(frame) for frame in timeline["info"]["frames"]]
+    PROFILER.count("frames", len(frames))
+    parser = OfflineParser(frames, plan, sampling=sampling)
     sample = parser.getNextFrame()
     while sample:
-        time_series += [sample.getValue(SampleFormatting.TAKE_DIFF)]
+        with PROFILER.stage("Sample.getValue"):
+            time_series += [sample.getValue(SampleFormatting.TAKE_DIFF)]
         sample = parser.getNextFrame()
     return time_series
 
 
+def read_file(filepath: Path) -> bytes:
+    with PROFILER.stage("read"):
+        data = filepath.read_bytes()
+    PROFILER.count("bytes_read", len(data))
+    return data
+
+
+def decode_json(data: bytes):
+    with PROFILER.stage("json.load"):
+        return json.loads(data)
+
+
+def load_json(filepath: Path):
+    """json.load, with the disk read and the decoding timed separately when profiling"""
+    return decode_json(read_file(filepath))
+
+
+def read_match_files(
+    match_info_filepath: Path,
+    match_timeline_dir: Path,
+    event_table: Optional[EventTable] = None,
+):
+    """Read the match info and timeline of a stored match
+
+    The timeline is returned undecoded: reading releases the GIL but decoding doesn't, so
+    reading threads only overlap with parsing when decoding is left to the parsing thread.
+
+    :param match_info_filepath: Path to the match info JSON file
+    :param match_timeline_dir: Path to the directory containing the match timeline JSON files
+    :param event_table: Event table the match may be in, its timeline then isn't read
+    :return: Tuple (match ID, label, match timeline JSON or None if it's in the event table)
+    """
+    match_info = load_json(match_info_filepath)
+    match_id = match_info["metadata"]["matchId"]
+    if event_table is not None and match_id in event_table:
+        return match_id, get_label(match_info), None
+    match_timeline_filepath = match_timeline_dir / (
+        "match_timeline_" + match_id + ".json"
+    )
+    return match_id, get_label(match_info), read_file(match_timeline_filepath)
+
+
+def read_indexed_match_files(
+    match: IndexedMatch, event_table: Optional[EventTable] = None
+):
+    """Same as read_match_files for a match of the match index, its match info isn't read"""
+    if event_table is not None and match.matchId in event_table:
+        return match.matchId, match.label, None
+    return match.matchId, match.label, read_file(match.matchTimelinePath)
+
+
+def get_match_time_series(
+    match_id: str,
+    match_timeline: Optional[bytes],
+    plan: ExtractionPlan = DEFAULT_PLAN,
+    event_table: Optional[EventTable] = None,
+    sampling: Sampling = FRAME_SAMPLING,
+):
+    """Time series of a stored match, from its timeline JSON or from the event table if it wasn't read"""
+    if match_timeline is None:
+        with PROFILER.stage("EventTable.getTimeSeriesFeatures"):
+            return event_table.getTimeSeriesFeatures(  # type: ignore
+                event_table.getMatchIndex(match_id), plan, sampling=sampling  # type: ignore
+            )
+    return generate_time_series_features(decode_json(match_timeline), plan, sampling)
+
+
+def iterate_match_features(
+    match_info_dir: Path,
+    match_timeline_dir: Path,
+    plan: ExtractionPlan = DEFAULT_PLAN,
+    event_table: Optional[EventTable] = None,
+    matches: Optional[List[IndexedMatch]] = None,
+    prefetch_threads=PREFETCH_THREADS,
+    sampling: Sampling = FRAME_SAMPLING,
+    skip_match_ids: Optional[Set[str]] = None,
+):
+    """Generate the time series, label and match ID of every stored match, skipping unreadable ones
+
+    The files of the next matches are read by a PrefetchLoader while the current match is parsed.
+
+    :param match_info_dir: Path to the directory containing the match info JSON files
+    :param match_timeline_dir: Path to the directory containing the match timeline JSON files
+    :param plan: The features to generate
+    :param event_table: Event table to read the matches from instead of their timelines
+    :param matches: Matches selected from the match index, instead of every file of match_info_dir
+    :param prefetch_threads: Number of reading threads, 0 reads each match right before parsing it
+    :param sampling: When to sample the matches, by default at every frame
+    :param skip_match_ids: IDs of matches not to read
+    """
+    skip_match_ids = skip_match_ids or set()
+    if matches is not None:
+        matches = [match for match in matches if match.matchId not in skip_match_ids]
+        tasks: Iterable = matches
+        read = partial(read_indexed_match_files, event_table=event_table)
+    else:
+        tasks = (
+            path
+            for path in match_info_dir.iterdir()
+            if path.is_file()
+            and path.stem[len(MATCH_INFO_PREFIX) :] not in skip_match_ids
+        )
+        read = partial(
+            read_match_files,
+            match_timeline_dir=match_timeline_dir,
+            event_table=event_table,
+        )
+    loader = PrefetchLoader(tasks, read, prefetch_threads, PREFETCH_READ_AHEAD)
+    for _, match_files, error in tqdm(loader, total=len(matches) if matches else None):
+        if isinstance(error, IOError):
+            continue
+        elif error is not None:
+            raise error
+        match_id, sample_label, match_timeline = match_files  # type: ignore
+        try:
+            sample = get_match_time_series(
+                match_id, match_timeline, plan, event_table, sampling
+            )
+        except IOError:
+            continue
+        PROFILER.count("matches")
+        yield sample, sample_label, match_id
+
+
 def generate_dataset_from_files(
-    match_info_dir: Path, match_timeline_dir: Path, time_series=True
+    match_info_dir: Path,
+    match_timeline_dir: Path,
+    time_series=True,
+    plan: ExtractionPlan = DEFAULT_PLAN,
+    event_table: Optional[EventTable] = None,
+    matches: Optional[List[IndexedMatch]] = None,
+    prefetch_threads=PREFETCH_THREADS,
+    sampling: Sampling = FRAME_SAMPLING,
 ):
     """Generate dataset of multivariate time series with labels, with the given features as variables
 
     :param match_info_dir: Path to the directory containing the match info JSON files
     :param match_timeline_dir: Path to the directory containing the match timeline JSON files
-    :return: Tuple (X, y), where X is a 3D numpy array with shape (number of time series, max length of the time series,
-    dimension), and Y is a 1D list of labels
+    :param plan: The features to generate
+    :param event_table: Event table to read the matches from instead of their timelines
+    :param matches: Matches selected from the match index, instead of every stored match
+    :param prefetch_threads: Number of threads reading the next matches, 0 to disable
+    :param sampling: When to sample the matches, by default at every frame
+    :return: Tuple (X, y, groups), where X is a 3D numpy array with shape (number of time series, max length of the time series,
+    dimension), Y is a 1D list of labels and groups is a 1D list of match group IDs (see utils.match_group_id)
     """
     X = []
     y = []
+    groups = []
 
-    for match_info_filepath in tqdm(match_info_dir.iterdir()):
-        try:
-            if match_info_filepath.is_file():
-                with match_info_filepath.open(
-                    mode="r", encoding="utf-8"
-                ) as match_info_f:
-                    match_info = json.load(match_info_f)
-
-                match_id = match_info["metadata"]["matchId"]
-                match_timeline_filepath = match_timeline_dir / (
-                    "match_timeline_" + match_id + ".json"
-                )
+    for sample, sample_label, match_id in iterate_match_features(
+        match_info_dir,
+        match_timeline_dir,
+        plan,
+        event_table,
+        matches,
+        prefetch_threads,
+        sampling,
+    ):
+        if not time_series:
+            X.extend(sample)
+            y.extend([sample_label] * len(sample))
+            groups.extend([match_group_id(match_id)] * len(sample))
+        else:
+            X.append(sample)
+            y.append(sample_label)
+            groups.append(match_group_id(match_id))
+    return X, y, groups
 
-                with match_timeline_filepath.open(
-                    mode="r", encoding="utf-8"
-                ) as match_timeline_f:
-                    match_timeline = json.load(match_timeline_f)
-
-                sample = generate_time_series_features(match_timeline)
-                sample_label = int(match_info["info"]["participants"][1]["win"])
-                if not time_series:
-                    X.extend(sample)
-                    y.extend([sample_label] * len(sample))
-                else:
-                    X.append(sample)
-                    y.append(sample_label)
-        except IOError:
-            pass
-    return X, y
+
+def generate_dataset_shards(
+    match_info_dir: Path,
+    match_timeline_dir: Path,
+    shards_dir: Path,
+    shard_size=1000000,
+    plan: ExtractionPlan = DEFAULT_PLAN,
+    event_table: Optional[EventTable] = None,
+    matches: Optional[List[IndexedMatch]] = None,
+    prefetch_threads=PREFETCH_THREADS,
+    sampling: Sampling = FRAME_SAMPLING,
+):
+    """Generate the frame-level dataset as .npy shards without holding it in memory
+
+    :param match_info_dir: Path to the directory containing the match info JSON files
+    :param match_timeline_dir: Path to the directory containing the match timeline JSON files
+    :param shards_dir: Path to the directory to write the shards to, matches already in its shards are skipped
+    :param shard_size: Number of samples per shard
+    :param plan: The features to generate
+    :param event_table: Event table to read the matches from instead of their timelines
+    :param matches: Matches selected from the match index, instead of every stored match
+    :param prefetch_threads: Number of threads reading the next matches, 0 to disable
+    :param sampling: When to sample the matches, by default at every frame
+    :return: Number of samples written
+    """
+    num_samples = 0
+    # Matches are only recorded once their samples are in a written shard
+    pending_ids: List[str] = []
+    writer = DatasetShardWriter(shards_dir, shard_size)
+    try:
+        for sample, sample_label, match_id in iterate_match_features(
+            match_info_dir,
+            match_timeline_dir,
+            plan,
+            event_table,
+            matches,
+            prefetch_threads,
+            sampling,
+            load_shards_match_ids(shards_dir),
+        ):
+            if not sample:
+                continue
+            num_shards = writer.numShards
+            writer.append(
+                np.vstack(sample),
+                np.full(len(sample), sample_label),
+                np.full(len(sample), match_group_id(match_id)),
+            )
+            pending_ids.append(match_id)
+            if writer.numShards != num_shards:
+                record_shards_match_ids(shards_dir, pending_ids)
+                pending_ids = []
+            num_samples += len(sample)
+    finally:
+        writer.close()
+        record_shards_match_ids(shards_dir, pending_ids)
+    return num_samples
+
+
+def load_shards_match_ids(shards_dir: Path) -> Set[str]:
+    """IDs of the matches whose samples are in the shards of shards_dir"""
+    match_ids_path = shards_dir / SHARDS_MATCH_IDS_FILENAME
+    if not match_ids_path.exists():
+        return set()
+    return set(match_ids_path.read_text(encoding="utf-8").split())
+
+
+def record_shards_match_ids(shards_dir: Path, match_ids: Iterable[str]):
+    with (shards_dir / SHARDS_MATCH_IDS_FILENAME).open(
+        mode="a", encoding="utf-8"
+    ) as match_ids_f:
+        match_ids_f.writelines(match_id + "\n" for match_id in match_ids)
+
+
+def clear_dataset_shards(shards_dir: Path):
+    """Delete the shards of shards_dir with their match IDs and feature keys"""
+    for features_path, labels_path in list_dataset_shards(shards_dir):
+        features_path.unlink()
+        labels_path.unlink()
+        get_shard_groups_path(features_path).unlink(missing_ok=True)
+    (shards_dir / SHARDS_MATCH_IDS_FILENAME).unlink(missing_ok=True)
+    (shards_dir / SHARDS_FEATURES_FILEPATH.name).unlink(missing_ok=True)
+
+
+def save_feature_keys(features_path: Path, plan: ExtractionPlan):
+    features_path.parent.mkdir(parents=True, exist_ok=True)
+    with features_path.open(mode="w", encoding="utf-8") as features_f:
+        json.dump(plan.getNames(), features_f)
+
+
+def load_feature_keys(features_path: Path) -> ExtractionPlan:
+    """Plan of a dataset saved by main, datasets generated before feature subsets have every feature"""
+    if not features_path.exists():
+        return DEFAULT_PLAN
+    with features_path.open(mode="r", encoding="utf-8") as features_f:
+        return ExtractionPlan.fromNames(json.load(features_f))
 
 
 def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Generate the training dataset from the stored matches"
+    )
+    arg_parser.add_argument(
+        "--shards",
+        action="store_true",
+        help=f"Write the dataset as shards in {DATASET_SHARDS_DIR}, adding the matches that aren't in them yet",
+    )
+    arg_parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="With --shards, delete the existing shards first",
+    )
+    arg_parser.add_argument(
+        "--features",
+        default=None,
+        help="Comma separated FeatureKeys names (e.g. TimeStamp,TowerKills), only generate these features",
+    )
+    arg_parser.add_argument(
+        "--event-table",
+        action="store_true",
+        help="Read the events from the table of event_table.py instead of the timelines",
+    )
+    arg_parser.add_argument(
+        "--patch",
+        action="append",
+        default=None,
+        help="Only use matches of this patch (e.g. 14.3, or 14. for every 14.x patch), can be repeated",
+    )
+    arg_parser.add_argument(
+        "--tier",
+        action="append",
+        default=None,
+        help="Only use matches collected from this tier (e.g. DIAMOND), can be repeated",
+    )
+    arg_parser.add_argument(
+        "--division",
+        action="append",
+        default=None,
+        help="Only use matches collected from this division, can be repeated",
+    )
+    arg_parser.add_argument("--queue", type=int, default=None, help="Queue ID")
+    arg_parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=PREFETCH_THREADS,
+        help="Number of threads reading the next matches while one is parsed, 0 to disable",
+    )
+    arg_parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Read the labels from the match index even without filters",
+    )
+    arg_parser.add_argument(
+        "--sample-interval",
+        type=int,
+        default=None,
+        help="Also sample every N milliseconds of game time (e.g. 10000, the live polling interval), "
+        "instead of only at every one minute frame",
+    )
+    arg_parser.add_argument(
+        "--sample-at-events",
+        action="store_true",
+        help="Also sample at every event changing the game state (kills, towers, dragons...)",
+    )
+    args = arg_parser.parse_args()
+    if args.sample_interval is not None and args.sample_interval <= 0:
+        arg_parser.error("--sample-interval must be a positive number of milliseconds")
+
+    setup_from_env()
+    sampling = Sampling(args.sample_interval, args.sample_at_events)
     match_info_dir = Path.cwd() / "matches" / "match_info"
     match_timeline_dir = Path.cwd() / "matches" / "match_timeline"
+    plan = (
+        ExtractionPlan.fromNames(args.features.split(","))
+        if args.features
+        else DEFAULT_PLAN
+    )
+    event_table = EventTable(EVENT_TABLE_DIR) if args.event_table else None
+    matches = None
+    if args.index or args.patch or args.tier or args.division or args.queue:
+        with MatchIndex(MATCH_INDEX_PATH) as index:
+            # Only the matches stored since the last run are read
+            index.update(match_info_dir, match_timeline_dir)
+            matches = index.select(args.patch, args.tier, args.division, args.queue)
+        print(f"Selected {len(matches)} matches from {MATCH_INDEX_PATH}")
+        if not matches:
+            return
+
+    if args.shards:
+        if args.overwrite:
+            clear_dataset_shards(DATASET_SHARDS_DIR)
+        elif list_dataset_shards(DATASET_SHARDS_DIR):
+            if load_feature_keys(SHARDS_FEATURES_FILEPATH) != plan:
+                print(
+                    f"The shards in {DATASET_SHARDS_DIR} have other features, "
+                    "use --overwrite to replace them"
+                )
+                return
+            if not (DATASET_SHARDS_DIR / SHARDS_MATCH_IDS_FILENAME).exists():
+                print(
+                    f"The shards in {DATASET_SHARDS_DIR} don't list their matches, "
+                    "use --overwrite to replace them"
+                )
+                return
+        save_feature_keys(SHARDS_FEATURES_FILEPATH, plan)
+        num_samples = generate_dataset_shards(
+            match_info_dir,
+            match_timeline_dir,
+            DATASET_SHARDS_DIR,
+            plan=plan,
+            event_table=event_table,
+            matches=matches,
+            prefetch_threads=args.prefetch,
+            sampling=sampling,
+        )
+        print(f"Wrote {num_samples} samples to {DATASET_SHARDS_DIR}")
+        return
 
-    X, y = generate_dataset_from_files(
-        match_info_dir, match_timeline_dir, time_series=False
+    X, y, groups = generate_dataset_from_files(
+        match_info_dir,
+        match_timeline_dir,
+        time_series=False,
+        plan=plan,
+        event_table=event_table,
+        matches=matches,
+        prefetch_threads=args.prefetch,
+        sampling=sampling,
     )
 
     processed_dataset_dir.mkdir(parents=True, exist_ok=True)
@@ -90,6 +472,8 @@ def main():
     print(f"Shape of features: {X[0].shape}")
     np.save(DATASET_FILEPATH, X)
     np.save(DATASET_LABELS_FILEPATH, y)
+    np.save(DATASET_GROUPS_FILEPATH, np.array(groups, dtype=np.int64))
+    save_feature_keys(DATASET_FEATURES_FILEPATH, plan)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
+from hashlib import blake2b
+from pathlib import Path
+from typing import List, Optional
 import numpy as np
-import pickle
 
 
 def load_dataset(dataset_path, dataset_labels_path) -> tuple[np.ndarray, np.ndarray]:
@@ -16,16 +18,6 @@ def save_dataset(X, y, dataset_path, dataset_labels_path):
     np.save(y, dataset_labels_path)
 
 
-def load_model(model_path):
-    with open(model_path, "rb") as f:
-        return pickle.load(f)
-
-
-def save_model(model, model_path):
-    with open(model_path, "wb") as f:
-        return pickle.dump(model, f)
-
-
 def shuffle_X_y(X: np.ndarray, y: np.ndarray):
     """
     Randomly shuffles the rows of the 2D feature matrix X and the corresponding 1D label vector y.
@@ -82,3 +74,162 @@ def split_train_validation(X: np.ndarray, y: np.ndarray, validation_size: float
     y_train, y_val = y[train_indices], y[val_indices]
 
     return X_train, X_val, y_train, y_val
+
+
+def match_group_id(match_id: str) -> int:
+    """Stable 63 bit integer ID of a match, used to keep all frames of a match together"""
+    return (
+        int.from_bytes(blake2b(match_id.encode(), digest_size=8).digest(), "little")
+        >> 1
+    )
+
+
+def group_train_validation_indices(
+    groups: np.ndarray, validation_size: float = 0.2, seed: Optional[int] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Splits row indices into training and validation sets so that all rows of a group (match) land in the same set.
+
+    Parameters:
+    groups (np.ndarray): 1D array of shape (num_samples,), the group ID of each row.
+    validation_size (float): Proportion of the groups to include in the validation split (default is 0.2, i.e., 20%).
+    seed (Optional[int]): Seed of the shuffle of the groups.
+
+    Returns:
+    train_indices (np.ndarray): Sorted row indices of the training set.
+    val_indices (np.ndarray): Sorted row indices of the validation set.
+    """
+    unique_groups, group_of_row = np.unique(groups, return_inverse=True)
+    permutation = np.random.default_rng(seed).permutation(len(unique_groups))
+    num_train_groups = int(len(unique_groups) * (1 - validation_size))
+
+    # is_val_group[g] is True when the g-th unique group is in the validation set
+    is_val_group = np.ones(len(unique_groups), dtype=bool)
+    is_val_group[permutation[:num_train_groups]] = False
+    is_val_row = is_val_group[group_of_row]
+    return np.flatnonzero(~is_val_row), np.flatnonzero(is_val_row)
+
+
+def group_kfold_indices(
+    groups: np.ndarray, n_splits: int = 5, seed: Optional[int] = None
+) -> List[tuple[np.ndarray, np.ndarray]]:
+    """
+    Splits row indices into n_splits folds so that all rows of a group (match) land in the same fold.
+
+    Parameters:
+    groups (np.ndarray): 1D array of shape (num_samples,), the group ID of each row.
+    n_splits (int): Number of folds.
+    seed (Optional[int]): Seed of the shuffle of the groups.
+
+    Returns:
+    folds (List[tuple[np.ndarray, np.ndarray]]): (train_indices, val_indices) of each fold.
+    """
+    unique_groups, group_of_row = np.unique(groups, return_inverse=True)
+    if len(unique_groups) < n_splits:
+        raise ValueError(
+            f"Cannot split {len(unique_groups)} groups into {n_splits} folds"
+        )
+    permutation = np.random.default_rng(seed).permutation(len(unique_groups))
+    fold_of_group = np.empty(len(unique_groups), dtype=np.int64)
+    fold_of_group[permutation] = np.arange(len(unique_groups)) % n_splits
+    fold_of_row = fold_of_group[group_of_row]
+    return [
+        (np.flatnonzero(fold_of_row != fold), np.flatnonzero(fold_of_row == fold))
+        for fold in range(n_splits)
+    ]
+
+
+def is_validation_group(groups: np.ndarray, validation_size: float = 0.2) -> np.ndarray:
+    """Deterministic group-aware split that needs no global view of the dataset (e.g. across shards)"""
+    return (groups % 1000) < int(validation_size * 1000)
+
+
+def get_shard_paths(shards_dir: Path, index: int) -> tuple[Path, Path]:
+    return (
+        shards_dir / f"shard_{index:05d}_X.npy",
+        shards_dir / f"shard_{index:05d}_y.npy",
+    )
+
+
+def get_shard_groups_path(features_path: Path) -> Path:
+    return features_path.with_name(features_path.name.replace("_X.npy", "_groups.npy"))
+
+
+def list_dataset_shards(shards_dir: Path) -> List[tuple[Path, Path]]:
+    """List the (features, labels) file pairs of a sharded dataset in order"""
+    shards = []
+    index = 0
+    while get_shard_paths(shards_dir, index)[0].exists():
+        shards.append(get_shard_paths(shards_dir, index))
+        index += 1
+    return shards
+
+
+def load_dataset_shard(
+    features_path: Path, labels_path: Path, mmap=True
+) -> tuple[np.ndarray, np.ndarray]:
+    """Load a shard, memory-mapped by default so only the rows that are read are paged in"""
+    mmap_mode = "r" if mmap else None
+    return np.load(features_path, mmap_mode=mmap_mode), np.load(
+        labels_path, mmap_mode=mmap_mode
+    )
+
+
+class DatasetShardWriter:
+    """Writes a dataset as fixed size .npy shards so it never has to fit in memory.
+
+    Features are stored as float32, the type XGBoost trains on.
+    """
+
+    _shardsDir: Path
+    _shardSize: int
+    _numShards: int
+    _X: List[np.ndarray]
+    _y: List[np.ndarray]
+    _groups: List[np.ndarray]
+    _numRows: int
+
+    def __init__(self, shards_dir: Path, shard_size=1000000) -> None:
+        self._shardsDir = shards_dir
+        self._shardSize = shard_size
+        self._shardsDir.mkdir(parents=True, exist_ok=True)
+        self._numShards = len(list_dataset_shards(shards_dir))
+        self._X = []
+        self._y = []
+        self._groups = []
+        self._numRows = 0
+
+    @property
+    def numShards(self) -> int:
+        """Number of shards written to the shards directory, including the ones there before"""
+        return self._numShards
+
+    def append(self, X: np.ndarray, y: np.ndarray, groups: np.ndarray):
+        self._X.append(np.asarray(X, dtype=np.float32).reshape(len(y), -1))
+        self._y.append(np.asarray(y, dtype=np.int8))
+        self._groups.append(np.asarray(groups, dtype=np.int64))
+        self._numRows += len(y)
+        if self._numRows >= self._shardSize:
+            self.flush()
+
+    def flush(self):
+        if not self._numRows:
+            return
+        features_path, labels_path = get_shard_paths(self._shardsDir, self._numShards)
+        np.save(features_path, np.vstack(self._X))
+        np.save(labels_path, np.concatenate(self._y))
+        np.save(get_shard_groups_path(features_path), np.concatenate(self._groups))
+        self._numShards += 1
+        self._X = []
+        self._y = []
+        self._groups = []
+        self._numRows = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()